@@ -3,6 +3,15 @@ import os
 import json
 from fastapi import APIRouter, Request, Query
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+
+from backend.services.mod_catalog import mod_catalog, parse_requires
+from backend.services.mod_graph import mod_graph
+from backend.services.mod_conflicts import mod_conflicts
+from backend.services.file_streaming import read_text_file, ranged_file_response, file_json_response
+from backend.services.file_patch import (
+    save_text, apply_edits, apply_patch, VersionConflict, PatchError
+)
 
 router = APIRouter()
 
@@ -20,33 +29,30 @@ def scan_workshop_mods() -> list[dict]:
     """Scan the local Workshop folder for Project Zomboid mods."""
     workshop_path = get_workshop_path()
     mods = []
-    if not os.path.isdir(workshop_path):
-        return mods
-    for mod_id in os.listdir(workshop_path):
-        mod_folder = os.path.join(workshop_path, mod_id)
-        if not os.path.isdir(mod_folder):
-            continue
-        mod_info_path = os.path.join(mod_folder, "mod.info.json")
-        if os.path.isfile(mod_info_path):
-            try:
-                with open(mod_info_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    mods.append({
-                        "modId": mod_id,
-                        "title": data.get("name", f"Mod {mod_id}"),
-                        "version": data.get("version"),
-                        "dependencies": data.get("dependencies", []),
-                        "path": mod_folder,
-                    })
-            except Exception:
-                mods.append({"modId": mod_id, "title": f"Mod {mod_id}", "path": mod_folder})
+    for mod in mod_catalog.mods(workshop_path):
+        mod_id = mod["id"]
+        data = mod["info"]
+        if data:
+            mods.append({
+                "modId": mod_id,
+                "title": data.get("name", f"Mod {mod_id}"),
+                "version": data.get("version"),
+                "dependencies": parse_requires(data),
+                "path": mod["path"],
+            })
         else:
-            mods.append({"modId": mod_id, "title": f"Mod {mod_id}", "path": mod_folder})
+            mods.append({"modId": mod_id, "title": f"Mod {mod_id}", "path": mod["path"]})
     return mods
 
 def error_response(code: str, status: int, message: str):
     return JSONResponse({"success": False, "error": code, "message": message}, status_code=status)
 
+def conflict_response(path: str, e: VersionConflict):
+    return JSONResponse(
+        {"success": False, "error": "BACKEND_004", "message": f"{e}: {path}", "version": e.current},
+        status_code=409,
+    )
+
 # ---------------------------
 # API Routes
 # ---------------------------
@@ -62,7 +68,7 @@ async def get_workshop_mods():
             "mods": [],
         })
 
-    mods = scan_workshop_mods()
+    mods = await run_in_threadpool(scan_workshop_mods)
     if not mods:
         return JSONResponse({
             "success": True,
@@ -76,18 +82,66 @@ async def get_workshop_mods():
         "mods": mods,
     })
 
+@router.get("/projectzomboid/workshop-mods/dependencies")
+def get_mod_dependencies():
+    """Dependency graph of installed mods with missing requirements and cycles."""
+    mod_graph.refresh(get_workshop_path())
+    return {"success": True, **mod_graph.summary()}
+
+@router.post("/projectzomboid/workshop-mods/load-order")
+async def resolve_load_order(request: Request):
+    """
+    Resolve a mod selection: adds required mods, orders dependencies first,
+    and reports missing requirements and cycles. Body: {"mods": ["ModA", ...]}.
+    """
+    data = await request.json()
+    mods = data.get("mods")
+    if not isinstance(mods, list) or not all(isinstance(m, str) for m in mods):
+        return error_response("BACKEND_002", 400, "mods must be a list of mod ids")
+    await run_in_threadpool(mod_graph.refresh, get_workshop_path())
+    return {"success": True, **mod_graph.resolve(mods)}
+
+@router.get("/projectzomboid/workshop-mods/conflicts")
+def get_mod_conflicts(
+    mods: list[str] = Query(None, description="Mod ids in load order; later ones win"),
+    mod: str = Query(None, description="Only files this mod overrides or loses"),
+    path: str = Query(None, description="Only this game path, e.g. media/lua/client/x.lua"),
+    hashes: bool = Query(True, description="Hash files to separate identical copies"),
+):
+    """Game files shipped by more than one mod, and which one wins."""
+    mod_conflicts.refresh(get_workshop_path())
+    conflicts = mod_conflicts.conflicts(mods, mod=mod, path=path, with_hashes=hashes)
+    return {
+        "success": True,
+        "conflicts": conflicts,
+        "overrides": sum(1 for c in conflicts if c.get("identical") is not True),
+        **mod_conflicts.stats(),
+    }
+
 @router.get("/projectzomboid/workshop-mods/file")
-async def get_mod_file(path: str = Query(..., description="Full path to the file in a mod folder")):
-    """Read content of a specific file in a mod folder."""
+def get_mod_file(
+    request: Request,
+    path: str = Query(..., description="Full path to the file in a mod folder"),
+    offset: int = Query(None, description="First line of the window to return"),
+    limit: int = Query(None, description="Number of lines to return"),
+):
+    """Read content of a specific file in a mod folder, windowed by lines when large."""
     if not os.path.isfile(path):
         return error_response("GAME_002", 404, f"File not found: {path}")
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
-        return {"success": True, "content": content}
+        return file_json_response(
+            request, path, lambda: {"success": True, **read_text_file(path, offset, limit)}
+        )
     except Exception as e:
         return error_response("BACKEND_001", 500, str(e))
 
+@router.get("/projectzomboid/workshop-mods/file/raw")
+def get_mod_file_raw(request: Request, path: str = Query(..., description="Full path to the file in a mod folder")):
+    """Stream the raw bytes of a mod file, honouring Range requests."""
+    if not os.path.isfile(path):
+        return error_response("GAME_002", 404, f"File not found: {path}")
+    return ranged_file_response(request, path)
+
 @router.post("/projectzomboid/workshop-mods/file/save")
 async def save_mod_file(request: Request):
     """Save content to a specific file in a mod folder."""
@@ -97,8 +151,36 @@ async def save_mod_file(request: Request):
     if not path or not os.path.isfile(path):
         return error_response("GAME_002", 404, f"File not found: {path}")
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
-        return {"success": True, "message": f"File saved: {path}"}
+        version = await run_in_threadpool(save_text, path, content, data.get("version"))
+        return {"success": True, "message": f"File saved: {path}", "version": version}
+    except VersionConflict as e:
+        return conflict_response(path, e)
+    except PatchError as e:
+        return error_response("BACKEND_003", 422, str(e))
+    except Exception as e:
+        return error_response("BACKEND_001", 500, str(e))
+
+@router.post("/projectzomboid/workshop-mods/file/patch")
+async def patch_mod_file(request: Request):
+    """Apply a unified diff or line edits to a mod file, guarded by its version token."""
+    data = await request.json()
+    path = data.get("path")
+    version = data.get("version")
+    if not path or not os.path.isfile(path):
+        return error_response("GAME_002", 404, f"File not found: {path}")
+    if not version:
+        return error_response("BACKEND_002", 400, "Missing version")
+    try:
+        if data.get("patch") is not None:
+            version = await run_in_threadpool(apply_patch, path, data["patch"], version)
+        elif data.get("edits") is not None:
+            version = await run_in_threadpool(apply_edits, path, data["edits"], version)
+        else:
+            return error_response("BACKEND_002", 400, "Send either patch or edits")
+        return {"success": True, "message": f"File patched: {path}", "version": version}
+    except VersionConflict as e:
+        return conflict_response(path, e)
+    except (PatchError, KeyError, TypeError) as e:
+        return error_response("BACKEND_003", 422, str(e))
     except Exception as e:
         return error_response("BACKEND_001", 500, str(e))
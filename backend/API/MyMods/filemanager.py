@@ -2,9 +2,19 @@
 import os
 import json
 import shutil
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
 
+from backend.services.dir_listing import list_dir, is_within
+from backend.services.mod_catalog import mod_catalog
+from backend.services.file_streaming import (
+    read_text_file, ranged_file_response, file_json_response, listing_json_response
+)
+from backend.services.file_patch import (
+    save_text, apply_edits, apply_patch, VersionConflict, PatchError
+)
+from backend.services import bulk_ops
+
 router = APIRouter()
 
 # ----------------------------
@@ -35,49 +45,18 @@ def set_active_game(game_id: str):
 def list_mods(game_id: str):
     """Scan mods for the active game"""
     game_path = os.path.join(BASE_STEAM_PATH, str(game_id))
-    if not os.path.exists(game_path):
-        return []
     mods = []
-    for mod_id in os.listdir(game_path):
-        mod_path = os.path.join(game_path, mod_id)
-        if os.path.isdir(mod_path):
-            mod_name_file = os.path.join(mod_path, "mod.info")
-            title = mod_id
-            if os.path.exists(mod_name_file):
-                try:
-                    with open(mod_name_file, "r", encoding="utf-8") as f:
-                        title = f.read().strip()
-                except:
-                    pass
-            mods.append({"modId": mod_id, "title": title, "path": mod_path})
+    for mod in mod_catalog.mods(game_path):
+        title = mod["name"] or mod["id"]
+        mods.append({"modId": mod["id"], "title": title, "path": mod["path"]})
     return mods
 
 
-def build_file_tree(root_path: str):
-    """Recursively build file tree"""
-    items = []
-    for name in os.listdir(root_path):
-        path = os.path.join(root_path, name)
-        if os.path.isdir(path):
-            items.append({
-                "type": "folder",
-                "name": name,
-                "path": path.replace("\\", "/"),
-                "children": build_file_tree(path)
-            })
-        else:
-            items.append({
-                "type": "file",
-                "name": name,
-                "path": path.replace("\\", "/")
-            })
-    return items
-
 # ----------------------------
 # Routes
 # ----------------------------
 @router.get("/filemanager/workshop-mods")
-async def get_workshop_mods():
+def get_workshop_mods():
     """Get mods for the active game"""
     active_game = get_active_game()
     if not active_game:
@@ -85,33 +64,103 @@ async def get_workshop_mods():
     mods_list = list_mods(active_game)
     mods = []
     for m in mods_list:
-        files = build_file_tree(m["path"])
-        mods.append({"modId": m["modId"], "title": m["title"], "files": files})
+        # top level only; deeper levels come from /filemanager/list on demand
+        top = list_dir(m["path"])
+        mods.append({
+            "modId": m["modId"],
+            "title": m["title"],
+            "files": top["items"],
+            "filesCursor": top["next_cursor"],
+        })
     return {"mods": mods}
 
 
+@router.get("/filemanager/list")
+def list_directory(
+    request: Request,
+    path: str = Query(...),
+    cursor: str = Query(None),
+    limit: int = Query(200),
+    sort: str = Query("name"),
+    order: str = Query("asc"),
+):
+    """List one directory level of a mod, paginated by cursor"""
+    if not is_within(path, [BASE_STEAM_PATH]):
+        raise HTTPException(status_code=403, detail="Path outside workshop folder")
+    try:
+        return listing_json_response(
+            request, path,
+            lambda: list_dir(path, cursor=cursor, limit=limit, sort=sort, order=order),
+        )
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/filemanager/file")
-async def get_file(path: str = Query(...)):
+def get_file(
+    request: Request,
+    path: str = Query(...),
+    offset: int = Query(None),
+    limit: int = Query(None),
+):
+    """Small text files whole, large ones as a window of lines"""
     if not path or not os.path.exists(path):
         return {"content": ""}
-    with open(path, "r", encoding="utf-8") as f:
-        content = f.read()
-    return {"content": content}
+    return file_json_response(request, path, lambda: read_text_file(path, offset, limit))
+
+
+@router.get("/filemanager/file/raw")
+def get_file_raw(request: Request, path: str = Query(...)):
+    """Stream raw bytes, honouring Range requests"""
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return ranged_file_response(request, path)
 
 
 @router.post("/filemanager/file/save")
-async def save_file(payload: dict):
+def save_file(payload: dict):
     path = payload.get("path")
     content = payload.get("content")
     if not path or not os.path.exists(path):
         raise HTTPException(status_code=400, detail="File not found")
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(content)
-    return {"status": "ok"}
+    try:
+        version = save_text(path, content, payload.get("version"))
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.current})
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"status": "ok", "version": version}
+
+
+@router.post("/filemanager/file/patch")
+def patch_file(payload: dict):
+    """Apply a unified diff (`patch`) or line edits (`edits`) against `version`"""
+    path = payload.get("path")
+    version = payload.get("version")
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=400, detail="File not found")
+    if not version:
+        raise HTTPException(status_code=400, detail="Missing version")
+    try:
+        if payload.get("patch") is not None:
+            version = apply_patch(path, payload["patch"], version)
+        elif payload.get("edits") is not None:
+            version = apply_edits(path, payload["edits"], version)
+        else:
+            raise HTTPException(status_code=400, detail="Send either patch or edits")
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.current})
+    except (PatchError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"status": "ok", "version": version}
 
 
+# Plain `def` routes run in the threadpool, so rmtree and renames no longer
+# block the event loop.
 @router.post("/filemanager/file/delete")
-async def delete_file(payload: dict):
+def delete_file(payload: dict):
     path = payload.get("path")
     if not path or not os.path.exists(path):
         raise HTTPException(status_code=400, detail="File not found")
@@ -123,7 +172,7 @@ async def delete_file(payload: dict):
 
 
 @router.post("/filemanager/file/move")
-async def move_file(payload: dict):
+def move_file(payload: dict):
     src = payload.get("source")
     dest = payload.get("destination")
     if not src or not os.path.exists(src):
@@ -133,7 +182,7 @@ async def move_file(payload: dict):
 
 
 @router.post("/filemanager/file/new")
-async def new_file(payload: dict):
+def new_file(payload: dict):
     mod_id = payload.get("modId")
     folder_path = payload.get("folderPath", "")
     name = payload.get("name")
@@ -149,7 +198,7 @@ async def new_file(payload: dict):
 
 
 @router.post("/filemanager/folder/new")
-async def new_folder(payload: dict):
+def new_folder(payload: dict):
     mod_id = payload.get("modId")
     folder_path = payload.get("folderPath", "")
     folder_name = payload.get("folderName")
@@ -162,6 +211,24 @@ async def new_folder(payload: dict):
     return {"status": "ok"}
 
 
+@router.post("/filemanager/bulk")
+def bulk_operations(payload: dict):
+    """Queue copy/move/delete/mkdir operations on the bulk worker pool"""
+    try:
+        return bulk_ops.submit(payload.get("operations") or [], [BASE_STEAM_PATH])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/filemanager/bulk/{job_id}")
+def bulk_status(job_id: str):
+    """Progress and per-item results of a bulk job"""
+    job = bulk_ops.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 # ----------------------------
 # Active game management
 # ----------------------------
@@ -4,6 +4,9 @@ import json
 from fastapi import APIRouter, Request, Query
 from fastapi.responses import JSONResponse
 
+from backend.services.file_patch import save_text, VersionConflict, PatchError
+from backend.services.file_streaming import read_text_file
+
 router = APIRouter()
 
 # Default Steam Workshop folder for Project Zomboid
@@ -82,9 +85,7 @@ async def get_mod_file(path: str = Query(..., description="Full path to the file
     if not os.path.isfile(path):
         return error_response("GAME_002", 404, f"File not found: {path}")
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
-        return {"success": True, "content": content}
+        return {"success": True, **read_text_file(path)}
     except Exception as e:
         return error_response("BACKEND_001", 500, str(e))
 
@@ -97,8 +98,14 @@ async def save_mod_file(request: Request):
     if not path or not os.path.isfile(path):
         return error_response("GAME_002", 404, f"File not found: {path}")
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
-        return {"success": True, "message": f"File saved: {path}"}
+        version = save_text(path, content, data.get("version"))
+        return {"success": True, "message": f"File saved: {path}", "version": version}
+    except VersionConflict as e:
+        return JSONResponse(
+            {"success": False, "error": "BACKEND_004", "message": f"{e}: {path}", "version": e.current},
+            status_code=409,
+        )
+    except PatchError as e:
+        return error_response("BACKEND_003", 422, str(e))
     except Exception as e:
         return error_response("BACKEND_001", 500, str(e))
@@ -9,6 +9,7 @@ from contextlib import asynccontextmanager
 from backend.API.Core.auth import auth_router
 from backend.games_api import router as games_router
 from backend.filemanager import router as filemanager_router
+from backend.file_search_api import router as file_search_router
 from backend.API.Core.workshop_api import workshop_api
 from backend.modupdates_api import router as modupdates_router
 from backend.server_scheduler import router as scheduler_router
@@ -16,6 +17,9 @@ from backend.serverports import router as serverports_router
 from backend.performance import router as performance_router
 from backend.sidebar_api import router as sidebar_router
 from backend.steam_installer import router as steam_installer_router
+from backend.steam.steam_install_api import router as steamcmd_router
+from backend.steam.workshop_details import close_client as close_steam_client
+from backend.steam.scheduler import install_scheduler
 from backend.zomboid_backup_api import router as zomboid_backup_router
 
 # ---------------- TERMINAL ----------------
@@ -42,6 +46,8 @@ async def lifespan(app: FastAPI):
     loop = asyncio.get_running_loop()
     set_event_loop(loop)
     yield
+    await install_scheduler.shutdown()
+    await close_steam_client()
 
 
 # ---------------- APP ----------------
@@ -74,6 +80,7 @@ app.include_router(active_game_router, prefix="/api")
 
 # CORE SYSTEMS
 app.include_router(filemanager_router, prefix="/api/filemanager")
+app.include_router(file_search_router, prefix="/api/files")
 app.include_router(workshop_api.router, prefix="/api/workshop")
 app.include_router(modupdates_router, prefix="/api/mods")
 app.include_router(modupdates_router, prefix="/api/updater")
@@ -97,6 +104,7 @@ app.include_router(terminal_router)
 app.include_router(scheduler_router, prefix="/api/scheduler")
 app.include_router(serverports_router, prefix="/api/ports")
 app.include_router(steam_installer_router, prefix="/api/steam")
+app.include_router(steamcmd_router, prefix="/api/steamcmd")
 app.include_router(zomboid_backup_router, prefix="/api/zomboid/backup")
 
 
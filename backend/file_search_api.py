@@ -0,0 +1,383 @@
+import os
+import re
+import json
+import time
+import fnmatch
+import sqlite3
+import asyncio
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from backend.modupdates_api import get_workshop_paths
+from backend.services.dir_index import dir_index
+from backend.services.steam_libraries import map_per_device
+
+router = APIRouter()
+
+# ---------------------------
+# Config
+# ---------------------------
+ZOMBOID_DIR = os.path.expanduser("~/Zomboid")
+SEARCH_SCOPES = {
+    "server": os.path.join(ZOMBOID_DIR, "Server"),
+    "lua": os.path.join(ZOMBOID_DIR, "Lua"),
+}
+
+INDEX_DB = os.path.expanduser("~/.modix/search_index.db")
+
+BATCH_FILES = 64
+MAX_FILE_SIZE = 20 * 1024 * 1024
+MAX_INDEXED_FILE_SIZE = 2 * 1024 * 1024
+MAX_LINE_LENGTH = 300
+SNIFF_BYTES = 8192
+
+# a regex can backtrack for ages inside a worker, where it cannot be
+# interrupted: patterns are capped, and a search past its deadline stops
+# and replaces the workers
+MAX_PATTERN_LENGTH = 500
+SEARCH_TIMEOUT = 30.0
+# batches queued per search; the rest are only submitted as these finish,
+# so a client that goes away leaves little work behind
+IN_FLIGHT_PER_WORKER = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+index_status = {"running": False, "files": 0, "indexed": 0, "finished": None, "error": None}
+
+
+def pool_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forking a threaded server can copy held locks into the child;
+            # forkserver children start from a clean process instead
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=pool_workers(),
+                mp_context=multiprocessing.get_context(method),
+            )
+        return _pool
+
+
+def reset_pool(pool: ProcessPoolExecutor):
+    """Kill `pool`'s workers; the next get_pool() starts fresh ones."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------------------------
+# Workers (run in child processes)
+# ---------------------------
+def _read_text(path: str, limit: int):
+    try:
+        if os.path.getsize(path) > limit:
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if b"\0" in data[:SNIFF_BYTES]:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+def search_batch(paths: list[str], query: str, is_regex: bool, case_sensitive: bool, per_file: int):
+    flags = 0 if case_sensitive else re.IGNORECASE
+    pattern = re.compile(query if is_regex else re.escape(query), flags)
+    needle = query if case_sensitive else query.lower()
+
+    results = []
+    for path in paths:
+        text = _read_text(path, MAX_FILE_SIZE)
+        if text is None:
+            continue
+        haystack = text if case_sensitive else text.lower()
+        # cheap whole-file reject before splitting into lines
+        if not is_regex and needle not in haystack:
+            continue
+        if is_regex and not pattern.search(text):
+            continue
+
+        found = 0
+        for line_no, line in enumerate(text.splitlines(), 1):
+            match = pattern.search(line)
+            if not match:
+                continue
+            results.append({
+                "path": path,
+                "line": line_no,
+                "column": match.start() + 1,
+                "text": line[:MAX_LINE_LENGTH],
+            })
+            found += 1
+            if found >= per_file:
+                break
+    return results
+
+
+def trigrams_batch(paths: list[str]):
+    out = []
+    for path in paths:
+        text = _read_text(path, MAX_INDEXED_FILE_SIZE)
+        if text is None:
+            out.append((path, None))
+            continue
+        text = text.lower()
+        out.append((path, {text[i:i + 3] for i in range(len(text) - 2)}))
+    return out
+
+
+# ---------------------------
+# File enumeration
+# ---------------------------
+def resolve_roots(scopes: list[str]) -> list[str]:
+    roots = []
+    for scope in scopes:
+        if scope == "workshop":
+            roots.extend(get_workshop_paths())
+        elif scope in SEARCH_SCOPES:
+            roots.append(SEARCH_SCOPES[scope])
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown scope: {scope}")
+    return roots
+
+
+def iter_files(roots: list[str], include: str | None):
+    """Yield (path, size, mtime) from the directory index, no extra stat calls."""
+    # first use indexes each root; roots on different disks are walked concurrently
+    watched = map_per_device(dir_index.watch, roots)
+    for root, ok in zip(roots, watched):
+        if ok is not True:
+            continue
+        for folder, entries in dir_index.walk(root):
+            for name, (is_dir, size, mtime) in entries.items():
+                if is_dir or (include and not fnmatch.fnmatch(name, include)):
+                    continue
+                yield os.path.join(folder, name), size, mtime
+
+
+def batches(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------------------------
+# Trigram index (optional)
+# ---------------------------
+def open_index() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(INDEX_DB), exist_ok=True)
+    conn = sqlite3.connect(INDEX_DB)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files ("
+        "id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime REAL, indexed INTEGER)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS trigrams ("
+        "tri TEXT, file_id INTEGER, PRIMARY KEY (tri, file_id)) WITHOUT ROWID"
+    )
+    return conn
+
+
+def build_index(roots: list[str]):
+    """Re-index only files whose size or mtime changed since the last run."""
+    index_status.update(running=True, files=0, indexed=0, error=None)
+    conn = open_index()
+    try:
+        known = {path: (fid, size, mtime) for fid, path, size, mtime in
+                 conn.execute("SELECT id, path, size, mtime FROM files")}
+        seen = set()
+        stale = []
+        for path, size, mtime in iter_files(roots, None):
+            seen.add(path)
+            index_status["files"] += 1
+            row = known.get(path)
+            if row is None or row[1] != size or row[2] != mtime:
+                stale.append((path, size, mtime))
+
+        for path in set(known) - seen:
+            conn.execute("DELETE FROM trigrams WHERE file_id = ?", (known[path][0],))
+            conn.execute("DELETE FROM files WHERE id = ?", (known[path][0],))
+
+        meta = {path: (size, mtime) for path, size, mtime in stale}
+        pool = get_pool()
+        futures = [pool.submit(trigrams_batch, [p for p, _, _ in batch])
+                   for batch in batches(stale, BATCH_FILES)]
+        for future in futures:
+            for path, grams in future.result():
+                size, mtime = meta[path]
+                row = known.get(path)
+                if row:
+                    conn.execute("DELETE FROM trigrams WHERE file_id = ?", (row[0],))
+                    conn.execute(
+                        "UPDATE files SET size = ?, mtime = ?, indexed = ? WHERE id = ?",
+                        (size, mtime, int(grams is not None), row[0]),
+                    )
+                    file_id = row[0]
+                else:
+                    file_id = conn.execute(
+                        "INSERT INTO files (path, size, mtime, indexed) VALUES (?, ?, ?, ?)",
+                        (path, size, mtime, int(grams is not None)),
+                    ).lastrowid
+                if grams:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO trigrams (tri, file_id) VALUES (?, ?)",
+                        ((g, file_id) for g in grams),
+                    )
+                index_status["indexed"] += 1
+            conn.commit()
+    except Exception as e:
+        index_status["error"] = str(e)
+    finally:
+        conn.close()
+        index_status.update(running=False, finished=time.time())
+
+
+def index_candidates(files: list[tuple], query: str) -> list[str]:
+    """
+    Narrow the file list with the trigram index. Files that are new, changed
+    since indexing or too large to index are always searched.
+    """
+    grams = {query.lower()[i:i + 3] for i in range(len(query) - 2)}
+    conn = open_index()
+    try:
+        rows = {path: (fid, size, mtime, indexed) for fid, path, size, mtime, indexed in
+                conn.execute("SELECT id, path, size, mtime, indexed FROM files")}
+        matching = None
+        for gram in grams:
+            ids = {fid for (fid,) in conn.execute("SELECT file_id FROM trigrams WHERE tri = ?", (gram,))}
+            matching = ids if matching is None else matching & ids
+            if not matching:
+                break
+        matching = matching or set()
+    finally:
+        conn.close()
+
+    candidates = []
+    for path, size, mtime in files:
+        row = rows.get(path)
+        if row is None or not row[3] or row[1] != size or row[2] != mtime or row[0] in matching:
+            candidates.append(path)
+    return candidates
+
+
+# ---------------------------
+# API Routes
+# ---------------------------
+@router.get("/search")
+async def search_files(
+    q: str = Query(..., min_length=1),
+    regex: bool = Query(False),
+    case_sensitive: bool = Query(False),
+    scope: list[str] = Query(["workshop", "server", "lua"]),
+    include: str = Query(None, description="Filename glob, e.g. *.lua"),
+    max_results: int = Query(1000, le=10000),
+    per_file: int = Query(50),
+    use_index: bool = Query(False),
+):
+    """
+    Search mod and server files in parallel worker processes. Results are
+    streamed as NDJSON, one match per line, as soon as each batch finishes;
+    the last line is a summary object (`timed_out` after SEARCH_TIMEOUT).
+    """
+    if len(q) > MAX_PATTERN_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Query longer than {MAX_PATTERN_LENGTH} characters")
+    if regex:
+        try:
+            re.compile(q)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Invalid regex: {e}")
+
+    roots = resolve_roots(scope)
+    files = await asyncio.to_thread(lambda: list(iter_files(roots, include)))
+
+    if use_index and not regex and len(q) >= 3 and os.path.exists(INDEX_DB):
+        paths = await asyncio.to_thread(index_candidates, files, q)
+    else:
+        paths = [path for path, _, _ in files]
+
+    async def stream():
+        started = time.monotonic()
+        deadline = started + SEARCH_TIMEOUT
+        pool = get_pool()
+        queued = batches(paths, BATCH_FILES)
+        in_flight = pool_workers() * IN_FLIGHT_PER_WORKER
+        pending = set()
+        sent = 0
+        timed_out = False
+        try:
+            while True:
+                for batch in itertools.islice(queued, in_flight - len(pending)):
+                    pending.add(asyncio.wrap_future(
+                        pool.submit(search_batch, batch, q, regex, case_sensitive, per_file)
+                    ))
+                if not pending or sent >= max_results:
+                    break
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    timed_out = True
+                    break
+                for future in done:
+                    for match in future.result():
+                        if sent >= max_results:
+                            break
+                        yield json.dumps(match) + "\n"
+                        sent += 1
+        finally:
+            # also runs when the client disconnects mid-stream
+            for future in pending:
+                future.cancel()
+        if timed_out and regex:
+            # the batches still running may never finish
+            reset_pool(pool)
+
+        yield json.dumps({
+            "done": True,
+            "matches": sent,
+            "files_searched": len(paths),
+            "truncated": sent >= max_results,
+            "timed_out": timed_out,
+            "elapsed_ms": int((time.monotonic() - started) * 1000),
+        }) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.post("/search/index")
+async def rebuild_search_index(scope: list[str] = Query(["workshop", "server", "lua"])):
+    """Start an incremental trigram index build in the background."""
+    if index_status["running"]:
+        return {"started": False, "status": index_status}
+    roots = resolve_roots(scope)
+    index_status["running"] = True
+    threading.Thread(target=build_index, args=(roots,), daemon=True).start()
+    return {"started": True, "status": index_status}
+
+
+@router.get("/search/index")
+async def search_index_status():
+    return {"exists": os.path.exists(INDEX_DB), "status": index_status}
@@ -1,8 +1,21 @@
 import os
-import re
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from urllib.parse import quote
 from pydantic import BaseModel
 
+from backend.services.dir_listing import list_dir, is_within
+from backend.services.mod_catalog import mod_catalog
+from backend.services.file_streaming import (
+    read_text_file, ranged_file_response, file_json_response, listing_json_response
+)
+from backend.services.file_patch import (
+    save_text, apply_edits, apply_patch, VersionConflict, PatchError
+)
+from backend.services import bulk_ops
+from backend.services.zip_stream import stream_zip
+from backend.services.steam_libraries import workshop_content_dirs
+
 router = APIRouter()
 
 # -------------------------
@@ -24,64 +37,8 @@ GAME_APPIDS = {
 # FIND STEAM LIBRARIES (MULTI-DRIVE)
 # -------------------------
 def get_steam_libraries():
-    paths = []
-
-    default = os.path.expanduser("~/.local/share/Steam")
-    vdf_path = os.path.join(default, "steamapps/libraryfolders.vdf")
-
-    if os.path.exists(vdf_path):
-        try:
-            with open(vdf_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read()
-
-            # crude but reliable path extraction
-            matches = re.findall(r'"path"\s+"([^"]+)"', content)
-
-            for m in matches:
-                steamapps = os.path.join(m, "steamapps/workshop/content")
-                paths.append(steamapps)
-
-        except Exception:
-            pass
-
-    # fallback default install
-    paths.append(os.path.join(default, "steamapps/workshop/content"))
-
-    # remove duplicates
-    return list(set(paths))
-
-
-# -------------------------
-# SAFE TREE
-# -------------------------
-def build_tree(path):
-    items = []
-
-    try:
-        if not os.path.exists(path):
-            return items
-
-        for name in os.listdir(path):
-            full = os.path.join(path, name)
-
-            if os.path.isdir(full):
-                items.append({
-                    "type": "folder",
-                    "name": name,
-                    "path": full,
-                    "children": build_tree(full)
-                })
-            else:
-                items.append({
-                    "type": "file",
-                    "name": name,
-                    "path": full
-                })
-
-    except Exception:
-        return []
-
-    return items
+    """workshop/content folders of every Steam library (cached per libraryfolders.vdf mtime)."""
+    return workshop_content_dirs()
 
 
 # -------------------------
@@ -105,23 +62,18 @@ def workshop_mods(game: str = Query(None)):
 
         mods = []
 
-        # search ALL steam libraries
-        for base in libraries:
-            workshop_path = os.path.join(base, appid)
-
-            if not os.path.exists(workshop_path):
-                continue
-
-            for mod_id in os.listdir(workshop_path):
-                mod_path = os.path.join(workshop_path, mod_id)
-
-                if os.path.isdir(mod_path):
-                    mods.append({
-                        "id": mod_id,
-                        "name": f"Mod {mod_id}",
-                        "path": mod_path,
-                        "files": build_tree(mod_path)
-                    })
+        # search ALL steam libraries (each one is synced on its own worker)
+        workshop_paths = [os.path.join(base, appid) for base in libraries]
+        for mod in mod_catalog.mods(workshop_paths):
+            # top level only; deeper levels come from /list on demand
+            top = list_dir(mod["path"])
+            mods.append({
+                "id": mod["id"],
+                "name": mod["name"] or f"Mod {mod['id']}",
+                "path": mod["path"],
+                "files": top["items"],
+                "files_cursor": top["next_cursor"]
+            })
 
         return {
             "game": game,
@@ -134,28 +86,132 @@ def workshop_mods(game: str = Query(None)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# -------------------------
+# LAZY DIRECTORY LISTING
+# -------------------------
+@router.get("/list")
+def list_directory(
+    request: Request,
+    path: str = Query(...),
+    cursor: str = Query(None),
+    limit: int = Query(200),
+    sort: str = Query("name"),
+    order: str = Query("asc"),
+):
+    if not is_within(path, get_steam_libraries()):
+        raise HTTPException(status_code=403, detail="Path outside Steam workshop libraries")
+
+    try:
+        return listing_json_response(
+            request, path,
+            lambda: list_dir(path, cursor=cursor, limit=limit, sort=sort, order=order)
+        )
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# -------------------------
+# BULK OPERATIONS
+# -------------------------
+class BulkRequest(BaseModel):
+    operations: list[dict]
+
+
+@router.post("/bulk")
+def bulk_operations(data: BulkRequest):
+    try:
+        return bulk_ops.submit(data.operations, get_steam_libraries())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/bulk/{job_id}")
+def bulk_status(job_id: str):
+    job = bulk_ops.get_job(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
+# -------------------------
+# FOLDER AS ZIP
+# -------------------------
+ZOMBOID_DIR = os.path.expanduser("~/Zomboid")
+
+
+@router.get("/zip")
+def download_folder_zip(path: str = Query(...), mode: str = Query("auto")):
+    if mode not in ("auto", "store", "deflate"):
+        raise HTTPException(status_code=400, detail="mode must be auto, store or deflate")
+
+    if not is_within(path, get_steam_libraries() + [ZOMBOID_DIR]):
+        raise HTTPException(status_code=403, detail="Path outside allowed folders")
+
+    if not os.path.isdir(path):
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    name = os.path.basename(path.rstrip("/\\")) or "folder"
+
+    return StreamingResponse(
+        stream_zip(path, mode),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(name)}.zip"}
+    )
+
+
 # -------------------------
 # FILE OPEN
 # -------------------------
 @router.get("/file")
-def open_file(path: str = Query(...)):
+def open_file(
+    request: Request,
+    path: str = Query(...),
+    offset: int = Query(None),
+    limit: int = Query(None),
+):
     try:
         if not os.path.exists(path):
             return {"content": ""}
 
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return {"content": f.read()}
+        return file_json_response(request, path, lambda: read_text_file(path, offset, limit))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/file/raw")
+def open_file_raw(request: Request, path: str = Query(...)):
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return ranged_file_response(request, path)
+
+
 # -------------------------
 # SAVE FILE
 # -------------------------
 class SaveFile(BaseModel):
     path: str
     content: str
+    version: str | None = None
+
+
+class PatchFile(BaseModel):
+    path: str
+    version: str
+    patch: str | None = None
+    edits: list[dict] | None = None
+
+
+def conflict(e: VersionConflict):
+    return HTTPException(
+        status_code=409,
+        detail={"message": str(e), "version": e.current}
+    )
 
 
 @router.post("/file/save")
@@ -163,10 +219,44 @@ def save_file(data: SaveFile):
     try:
         os.makedirs(os.path.dirname(data.path), exist_ok=True)
 
-        with open(data.path, "w", encoding="utf-8") as f:
-            f.write(data.content)
+        version = save_text(data.path, data.content, data.version)
+
+        return {"ok": True, "version": version}
+
+    except VersionConflict as e:
+        raise conflict(e)
+
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# -------------------------
+# PATCH FILE
+# -------------------------
+@router.post("/file/patch")
+def patch_file(data: PatchFile):
+    if not os.path.isfile(data.path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if (data.patch is None) == (data.edits is None):
+        raise HTTPException(status_code=400, detail="Send either patch or edits")
+
+    try:
+        if data.patch is not None:
+            version = apply_patch(data.path, data.patch, data.version)
+        else:
+            version = apply_edits(data.path, data.edits, data.version)
+
+        return {"ok": True, "version": version}
+
+    except VersionConflict as e:
+        raise conflict(e)
 
-        return {"ok": True}
+    except (PatchError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,10 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
-import os
 import time
-import json
-import platform
-import re
+import asyncio
+
+from backend.services.mod_catalog import mod_catalog
+from backend.services import steam_libraries
+from backend.services.content_hash import content_hasher
+from backend.services.mod_events import mod_events
+from backend.steam.workshop_details import sync_details
 
 router = APIRouter()
 
@@ -12,83 +15,67 @@ def get_steam_library_paths() -> list[str]:
     """
     Detect all Steam library folders on Windows/Linux.
     This includes the default Steam path and any additional libraries
-    from libraryfolders.vdf.
+    from libraryfolders.vdf (cached until the file changes).
     """
-    system = platform.system()
-    base_paths = []
-
-    if system == "Windows":
-        possible_roots = [
-            os.path.expandvars(r"%ProgramFiles(x86)%\Steam"),
-            os.path.expandvars(r"%ProgramFiles%\Steam"),
-            os.path.expanduser(r"~\Steam"),
-        ]
-    else:
-        possible_roots = [
-            os.path.expanduser("~/Steam"),
-            os.path.expanduser("~/.steam/steam"),
-            os.path.expanduser("~/.local/share/Steam"),
-        ]
-
-    for root in possible_roots:
-        steamapps = os.path.join(root, "steamapps")
-        if os.path.isdir(steamapps):
-            base_paths.append(steamapps)
-
-            # Also parse libraryfolders.vdf for other Steam libraries
-            vdf_path = os.path.join(steamapps, "libraryfolders.vdf")
-            if os.path.isfile(vdf_path):
-                try:
-                    with open(vdf_path, "r", encoding="utf-8") as f:
-                        data = f.read()
-                        # Look for lines like: "1" "D:\\SteamLibrary"
-                        matches = re.findall(r'"\d+"\s+"([^"]+)"', data)
-                        for match in matches:
-                            path = os.path.join(match, "steamapps")
-                            if os.path.isdir(path):
-                                base_paths.append(path)
-                except Exception:
-                    pass
-
-    return list(set(base_paths))  # Remove duplicates
+    return steam_libraries.steamapps_dirs()
 
 
 def get_workshop_paths() -> list[str]:
     """
     Get all possible Project Zomboid Workshop content paths.
     """
-    library_paths = get_steam_library_paths()
-    workshop_paths = []
-    for path in library_paths:
-        content_path = os.path.join(path, "workshop", "content", "108600")
-        if os.path.isdir(content_path):
-            workshop_paths.append(content_path)
-    return workshop_paths
+    return steam_libraries.workshop_paths("108600")
 
 
-def parse_mod_info(file_path: str) -> dict:
-    """
-    Parse mod.info file (text-based) and return a dictionary of key-value pairs.
-    """
-    info = {}
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if "=" in line:
-                    key, value = line.split("=", 1)
-                    info[key.strip()] = value.strip().strip('"')
-    except Exception:
-        pass
-    return info
+def mod_update_record(mod: dict) -> dict:
+    """Shape a catalog row the way the update views expect it."""
+    mod_id = mod["id"]
+    mod_data = {"id": mod_id, "folder": mod["path"]}
+
+    info = mod["info"]
+    if info:
+        mod_data["name"] = info.get("name", f"Mod {mod_id}")
+        mod_data["description"] = info.get("description", "No description.")
+        mod_data["poster"] = info.get("poster", None)
+        mod_data["version"] = info.get("version", "unknown")
+        mod_data["mod_id"] = info.get("id", mod_id)
+    else:
+        mod_data["name"] = f"Mod {mod_id}"
+        mod_data["description"] = "No mod.info file found."
+        mod_data["version"] = "unknown"
+        mod_data["mod_id"] = mod_id
+
+    mod_data["lastModified"] = int(mod["mtime"])
+    mod_data["localVersion"] = time.strftime(
+        "%Y-%m-%d %H:%M:%S", time.localtime(mod_data["lastModified"])
+    )
+
+    remote = mod.get("remote")
+    if remote and remote["result"] == 1:
+        mod_data["remoteTitle"] = remote["title"]
+        mod_data["remoteUpdated"] = remote["time_updated"]
+        mod_data["remoteSize"] = remote["file_size"]
+        mod_data["remoteChecked"] = int(remote["checked"])
+        mod_data["outdated"] = (remote["time_updated"] or 0) > mod_data["lastModified"]
+    else:
+        mod_data["outdated"] = None
+    return mod_data
 
 
 @router.get("/mods/updates")
-async def get_mod_updates():
+async def get_mod_updates(
+    check_remote: bool = Query(False, description="Refresh Steam Workshop details first"),
+    force: bool = Query(False, description="Ignore the details cache"),
+    content: bool = Query(False, description="Include Merkle content versions"),
+):
     """
     Returns all locally installed Project Zomboid Steam Workshop mods with metadata.
     Includes lastModified timestamp for live detection.
     Supports multiple Steam library locations.
+    With check_remote, Workshop details are fetched in batches (one request
+    per 100 items) and each mod is flagged `outdated` when Steam has a newer
+    upload than the local copy. With content, each mod also gets a content
+    version that only changes when file contents do (not on a folder touch).
     """
     workshop_paths = get_workshop_paths()
     if not workshop_paths:
@@ -97,38 +84,77 @@ async def get_mod_updates():
             status_code=404,
         )
 
-    mods = []
-    for workshop_path in workshop_paths:
-        for mod_id in os.listdir(workshop_path):
-            mod_folder = os.path.join(workshop_path, mod_id)
-            if not os.path.isdir(mod_folder):
-                continue
-
-            mod_info_path = os.path.join(mod_folder, "mod.info")
-            mod_data = {"id": mod_id, "folder": mod_folder}
-
-            if os.path.isfile(mod_info_path):
-                info = parse_mod_info(mod_info_path)
-                mod_data["name"] = info.get("name", f"Mod {mod_id}")
-                mod_data["description"] = info.get("description", "No description.")
-                mod_data["poster"] = info.get("poster", None)
-                mod_data["version"] = info.get("version", "unknown")
-                mod_data["mod_id"] = info.get("id", mod_id)
-            else:
-                mod_data["name"] = f"Mod {mod_id}"
-                mod_data["description"] = "No mod.info file found."
-                mod_data["version"] = "unknown"
-                mod_data["mod_id"] = mod_id
+    # the catalog reconciles against disk and SQLite: keep it off the event loop
+    catalog = await asyncio.to_thread(mod_catalog.mods, workshop_paths)
+    result = {}
+    if check_remote and catalog:
+        result["sync"] = await sync_details([mod["id"] for mod in catalog], force=force)
+        catalog = await asyncio.to_thread(mod_catalog.mods, workshop_paths)
+
+    mods = [mod_update_record(mod) for mod in catalog]
+    if content:
+        for mod, record in zip(catalog, mods):
+            version = await asyncio.to_thread(content_hasher.version, mod["path"])
+            record["contentVersion"] = version["version"]
+            record["contentChangedAt"] = int(version["changedAt"])
+    result.update(mods=mods, count=len(mods), outdated=sum(1 for m in mods if m["outdated"]))
+    return result
+
+
+@router.get("/mods/content/{workshop_id}")
+async def get_mod_content(workshop_id: str, manifest: bool = Query(False)):
+    """
+    Content version of one installed mod and the files that changed when it
+    last moved. Only files whose inode, size or mtime changed are re-hashed.
+    """
+    for mod in await asyncio.to_thread(mod_catalog.mods, get_workshop_paths()):
+        if mod["id"] == workshop_id:
+            return await asyncio.to_thread(content_hasher.version, mod["path"], manifest)
+    raise HTTPException(status_code=404, detail=f"Mod {workshop_id} is not installed")
+
 
+@router.websocket("/mods/events")
+async def mod_events_ws(websocket: WebSocket):
+    """
+    Pushes {"type": "mod_added" | "mod_updated" | "mod_removed", "mod": {...}}
+    as workshop folders change, instead of polling /mods/updates. Bursts
+    (e.g. a SteamCMD batch) are reported once they settle. A client that
+    falls too far behind gets {"type": "resync"} and should reload the list.
+    """
+    await websocket.accept()
+    roots = get_workshop_paths()
+    queue = await mod_events.subscribe(roots)
+
+    async def forward():
+        try:
+            while True:
+                event = await queue.get()
+                if event["event"] == "resync":
+                    await websocket.send_json({"type": "resync"})
+                else:
+                    await websocket.send_json({"type": event["event"], "mod": mod_update_record(event["mod"])})
+        except Exception:
+            # broken socket: close it; the subscription ends with this task
             try:
-                mod_data["lastModified"] = int(os.path.getmtime(mod_folder))
-                mod_data["localVersion"] = time.strftime(
-                    "%Y-%m-%d %H:%M:%S", time.localtime(mod_data["lastModified"])
-                )
+                await websocket.close()
             except Exception:
-                mod_data["lastModified"] = 0
-                mod_data["localVersion"] = "unknown"
+                pass
 
-            mods.append(mod_data)
+    async def receive():
+        # clients send nothing; reading is how a disconnect is noticed
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
 
-    return {"mods": mods, "count": len(mods)}
+    try:
+        await websocket.send_json({"type": "subscribed", "roots": roots})
+        tasks = [asyncio.create_task(forward()), asyncio.create_task(receive())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+    finally:
+        mod_events.unsubscribe(queue)
@@ -0,0 +1,222 @@
+import os
+import time
+import uuid
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services.dir_listing import is_within, invalidate
+
+MAX_WORKERS = 4
+# workers one batch may hold, so a big batch leaves room for others
+WORKERS_PER_JOB = 2
+MAX_OPS = 5000
+KEEP_FINISHED_JOBS = 50
+
+OPERATIONS = ("copy", "move", "delete", "mkdir")
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="bulk-ops")
+_lock = threading.Lock()
+
+jobs = {}  # job_id -> job dict (see create_job)
+
+
+# ---------------- VALIDATION ----------------
+def validate_ops(ops: list[dict], roots: list[str]) -> list[dict]:
+    """Check every path up front so a bad entry rejects the whole batch."""
+    if not ops:
+        raise ValueError("No operations given")
+    if len(ops) > MAX_OPS:
+        raise ValueError(f"At most {MAX_OPS} operations per request")
+
+    clean = []
+    for n, op in enumerate(ops):
+        kind = op.get("op")
+        if kind not in OPERATIONS:
+            raise ValueError(f"Operation {n}: unknown op '{kind}'")
+
+        if kind in ("copy", "move"):
+            src, dest = op.get("source"), op.get("destination")
+            if not src or not dest:
+                raise ValueError(f"Operation {n}: source and destination required")
+            paths = {"source": src, "destination": dest}
+        else:
+            path = op.get("path")
+            if not path:
+                raise ValueError(f"Operation {n}: path required")
+            paths = {"path": path}
+
+        for key, value in paths.items():
+            if not is_within(value, roots):
+                raise ValueError(f"Operation {n}: path outside allowed folders: {value}")
+            # is_within accepts a root itself, which must never be deleted, moved or moved onto
+            if key == "destination" and kind != "move" or kind == "mkdir":
+                continue
+            if _is_root(value, roots):
+                raise ValueError(f"Operation {n}: {key} cannot be an allowed root folder: {value}")
+        clean.append({"op": kind, **paths})
+    return clean
+
+
+def _is_root(path: str, roots: list[str]) -> bool:
+    real = os.path.realpath(path)
+    return any(real == os.path.realpath(root) for root in roots)
+
+
+# ---------------- EXECUTION ----------------
+def _run(op: dict):
+    kind = op["op"]
+    if kind == "mkdir":
+        os.makedirs(op["path"], exist_ok=True)
+        return [os.path.dirname(op["path"])]
+
+    if kind == "delete":
+        path = op["path"]
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        return [os.path.dirname(path)]
+
+    src, dest = op["source"], op["destination"]
+    if not os.path.exists(src):
+        raise FileNotFoundError(f"Source not found: {src}")
+    if os.path.isdir(dest):
+        dest = os.path.join(dest, os.path.basename(src.rstrip("/\\")))
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+    if kind == "move":
+        shutil.move(src, dest)
+    elif os.path.isdir(src):
+        shutil.copytree(src, dest)
+    else:
+        shutil.copy2(src, dest)
+    return [os.path.dirname(src), os.path.dirname(dest)]
+
+
+def _record(job: dict, index: int, op: dict, error: Exception | None):
+    with _lock:
+        result = job["results"][index]
+        result["status"] = "failed" if error else "done"
+        if error:
+            result["error"] = str(error)
+            job["failed"] += 1
+        job["done"] += 1
+        if job["done"] == job["total"]:
+            job["status"] = "failed" if job["failed"] == job["total"] else "done"
+            job["finished"] = time.time()
+
+
+def _execute(job: dict, index: int, op: dict):
+    with _lock:
+        job["results"][index]["status"] = "running"
+    try:
+        for folder in _run(op):
+            invalidate(folder)
+        _record(job, index, op, None)
+    except Exception as e:
+        _record(job, index, op, e)
+
+
+def _run_chains(job: dict, chains: deque, ops: list[dict]):
+    while True:
+        try:
+            chain = chains.popleft()
+        except IndexError:
+            return
+        for index in chain:
+            _execute(job, index, ops[index])
+
+
+def _op_paths(op: dict) -> list[str]:
+    keys = ("source", "destination") if op["op"] in ("copy", "move") else ("path",)
+    return [os.path.abspath(op[key]).rstrip(os.sep) or os.sep for key in keys]
+
+
+def _chains(ops: list[dict]) -> list[list[int]]:
+    """
+    Split a batch into chains of ops that touch overlapping paths (the same
+    path, or one inside the other). A chain keeps the request's order; ops
+    in different chains share no paths and may run at the same time.
+    """
+    parent = list(range(len(ops)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        parent[find(i)] = find(j)
+
+    exact = {}   # path -> an op using it
+    below = {}   # folder -> ops using a path inside it
+    for index, op in enumerate(ops):
+        for path in _op_paths(op):
+            if path in below:
+                for other in below[path]:
+                    union(index, other)
+                # they are one chain now: a single member stands for all
+                below[path] = [index]
+            folder = path
+            while True:
+                if folder in exact:
+                    union(index, exact[folder])
+                up = os.path.dirname(folder)
+                if up == folder:
+                    break
+                below.setdefault(up, []).append(index)
+                folder = up
+            exact[path] = index
+
+    chains = {}
+    for index in range(len(ops)):
+        chains.setdefault(find(index), []).append(index)
+    return list(chains.values())
+
+
+def _dispatch(job: dict, ops: list[dict]):
+    # each chain runs in order on one worker, so a mkdir, a copy into it and
+    # a later delete of the source happen as written; independent chains
+    # share at most WORKERS_PER_JOB workers and other batches get the rest
+    chains = deque(_chains(ops))
+    for _ in range(min(WORKERS_PER_JOB, len(chains))):
+        _pool.submit(_run_chains, job, chains, ops)
+
+
+def submit(ops: list[dict], roots: list[str]) -> dict:
+    ops = validate_ops(ops, roots)
+    job = {
+        "id": str(uuid.uuid4()),
+        "status": "running",
+        "total": len(ops),
+        "done": 0,
+        "failed": 0,
+        "created": time.time(),
+        "finished": None,
+        "results": [{**op, "status": "queued"} for op in ops],
+    }
+
+    with _lock:
+        jobs[job["id"]] = job
+        finished = [j for j in jobs.values() if j["finished"]]
+        for old in sorted(finished, key=lambda j: j["finished"])[:-KEEP_FINISHED_JOBS]:
+            del jobs[old["id"]]
+
+    _dispatch(job, ops)
+    return summary(job)
+
+
+def summary(job: dict, with_results: bool = False) -> dict:
+    with _lock:
+        data = {k: v for k, v in job.items() if k != "results"}
+        if with_results:
+            data["results"] = [dict(r) for r in job["results"]]
+        return data
+
+
+def get_job(job_id: str) -> dict | None:
+    job = jobs.get(job_id)
+    return summary(job, with_results=True) if job else None
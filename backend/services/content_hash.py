@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_DB = os.path.expanduser("~/.modix/content_hashes.db")
+HASH_WORKERS = 4
+HASH_BLOCK = 1024 * 1024
+MAX_IN_LIST = 500
+
+# hashlib releases the GIL on large updates, so threads hash in parallel
+_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="content-hash")
+
+
+def sha256_file(path: str) -> str | None:
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def merkle_root(manifest: dict) -> str:
+    """
+    Hash of a folder from {relative path: file hash}. Each folder hashes its
+    sorted children as "<type> <name> <hash>" lines, so the result only
+    depends on names and contents, never on timestamps.
+    """
+    tree = {}
+    for rel, digest in manifest.items():
+        node = tree
+        parts = rel.split("/")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = digest
+
+    def folder_hash(node: dict) -> str:
+        h = hashlib.sha256()
+        for name in sorted(node):
+            child = node[name]
+            if isinstance(child, dict):
+                h.update(f"d {name} {folder_hash(child)}\n".encode())
+            else:
+                h.update(f"f {name} {child}\n".encode())
+        return h.hexdigest()
+
+    return folder_hash(tree)
+
+
+def _walk(top: str) -> dict:
+    """{relative path: (abs path, (inode, size, mtime_ns))} for every regular file."""
+    files = {}
+    stack = [top]
+    while stack:
+        folder = stack.pop()
+        try:
+            it = os.scandir(folder)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        rel = os.path.relpath(entry.path, top).replace(os.sep, "/")
+                        files[rel] = (entry.path, (st.st_ino, st.st_size, st.st_mtime_ns))
+                except OSError:
+                    continue
+    return files
+
+
+class ContentHasher:
+    """
+    Content hashes for files and Merkle versions for folders.
+
+    File hashes are cached in SQLite by (inode, size, mtime), so a rescan only
+    reads files that actually changed. For every folder passed to version()
+    the last manifest is kept, which gives a per-file change set whenever the
+    content version moves.
+    """
+
+    def __init__(self, db_path: str = HASH_DB):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._folder_locks = {}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, ino INTEGER, size INTEGER, mtime_ns INTEGER, hash TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS folders ("
+                "path TEXT PRIMARY KEY, version TEXT, previous TEXT, manifest TEXT, "
+                "changes TEXT, changed_at REAL, computed REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _folder_lock(self, path: str) -> threading.Lock:
+        with self.lock:
+            return self._folder_locks.setdefault(path, threading.Lock())
+
+    # ---------- files ----------
+    def _hash_stale(self, files: dict, cached: dict) -> tuple[dict, int]:
+        """files: {key: (abs path, sig)}; cached: {abs path: (sig, hash)}."""
+        hashes = {}
+        stale = []
+        for key, (path, sig) in files.items():
+            row = cached.get(path)
+            if row and row[0] == sig:
+                hashes[key] = row[1]
+            else:
+                stale.append(key)
+
+        fresh = dict(zip(stale, _pool.map(sha256_file, [files[k][0] for k in stale])))
+        rows = [
+            (files[k][0], *files[k][1], digest)
+            for k, digest in fresh.items() if digest is not None
+        ]
+        if rows:
+            with self.lock:
+                conn = self._conn()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO files (path, ino, size, mtime_ns, hash) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+        hashes.update({k: d for k, d in fresh.items() if d is not None})
+        return hashes, len(stale)
+
+    def hash_files(self, paths) -> dict:
+        """{path: sha256 or None} for individual files, using the cache."""
+        files = {}
+        for path in set(paths):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files[path] = (path, (st.st_ino, st.st_size, st.st_mtime_ns))
+
+        cached = {}
+        conn = self._conn()
+        keys = list(files)
+        for i in range(0, len(keys), MAX_IN_LIST):
+            chunk = keys[i:i + MAX_IN_LIST]
+            marks = ",".join("?" * len(chunk))
+            for path, ino, size, mtime_ns, digest in conn.execute(
+                f"SELECT path, ino, size, mtime_ns, hash FROM files WHERE path IN ({marks})", chunk
+            ):
+                cached[path] = ((ino, size, mtime_ns), digest)
+
+        hashes, _ = self._hash_stale(files, cached)
+        return {path: hashes.get(path) for path in paths}
+
+    # ---------- folders ----------
+    def version(self, folder: str, with_manifest: bool = False) -> dict:
+        """
+        Merkle content version of `folder`, rehashing only changed files.
+        When it differs from the stored one, `changes` lists the files
+        added, removed and modified since the previous version.
+        """
+        folder = os.path.abspath(folder)
+        with self._folder_lock(folder):
+            started = time.monotonic()
+            files = _walk(folder)
+
+            # every cached file below the folder, via a range scan on the key
+            conn = self._conn()
+            lo, hi = folder + os.sep, folder + chr(ord(os.sep) + 1)
+            cached = {
+                path: ((ino, size, mtime_ns), digest)
+                for path, ino, size, mtime_ns, digest in conn.execute(
+                    "SELECT path, ino, size, mtime_ns, hash FROM files WHERE path >= ? AND path < ?",
+                    (lo, hi),
+                )
+            }
+            manifest, rehashed = self._hash_stale(files, cached)
+            version = merkle_root(manifest)
+
+            row = conn.execute(
+                "SELECT version, previous, manifest, changes, changed_at FROM folders WHERE path = ?",
+                (folder,),
+            ).fetchone()
+
+            now = time.time()
+            if row and row[0] == version:
+                previous, changes, changed_at = row[1], json.loads(row[3] or "null"), row[4]
+            else:
+                old = json.loads(row[2]) if row else None
+                previous = row[0] if row else None
+                changes = diff_manifests(old, manifest) if old is not None else None
+                # first sighting: date the version by its newest file
+                changed_at = now if row else max((sig[2] for _p, sig in files.values()), default=0) / 1e9
+
+            with self.lock:
+                present = {path for path, _sig in files.values()}
+                gone = [(path,) for path in cached if path not in present]
+                conn.executemany("DELETE FROM files WHERE path = ?", gone)
+                conn.execute(
+                    "INSERT OR REPLACE INTO folders "
+                    "(path, version, previous, manifest, changes, changed_at, computed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (folder, version, previous, json.dumps(manifest), json.dumps(changes), changed_at, now),
+                )
+                conn.commit()
+
+            result = {
+                "path": folder,
+                "version": version,
+                "previous": previous,
+                "changedAt": changed_at,
+                "changes": changes,
+                "files": len(manifest),
+                "rehashed": rehashed,
+                "elapsedMs": int((time.monotonic() - started) * 1000),
+            }
+            if with_manifest:
+                result["manifest"] = manifest
+            return result
+
+
+def diff_manifests(old: dict, new: dict) -> dict:
+    return {
+        "added": sorted(p for p in new if p not in old),
+        "removed": sorted(p for p in old if p not in new),
+        "modified": sorted(p for p in new if p in old and old[p] != new[p]),
+    }
+
+
+# shared instance
+content_hasher = ContentHasher()
@@ -0,0 +1,357 @@
+import os
+import sys
+import time
+import errno
+import ctypes
+import select
+import struct
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("uvicorn.error")
+
+POLL_INTERVAL = 30.0
+SCAN_WORKERS = 8
+
+# ---------------- INOTIFY (LINUX) ----------------
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """Minimal ctypes binding; raises OSError where inotify is unavailable."""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify requires Linux")
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str) -> int:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            yield wd, mask, os.fsdecode(name)
+
+
+# ---------------- SCAN ----------------
+# scandir/stat release the GIL, so listing several folders at once overlaps
+# the disk (or network share) latency
+_scan_pool = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="dir-scan")
+
+
+def scan_dir(path: str):
+    entries = {}
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries[entry.name] = (is_dir, 0 if is_dir else st.st_size, st.st_mtime)
+                if is_dir:
+                    subdirs.append(entry.path)
+    except OSError:
+        return None, []
+    return entries, subdirs
+
+
+def scan_tree(top: str, max_dirs: int | None = None):
+    """
+    Walk `top` once, a level at a time, listing the folders of each level in
+    parallel. Returns {dir: entries}, or None as soon as more than `max_dirs`
+    folders have been found.
+    """
+    dirs = {}
+    level = [top]
+    while level:
+        next_level = []
+        for path, (entries, subdirs) in zip(level, _scan_pool.map(scan_dir, level)):
+            if entries is None:
+                continue
+            dirs[path] = entries
+            next_level.extend(subdirs)
+        if max_dirs is not None and len(dirs) + len(next_level) > max_dirs:
+            return None
+        level = next_level
+    return dirs
+
+
+# ---------------- INDEX ----------------
+class DirectoryIndex:
+    """
+    In-memory mirror of watched folders.
+
+    Every directory below a watched root maps to {name: (is_dir, size, mtime)}.
+    The first watch() of a root walks it once; afterwards inotify events (or a
+    periodic rescan where inotify is unavailable) keep it current, and
+    `generation` is bumped on every change so callers can cache derived data.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.lock = threading.RLock()
+        self.roots = set()
+        self.dirs = {}       # dir path -> {name: (is_dir, size, mtime)}
+        self.generation = 0
+        self.resets = 0      # bumped when the whole index was rebuilt
+        self.listeners = []
+
+        self._wds = {}       # wd -> dir path
+        self._paths = {}     # dir path -> wd
+        self._inotify = None
+        self._thread = None
+
+        try:
+            self._inotify = Inotify()
+        except OSError as e:
+            logger.info(f"[DirIndex] inotify unavailable ({e}), polling every {poll_interval}s")
+
+    # ---------- public ----------
+    def watch(self, root: str, dirs: dict | None = None) -> bool:
+        """
+        Index `root` if needed (`dirs` is a fresh scan_tree of it, if the
+        caller already has one). Returns False when it does not exist.
+        """
+        root = os.path.abspath(root)
+        with self.lock:
+            if root in self.roots:
+                return True
+        if not os.path.isdir(root):
+            return False
+
+        # walk outside the lock so several roots can be indexed at once
+        if dirs is None:
+            dirs = scan_tree(root)
+        with self.lock:
+            if root in self.roots:
+                return True
+            self._store_tree(dirs)
+            self.roots.add(root)
+            self._bump({root})
+        self._ensure_thread()
+        return True
+
+    def covers(self, path: str) -> bool:
+        path = os.path.abspath(path)
+        with self.lock:
+            return any(path == r or path.startswith(r + os.sep) for r in self.roots)
+
+    def children(self, path: str) -> dict | None:
+        with self.lock:
+            entries = self.dirs.get(os.path.abspath(path))
+            return dict(entries) if entries is not None else None
+
+    def stat(self, path: str):
+        path = os.path.abspath(path)
+        with self.lock:
+            entries = self.dirs.get(os.path.dirname(path))
+            return entries.get(os.path.basename(path)) if entries else None
+
+    def walk(self, path: str):
+        """Yield (dirpath, entries) for `path` and every directory below it."""
+        path = os.path.abspath(path)
+        with self.lock:
+            snapshot = {p: dict(e) for p, e in self.dirs.items()
+                        if p == path or p.startswith(path + os.sep)}
+        yield from snapshot.items()
+
+    def subscribe(self, callback):
+        """callback(changed_dirs: set[str]) runs on the watcher thread."""
+        self.listeners.append(callback)
+
+    # ---------- indexing ----------
+    def _index_tree(self, top: str, created: bool = False):
+        self._store_tree(scan_tree(top))
+        if created:
+            # a folder that just appeared may still be filling up, and files
+            # written before the new watches existed raised no events: a
+            # second pass, now that everything is watched, picks them up
+            self._store_tree(scan_tree(top))
+
+    def _store_tree(self, dirs: dict):
+        self.dirs.update(dirs)
+        for path in dirs:
+            self._add_watch(path)
+
+    def _drop_tree(self, top: str):
+        prefix = top + os.sep
+        for path in [p for p in self.dirs if p == top or p.startswith(prefix)]:
+            del self.dirs[path]
+            wd = self._paths.pop(path, None)
+            if wd is not None:
+                self._wds.pop(wd, None)
+                if self._inotify:
+                    self._inotify.rm_watch(wd)
+
+    def _add_watch(self, path: str):
+        if not self._inotify or path in self._paths:
+            return
+        try:
+            wd = self._inotify.add_watch(path)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                logger.warning("[DirIndex] inotify watch limit reached, falling back to polling")
+                self._inotify = None
+            return
+        self._wds[wd] = path
+        self._paths[path] = wd
+
+    def _bump(self, changed: set):
+        self.generation += 1
+        for callback in list(self.listeners):
+            try:
+                callback(changed)
+            except Exception as e:
+                logger.warning(f"[DirIndex] listener failed: {e}")
+
+    # ---------- change tracking ----------
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        target = self._inotify_loop if self._inotify else self._poll_loop
+        self._thread = threading.Thread(target=target, name="dir-index", daemon=True)
+        self._thread.start()
+
+    def _inotify_loop(self):
+        inotify = self._inotify
+        # _add_watch clears self._inotify when the watch limit is hit
+        while self._inotify is inotify:
+            try:
+                ready, _, _ = select.select([inotify.fd], [], [], self.poll_interval)
+                if not ready:
+                    continue
+                events = list(inotify.read_events())
+            except OSError as e:
+                logger.warning(f"[DirIndex] inotify read failed ({e}), falling back to polling")
+                break
+            with self.lock:
+                changed = set()
+                for wd, mask, name in events:
+                    self._apply_event(wd, mask, name, changed)
+                if changed:
+                    self._bump(changed)
+        with self.lock:
+            self._inotify = None
+            self._wds.clear()
+            self._paths.clear()
+        os.close(inotify.fd)
+        self._poll_loop()
+
+    def _apply_event(self, wd: int, mask: int, name: str, changed: set):
+        if mask & IN_Q_OVERFLOW:
+            for root in self.roots:
+                self._drop_tree(root)
+                self._index_tree(root)
+            self.resets += 1
+            changed.update(self.roots)
+            return
+
+        parent = self._wds.get(wd)
+        if parent is None:
+            return
+        if mask & IN_IGNORED:
+            self._wds.pop(wd, None)
+            self._paths.pop(parent, None)
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF) or not name:
+            return
+
+        entries = self.dirs.get(parent)
+        if entries is None:
+            return
+        path = os.path.join(parent, name)
+        changed.add(parent)
+        self._refresh_dir_entry(parent, changed)
+
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            old = entries.pop(name, None)
+            if old and old[0]:
+                self._drop_tree(path)
+            return
+
+        try:
+            st = os.lstat(path)
+        except OSError:
+            entries.pop(name, None)
+            return
+
+        is_dir = bool(mask & IN_ISDIR)
+        entries[name] = (is_dir, 0 if is_dir else st.st_size, st.st_mtime)
+
+        if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+            self._index_tree(path, created=True)
+
+    def _refresh_dir_entry(self, path: str, changed: set):
+        """A change inside `path` moves its mtime: update its entry in its parent's listing."""
+        grandparent, name = os.path.split(path)
+        entries = self.dirs.get(grandparent)
+        if entries is None or name not in entries:
+            return
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return
+        if entries[name][2] != st.st_mtime:
+            entries[name] = (True, 0, st.st_mtime)
+            changed.add(grandparent)
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                roots = list(self.roots)
+            for root in roots:
+                dirs = scan_tree(root)
+                with self.lock:
+                    prefix = root + os.sep
+                    old = {p: e for p, e in self.dirs.items() if p == root or p.startswith(prefix)}
+                    changed = {p for p in set(old) | set(dirs) if old.get(p) != dirs.get(p)}
+                    if not changed:
+                        continue
+                    self._drop_tree(root)
+                    self.dirs.update(dirs)
+                    self._bump(changed)
+
+
+# shared instance used by every mod / file endpoint
+dir_index = DirectoryIndex()
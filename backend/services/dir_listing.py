@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+from backend.services.dir_index import dir_index
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+# re-stat a cached directory at most this often even if its mtime is unchanged,
+# since a file growing in place does not touch the parent directory
+STAT_TTL = 10.0
+CACHE_DIRS = 512
+
+SORT_KEYS = ("name", "size", "mtime")
+
+# the index generation starts over with every process, so index ETags carry
+# a per-boot nonce: a tag cached before a restart never matches again
+BOOT_NONCE = os.urandom(4).hex()
+
+_cache = OrderedDict()  # dir path -> {"sig", "at", "entries", "sorted": {}}
+_lock = threading.Lock()
+
+
+# ---------------- SCAN ----------------
+def _dir_signature(path: str):
+    st = os.stat(path)
+    return (st.st_ino, st.st_mtime_ns)
+
+
+def _scan(path: str) -> list[dict]:
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+                # DirEntry caches this; on Windows it is free, on Linux one lstat/stat
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append({
+                "type": "folder" if is_dir else "file",
+                "name": entry.name,
+                "path": entry.path.replace("\\", "/"),
+                "size": 0 if is_dir else st.st_size,
+                "mtime": int(st.st_mtime),
+            })
+    return entries
+
+
+def _from_index(path: str, children: dict) -> list[dict]:
+    return [
+        {
+            "type": "folder" if is_dir else "file",
+            "name": name,
+            "path": os.path.join(path, name).replace("\\", "/"),
+            "size": size,
+            "mtime": int(mtime),
+        }
+        for name, (is_dir, size, mtime) in children.items()
+    ]
+
+
+def scan_dir(path: str) -> list[dict]:
+    """
+    Return one directory level. Folders mirrored by the directory index are
+    served from it; anything else is scanned and its stat info cached while
+    it is fresh.
+    """
+    path = os.path.abspath(path)
+    now = time.monotonic()
+
+    if dir_index.covers(path):
+        sig = ("index", dir_index.generation)
+        with _lock:
+            cached = _cache.get(path)
+            if cached and cached["sig"] == sig:
+                _cache.move_to_end(path)
+                return cached["entries"]
+        children = dir_index.children(path)
+        if children is not None:
+            entries = _from_index(path, children)
+            _store(path, sig, now, entries)
+            return entries
+
+    sig = _dir_signature(path)
+
+    with _lock:
+        cached = _cache.get(path)
+        if cached and cached["sig"] == sig and now - cached["at"] < STAT_TTL:
+            _cache.move_to_end(path)
+            return cached["entries"]
+
+    entries = _scan(path)
+    _store(path, sig, now, entries)
+    return entries
+
+
+def _store(path: str, sig, now: float, entries: list[dict]):
+    with _lock:
+        _cache[path] = {"sig": sig, "at": now, "entries": entries, "sorted": {}}
+        _cache.move_to_end(path)
+        while len(_cache) > CACHE_DIRS:
+            _cache.popitem(last=False)
+
+
+def invalidate(path: str | None = None):
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(path, None)
+
+
+# ---------------- SORT / PAGINATE ----------------
+def _sorted(path: str, entries: list[dict], sort: str, reverse: bool):
+    cache_key = (sort, reverse)
+    with _lock:
+        cached = _cache.get(path)
+        if cached and cached["entries"] is entries and cache_key in cached["sorted"]:
+            return cached["sorted"][cache_key]
+
+    if sort == "name":
+        key = lambda item: (item["name"].lower(), item["name"])
+    else:
+        key = lambda item: (item[sort], item["name"].lower(), item["name"])
+
+    # folders always first, the chosen order applies within each group
+    folders = sorted((i for i in entries if i["type"] == "folder"), key=key, reverse=reverse)
+    files = sorted((i for i in entries if i["type"] != "folder"), key=key, reverse=reverse)
+    items = folders + files
+    result = (items, {item["name"]: n for n, item in enumerate(items)})
+
+    with _lock:
+        cached = _cache.get(path)
+        if cached and cached["entries"] is entries:
+            cached["sorted"][cache_key] = result
+    return result
+
+
+def encode_cursor(name: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([name, offset]).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        name, offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(name), int(offset)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def list_dir(
+    path: str,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    sort: str = "name",
+    order: str = "asc",
+) -> dict:
+    """
+    One page of a single directory level.
+
+    The cursor names the last returned entry, so pages stay consistent when
+    entries are added or removed between requests; if that entry is gone the
+    stored offset is used instead.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    path = os.path.abspath(path)
+    entries = scan_dir(path)
+    items, positions = _sorted(path, entries, sort, order == "desc")
+
+    start = 0
+    if cursor:
+        name, offset = decode_cursor(cursor)
+        start = positions[name] + 1 if name in positions else offset
+
+    page = items[start:start + limit]
+    end = start + len(page)
+    next_cursor = encode_cursor(page[-1]["name"], end) if page and end < len(items) else None
+
+    return {
+        "path": path.replace("\\", "/"),
+        "items": page,
+        "total": len(items),
+        "next_cursor": next_cursor,
+    }
+
+
+def listing_etag(path: str, build) -> tuple[str, object]:
+    """
+    ETag for a listing response, plus the payload when it had to be built.
+    Indexed folders use the index generation (scoped to this boot), so the
+    check costs nothing; other folders hash the payload, which still saves
+    resending it.
+    """
+    if dir_index.covers(path) and dir_index.children(path) is not None:
+        return f'"g{BOOT_NONCE}-{dir_index.generation:x}"', None
+    payload = build()
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:24]
+    return f'"{digest}"', payload
+
+
+def is_within(path: str, roots) -> bool:
+    real = os.path.realpath(path)
+    for root in roots:
+        root = os.path.realpath(root)
+        if real == root or real.startswith(root.rstrip(os.sep) + os.sep):
+            return True
+    return False
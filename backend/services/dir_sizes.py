@@ -0,0 +1,246 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services.dir_index import dir_index, scan_tree
+
+logger = logging.getLogger("uvicorn.error")
+
+MAX_WORKERS = 2
+# trees with more folders than this (a home directory, a whole disk) are not
+# watched: one inotify watch per folder would exhaust the limit. They are
+# summed once instead, and re-summed when asked again after SNAPSHOT_TTL.
+MAX_TRACKED_DIRS = 20000
+SNAPSHOT_TTL = 300.0
+
+
+def sum_tree(top: str, dirs: dict) -> dict:
+    """
+    Recursive [bytes, files, folders] for `top` and every folder below it,
+    from an index mapping {dir: {name: (is_dir, size, mtime)}}.
+    """
+    order = []
+    stack = [top]
+    while stack:
+        path = stack.pop()
+        entries = dirs.get(path)
+        if entries is None:
+            continue
+        order.append(path)
+        stack.extend(os.path.join(path, name) for name, (is_dir, _s, _m) in entries.items() if is_dir)
+
+    totals = {}
+    # pre-order reversed: every folder comes after all of its children
+    for path in reversed(order):
+        totals[path] = _count(path, dirs[path], totals)
+    return totals
+
+
+def _count(path: str, entries: dict, totals: dict) -> list:
+    size = files = folders = 0
+    for name, (is_dir, file_size, _mtime) in entries.items():
+        if is_dir:
+            folders += 1
+            child = totals.get(os.path.join(path, name))
+            if child:
+                size += child[0]
+                files += child[1]
+                folders += child[2]
+        else:
+            size += file_size
+            files += 1
+    return [size, files, folders]
+
+
+class DirectorySizes:
+    """
+    Recursive folder sizes kept in memory on top of the directory index.
+
+    track(root) indexes the tree on a worker thread and sums it bottom-up.
+    After that, every change event from the index recounts the changed folders
+    and adds the difference to their ancestors, so lookups never touch disk.
+    Trees above MAX_TRACKED_DIRS folders get a one-off snapshot instead.
+
+    Lock order is dir_index.lock then self.lock (index callbacks already hold
+    the former).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.roots = {}     # root -> "scanning" | "ready" | "missing"
+        self.totals = {}    # dir -> [bytes, files, folders]
+        self.subdirs = {}   # dir -> set of child folder names
+        self.scanned = {}   # root -> time of the full scan
+        self.snapshots = {} # root -> (dirs, totals) of a tree too big to watch
+        self._resets = dir_index.resets
+        self._pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dir-sizes")
+        dir_index.subscribe(self._on_change)
+
+    # ---------- public ----------
+    def track(self, path: str) -> str:
+        """Start sizing `path` unless a tracked root already covers it."""
+        path = os.path.abspath(path)
+        with self.lock:
+            root = self._root_for(path)
+            if root is not None:
+                return self.roots[root]
+            self.roots[path] = "scanning"
+        self._pool.submit(self._scan, path)
+        return "scanning"
+
+    def status(self, path: str) -> str | None:
+        with self.lock:
+            root = self._root_for(os.path.abspath(path))
+            return self.roots[root] if root is not None else None
+
+    def usage(self, path: str) -> dict | None:
+        """
+        Size of `path` and of each direct child, biggest first.
+        None until the tree containing `path` has been scanned.
+        """
+        path = os.path.abspath(path)
+        with dir_index.lock, self.lock:
+            root = self._root_for(path)
+            if root in self.snapshots:
+                if time.time() - self.scanned[root] > SNAPSHOT_TTL:
+                    self._drop_snapshot(root)
+                    return None
+                dirs, totals = self.snapshots[root]
+            else:
+                dirs, totals = dir_index.dirs, self.totals
+            total = totals.get(path)
+            entries = dirs.get(path)
+            if total is None or entries is None:
+                return None
+            children = []
+            for name, (is_dir, size, mtime) in entries.items():
+                if is_dir:
+                    size, files, folders = totals.get(os.path.join(path, name), (0, 0, 0))
+                else:
+                    files, folders = 1, 0
+                children.append({
+                    "name": name,
+                    "is_dir": is_dir,
+                    "size": size,
+                    "files": files,
+                    "folders": folders,
+                    "mtime": int(mtime),
+                })
+            scanned = self.scanned.get(root)
+            live = root not in self.snapshots
+
+        children.sort(key=lambda c: c["size"], reverse=True)
+        return {
+            "path": path,
+            "size": total[0],
+            "files": total[1],
+            "folders": total[2],
+            "scanned": scanned,
+            "live": live,
+            "children": children,
+        }
+
+    # ---------- scanning ----------
+    def _root_for(self, path: str) -> str | None:
+        for root in self.roots:
+            if path == root or path.startswith(root + os.sep):
+                return root
+        return None
+
+    def _drop_snapshot(self, root: str):
+        self.snapshots.pop(root, None)
+        self.roots.pop(root, None)
+        self.scanned.pop(root, None)
+
+    def _scan(self, root: str):
+        started = time.monotonic()
+        try:
+            dirs = None
+            if not dir_index.covers(root):
+                dirs = scan_tree(root, max_dirs=MAX_TRACKED_DIRS)
+                if dirs is None and os.path.isdir(root):
+                    self._snapshot(root, started)
+                    return
+            if not dir_index.watch(root, dirs):
+                with self.lock:
+                    self.roots[root] = "missing"
+                return
+            with dir_index.lock:
+                totals = sum_tree(root, dir_index.dirs)
+                with self.lock:
+                    self._store(totals, dir_index.dirs)
+                    self.roots[root] = "ready"
+                    self.scanned[root] = time.time()
+            logger.info(f"[DirSizes] Sized {root} ({len(totals)} folders) in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            logger.warning(f"[DirSizes] Failed to size {root}: {e}")
+            with self.lock:
+                self.roots.pop(root, None)
+
+    def _snapshot(self, root: str, started: float):
+        dirs = scan_tree(root)
+        totals = sum_tree(root, dirs)
+        with self.lock:
+            self.snapshots[root] = (dirs, totals)
+            self.roots[root] = "ready"
+            self.scanned[root] = time.time()
+        logger.info(
+            f"[DirSizes] {root} is too big to watch ({len(totals)} folders), "
+            f"sized once in {time.monotonic() - started:.1f}s"
+        )
+
+    def _store(self, totals: dict, dirs: dict):
+        self.totals.update(totals)
+        for path in totals:
+            self.subdirs[path] = {n for n, (is_dir, _s, _m) in dirs[path].items() if is_dir}
+
+    def _forget(self, path: str):
+        stack = [path]
+        while stack:
+            folder = stack.pop()
+            self.totals.pop(folder, None)
+            stack.extend(os.path.join(folder, n) for n in self.subdirs.pop(folder, ()))
+
+    # ---------- change events (watcher thread, index lock held) ----------
+    def _on_change(self, changed: set):
+        dirs = dir_index.dirs
+        with self.lock:
+            if dir_index.resets != self._resets:
+                # the index was rebuilt after an event overflow: start over
+                self._resets = dir_index.resets
+                for root, state in self.roots.items():
+                    if state == "ready" and root not in self.snapshots:
+                        self._forget(root)
+                        self._store(sum_tree(root, dirs), dirs)
+                return
+
+            for path in changed:
+                old = self.totals.get(path)
+                entries = dirs.get(path)
+                if old is None or entries is None:
+                    # untracked, or removed (the parent's event handles that)
+                    continue
+
+                names = {n for n, (is_dir, _s, _m) in entries.items() if is_dir}
+                known = self.subdirs.get(path, set())
+                for name in known - names:
+                    self._forget(os.path.join(path, name))
+                for name in names - known:
+                    self._store(sum_tree(os.path.join(path, name), dirs), dirs)
+                self.subdirs[path] = names
+
+                new = _count(path, entries, self.totals)
+                delta = [n - o for n, o in zip(new, old)]
+                self.totals[path] = new
+                if not any(delta):
+                    continue
+                child, parent = path, os.path.dirname(path)
+                while parent != child and parent in self.totals:
+                    self.totals[parent] = [t + d for t, d in zip(self.totals[parent], delta)]
+                    child, parent = parent, os.path.dirname(parent)
+
+
+# shared instance
+dir_sizes = DirectorySizes()
@@ -0,0 +1,280 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import weakref
+
+from backend.services.file_streaming import (
+    file_version, text_encoding, detect_encoding, looks_binary,
+    BINARY_SNIFF_BYTES, FULL_READ_LIMIT,
+)
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# a lock lives as long as someone holds or waits on it, so the table does
+# not grow with every path ever saved
+_path_locks = weakref.WeakValueDictionary()
+_path_locks_guard = threading.Lock()
+
+
+def _umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# read once: os.umask can only be read by setting it, which races other threads
+UMASK = _umask()
+
+
+class VersionConflict(Exception):
+    def __init__(self, current: str | None, message: str = "File changed since it was opened"):
+        super().__init__(message)
+        self.current = current
+
+
+class NotEditable(VersionConflict):
+    """The editor never had the whole file as text, so a full save would lose data."""
+
+
+class PatchError(ValueError):
+    pass
+
+
+def _lock_for(path: str) -> threading.Lock:
+    key = os.path.realpath(path)
+    with _path_locks_guard:
+        lock = _path_locks.get(key)
+        if lock is None:
+            lock = _path_locks[key] = threading.Lock()
+        return lock
+
+
+def current_version(path: str) -> str | None:
+    try:
+        return file_version(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+# ---------------- ATOMIC WRITE ----------------
+def atomic_write(path: str, write, expected_version: str | None = None) -> str:
+    """
+    Write through a temp file in the same folder and rename it over `path`.
+    `write(tmp_file)` produces the new bytes. When `expected_version` is given
+    and the file on disk no longer matches it, VersionConflict is raised and
+    nothing is replaced. Returns the new version token.
+    """
+    folder = os.path.dirname(path) or "."
+    with _lock_for(path):
+        if expected_version is not None:
+            current = current_version(path)
+            if current != expected_version:
+                raise VersionConflict(current)
+
+        fd, tmp_path = tempfile.mkstemp(prefix=".modix-", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                write(tmp)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            else:
+                # mkstemp creates 0600; a new file gets what open() would give it
+                os.chmod(tmp_path, 0o666 & ~UMASK)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return current_version(path)
+
+
+def write_text(
+    path: str, content: str, expected_version: str | None = None, encoding: str = "utf-8"
+) -> str:
+    data = content.encode(encoding)
+    return atomic_write(path, lambda tmp: tmp.write(data), expected_version)
+
+
+def save_text(path: str, content: str, expected_version: str | None) -> str:
+    """
+    Whole-file save from an editor. An existing file is only replaced when
+    the save names the version it was read at and that read returned all of
+    it as text: binaries and files over FULL_READ_LIMIT (which editors get
+    as a window of lines) raise NotEditable. The text is written back in the
+    encoding the file was read with.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return write_text(path, content, expected_version)
+
+    current = file_version(st)
+    if not expected_version:
+        raise NotEditable(current, "Missing version: reopen the file before saving")
+    if st.st_size > FULL_READ_LIMIT:
+        raise NotEditable(current, "File is too large to save whole: send a patch instead")
+    with open(path, "rb") as f:
+        data = f.read()
+    if looks_binary(data[:BINARY_SNIFF_BYTES]):
+        raise NotEditable(current, "Binary files cannot be saved as text")
+
+    encoding = detect_encoding(path, data)
+    try:
+        return write_text(path, content, expected_version, encoding)
+    except UnicodeEncodeError as e:
+        raise PatchError(f"Text cannot be saved as {encoding}: {e.reason}")
+
+
+# ---------------- EDITS ----------------
+def _normalise_edits(edits: list[dict]) -> list[dict]:
+    """
+    Line edits replace lines [start, end) (0-based) with `text`.
+    Optional `expect` lists the old lines for a context check.
+    """
+    result = []
+    for edit in edits:
+        start = int(edit["start"])
+        end = int(edit.get("end", start))
+        if start < 0 or end < start:
+            raise PatchError(f"Invalid edit range {start}-{end}")
+        result.append({
+            "start": start,
+            "end": end,
+            "text": edit.get("text", ""),
+            "expect": edit.get("expect"),
+        })
+    result.sort(key=lambda e: e["start"])
+    for prev, nxt in zip(result, result[1:]):
+        if nxt["start"] < prev["end"]:
+            raise PatchError("Edits overlap")
+    return result
+
+
+def parse_unified_diff(patch: str) -> list[dict]:
+    """Turn a unified diff for a single file into line edits with context checks."""
+    edits = []
+    lines = [line + "\n" for line in patch.split("\n")]
+    if lines and lines[-1] == "\n":
+        lines.pop()
+    i = 0
+    while i < len(lines):
+        header = HUNK_HEADER.match(lines[i])
+        i += 1
+        if not header:
+            continue
+
+        old_start = int(header.group(1))
+        old_count = int(header.group(2)) if header.group(2) is not None else 1
+        new_count = int(header.group(4)) if header.group(4) is not None else 1
+        start = old_start - 1 if old_count else old_start
+
+        # the header's counts say where the hunk ends; whatever follows
+        # ("--- a/next", a trailing "-- " signature, ...) is not part of it
+        old_left, new_left = old_count, new_count
+        expect = []
+        new = []
+        prev_tag = None
+        while i < len(lines) and (old_left or new_left or lines[i].startswith("\\")):
+            line = lines[i]
+            i += 1
+            if line.startswith("\\"):
+                # "\ No newline at end of file" applies to the previous line
+                if new and new[-1].endswith("\n") and prev_tag in (" ", "+"):
+                    new[-1] = new[-1][:-1]
+                continue
+            if line.strip("\r\n") == "":
+                # some tools drop the leading space of blank context lines
+                line = " " + line
+            tag, body = line[:1], line[1:]
+            if tag == " " and old_left and new_left:
+                expect.append(body)
+                new.append(body)
+                old_left -= 1
+                new_left -= 1
+            elif tag == "-" and old_left:
+                expect.append(body)
+                old_left -= 1
+            elif tag == "+" and new_left:
+                new.append(body)
+                new_left -= 1
+            else:
+                raise PatchError(f"Hunk at line {old_start} does not match its header counts")
+            prev_tag = tag
+        if old_left or new_left:
+            raise PatchError(f"Hunk at line {old_start} is shorter than its header says")
+
+        edits.append({
+            "start": start,
+            "end": start + len(expect),
+            "text": "".join(new),
+            "expect": expect,
+        })
+    if not edits:
+        raise PatchError("Patch contains no hunks")
+    return edits
+
+
+def _same_line(a: str, b: str) -> bool:
+    return a.rstrip("\r\n") == b.rstrip("\r\n")
+
+
+def apply_edits(path: str, edits: list[dict], expected_version: str | None = None) -> str:
+    """
+    Stream `path` line by line into a temp file, splicing in the edits, then
+    rename it into place. Memory use is bounded by the edited lines.
+    """
+    edits = _normalise_edits(edits)
+    encoding = text_encoding(path)
+    if encoding is None:
+        raise NotEditable(current_version(path), "Binary files cannot be edited as text")
+    for edit in edits:
+        try:
+            edit["data"] = edit["text"].encode(encoding)
+        except UnicodeEncodeError as e:
+            raise PatchError(f"Text cannot be saved as {encoding}: {e.reason}")
+
+    def write(tmp):
+        with open(path, "rb") as src:
+            line_no = 0
+            last = b"\n"
+            for edit in edits:
+                while line_no < edit["start"]:
+                    raw = src.readline()
+                    if not raw:
+                        raise PatchError(f"Edit starts past end of file (line {edit['start']})")
+                    tmp.write(raw)
+                    last = raw
+                    line_no += 1
+
+                old = []
+                while line_no < edit["end"]:
+                    raw = src.readline()
+                    if not raw:
+                        raise PatchError(f"Edit ends past end of file (line {edit['end']})")
+                    old.append(raw.decode(encoding, errors="replace"))
+                    line_no += 1
+
+                expect = edit["expect"]
+                if expect is not None and (
+                    len(expect) != len(old) or not all(map(_same_line, expect, old))
+                ):
+                    raise PatchError(f"Context mismatch at line {edit['start'] + 1}")
+
+                if edit["data"] and not last.endswith(b"\n"):
+                    # appending after a final line that had no newline
+                    tmp.write(b"\n")
+                tmp.write(edit["data"])
+                last = b"\n"
+
+            shutil.copyfileobj(src, tmp)
+
+    return atomic_write(path, write, expected_version)
+
+
+def apply_patch(path: str, patch: str, expected_version: str | None = None) -> str:
+    return apply_edits(path, parse_unified_diff(patch), expected_version)
@@ -0,0 +1,415 @@
+import os
+import hashlib
+import threading
+import mimetypes
+from collections import OrderedDict
+from email.utils import formatdate
+from urllib.parse import quote
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from backend.services.dir_listing import listing_etag
+
+CHUNK_SIZE = 1024 * 1024
+
+# clients may keep responses but must revalidate them with If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+# files up to this size are still returned whole by the editor endpoints
+FULL_READ_LIMIT = 2 * 1024 * 1024
+DEFAULT_LINE_WINDOW = 2000
+MAX_LINE_WINDOW = 20000
+
+# a byte offset is remembered every LINE_INDEX_STEP lines so later windows
+# can seek instead of rescanning the file from the start
+LINE_INDEX_STEP = 1000
+LINE_INDEX_FILES = 64
+# bytes before the last mark re-checked when a file grows, to catch in-place rewrites
+LINE_CHECK_BYTES = 4096
+BINARY_SNIFF_BYTES = 8192
+
+
+# ---------------- VALIDATORS ----------------
+def file_etag(st: os.stat_result) -> str:
+    """Strong validator built from inode, mtime and size."""
+    return f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def file_version(st: os.stat_result) -> str:
+    """Version token for optimistic-concurrency saves (the unquoted ETag)."""
+    return file_etag(st).strip('"')
+
+
+def last_modified(st: os.stat_result) -> str:
+    return formatdate(st.st_mtime, usegmt=True)
+
+
+# ---------------- CONDITIONAL GET ----------------
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses the weak comparison (RFC 9110 13.1.2)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def conditional_json(request: Request, etag: str, build):
+    """304 when the client already has `etag`, otherwise build() as JSON."""
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return JSONResponse(build(), headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def file_json_response(request: Request, path: str, build):
+    return conditional_json(request, file_etag(os.stat(path)), build)
+
+
+def listing_json_response(request: Request, path: str, build):
+    etag, payload = listing_etag(path, build)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if payload is None:
+        payload = build()
+    return JSONResponse(payload, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+# ---------------- RANGE PARSING ----------------
+def parse_range(header: str | None, size: int):
+    """
+    Parse a single-range `Range: bytes=...` header.
+    Returns (start, end) inclusive, or None to serve the whole file.
+    Multi-range requests fall back to the full body, which RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+
+    start_s, _, end_s = spec.partition("-")
+    try:
+        if start_s == "":
+            # suffix range: last N bytes
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError
+            start = max(size - length, 0)
+            end = size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+            end = min(end, size - 1)
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+    return start, end
+
+
+def if_range_matches(request: Request, st: os.stat_result) -> bool:
+    """A stale If-Range means the client must restart with the full body."""
+    validator = request.headers.get("if-range")
+    if not validator:
+        return True
+    return validator in (file_etag(st), last_modified(st))
+
+
+# ---------------- STREAMING ----------------
+def iter_file(path: str, start: int = 0, end: int | None = None, chunk_size: int = CHUNK_SIZE):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(
+    request: Request,
+    path: str,
+    media_type: str | None = None,
+    filename: str | None = None,
+):
+    """
+    Stream a file in fixed-size chunks with Range / If-Range support so
+    interrupted downloads can resume where they stopped.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    size = st.st_size
+    etag = file_etag(st)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified(st),
+        "Cache-Control": CACHE_CONTROL,
+    }
+    if filename:
+        headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    byte_range = None
+    if if_range_matches(request, st):
+        byte_range = parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_file(path, 0, size - 1), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file(path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+# ---------------- TEXT WINDOWS ----------------
+_line_index = OrderedDict()  # path -> {"sig": (ino, size, mtime_ns), "marks": [byte offsets], "check": (mark, digest)}
+_line_index_lock = threading.Lock()
+
+
+# bytes that never show up in text files; tab, newline, form feed, carriage
+# return, backspace and escape do
+_CONTROL_BYTES = bytes(set(range(32)) - {8, 9, 10, 12, 13, 27}) + b"\x7f"
+BINARY_CONTROL_RATIO = 0.3
+
+# Project Zomboid reads Translate/<LANG>/ files in the charset its
+# language.txt names; older packs have no language.txt and use the
+# Windows code page of the language
+TRANSLATE_CHARSETS = {
+    "RU": "cp1251", "UA": "cp1251", "BG": "cp1251",
+    "PL": "cp1250", "CS": "cp1250", "HU": "cp1250", "RO": "cp1250",
+    "TR": "cp1254", "CH": "utf-8", "CN": "utf-8", "JP": "utf-8", "KO": "utf-8",
+}
+DEFAULT_LEGACY_ENCODING = "cp1252"
+
+
+def looks_binary(head: bytes) -> bool:
+    if b"\0" in head:
+        return True
+    if not head:
+        return False
+    controls = len(head) - len(head.translate(None, _CONTROL_BYTES))
+    return controls / len(head) > BINARY_CONTROL_RATIO
+
+
+def is_binary(path: str) -> bool:
+    return text_encoding(path) is None
+
+
+def _translate_charset(path: str) -> str | None:
+    """Charset of a Translate/<LANG>/ file: language.txt first, then the language's code page."""
+    folder = os.path.dirname(os.path.abspath(path))
+    parent, lang = os.path.split(folder)
+    if os.path.basename(parent).lower() != "translate":
+        return None
+    try:
+        with open(os.path.join(folder, "language.txt"), "r", encoding="latin-1") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip().lower() == "charset" and value.strip():
+                    return value.strip().strip(",").lower()
+    except OSError:
+        pass
+    return TRANSLATE_CHARSETS.get(lang.upper())
+
+
+def _decodes(head: bytes, encoding: str) -> bool:
+    try:
+        head.decode(encoding)
+    except UnicodeDecodeError as e:
+        # a multi-byte character cut off at the sniff boundary still decodes
+        return len(head) >= BINARY_SNIFF_BYTES and e.reason == "unexpected end of data"
+    except LookupError:
+        return False
+    return True
+
+
+def detect_encoding(path: str, head: bytes | None = None) -> str:
+    """
+    "utf-8" when the start of the file decodes as UTF-8, otherwise the
+    legacy code page it was most likely written in. latin-1 decodes any
+    byte, so a text file always gets an encoding that round-trips.
+    """
+    if head is None:
+        with open(path, "rb") as f:
+            head = f.read(BINARY_SNIFF_BYTES)
+    hint = _translate_charset(path)
+    if hint and head.isascii() and _decodes(head, hint):
+        # nothing to tell the two apart yet; the game reads it as `hint`
+        return hint
+    if _decodes(head, "utf-8"):
+        return "utf-8"
+    for encoding in (hint, DEFAULT_LEGACY_ENCODING):
+        if encoding and _decodes(head, encoding):
+            return encoding
+    return "latin-1"
+
+
+def text_encoding(path: str) -> str | None:
+    """The encoding to read `path` with, or None when it is binary."""
+    with open(path, "rb") as f:
+        head = f.read(BINARY_SNIFF_BYTES)
+    return None if looks_binary(head) else detect_encoding(path, head)
+
+
+def _chunk_digest(f, position: int) -> bytes:
+    """Digest of the LINE_CHECK_BYTES before `position` in open file `f`."""
+    start = max(0, position - LINE_CHECK_BYTES)
+    f.seek(start)
+    return hashlib.blake2b(f.read(position - start), digest_size=16).digest()
+
+
+def _still_grown(path: str, old_sig: tuple, st: os.stat_result, check) -> bool:
+    """
+    True when the file only had data appended since `old_sig`. A same-size
+    write with a new mtime is a rewrite; so is a longer file whose text
+    before the last mark no longer matches.
+    """
+    if old_sig[0] != st.st_ino or st.st_size <= old_sig[1]:
+        return False
+    if check is None:
+        return True
+    try:
+        with open(path, "rb") as f:
+            return _chunk_digest(f, check[0]) == check[1]
+    except OSError:
+        return False
+
+
+def _line_marks(path: str, st: os.stat_result) -> list[int]:
+    sig = (st.st_ino, st.st_size, st.st_mtime_ns)
+    with _line_index_lock:
+        cached = _line_index.get(path)
+    # growing logs keep their marks; anything else starts over
+    if cached and cached["sig"] != sig and not _still_grown(path, cached["sig"], st, cached.get("check")):
+        cached = None
+    with _line_index_lock:
+        if cached is None:
+            cached = {"sig": sig, "marks": [0], "check": None}
+        cached["sig"] = sig
+        _line_index[path] = cached
+        _line_index.move_to_end(path)
+        while len(_line_index) > LINE_INDEX_FILES:
+            _line_index.popitem(last=False)
+        return cached["marks"]
+
+
+def read_line_window(
+    path: str, offset: int = 0, limit: int = DEFAULT_LINE_WINDOW, encoding: str = "utf-8"
+) -> dict:
+    """
+    Return lines [offset, offset + limit) without loading the whole file.
+    `total_lines` is only known once the window reaches the end of the file.
+    """
+    offset = max(offset, 0)
+    limit = max(1, min(limit, MAX_LINE_WINDOW))
+
+    st = os.stat(path)
+    marks = _line_marks(path, st)
+
+    with _line_index_lock:
+        known = len(marks)
+        mark = min(offset // LINE_INDEX_STEP, known - 1)
+        position = marks[mark]
+    line_no = mark * LINE_INDEX_STEP
+
+    lines = []
+    eof = False
+    with open(path, "rb") as f:
+        f.seek(position)
+        while len(lines) < limit:
+            raw = f.readline()
+            if not raw:
+                eof = True
+                break
+            line_no += 1
+            if line_no % LINE_INDEX_STEP == 0:
+                with _line_index_lock:
+                    if len(marks) == line_no // LINE_INDEX_STEP:
+                        marks.append(f.tell())
+            if line_no > offset:
+                lines.append(raw.decode(encoding, errors="replace"))
+        if not eof and not f.read(1):
+            eof = True
+
+        with _line_index_lock:
+            last = marks[-1] if len(marks) > known else None
+        if last is not None:
+            check = (last, _chunk_digest(f, last))
+            with _line_index_lock:
+                cached = _line_index.get(path)
+                if cached is not None and cached["marks"] is marks:
+                    cached["check"] = check
+
+    return {
+        "content": "".join(lines),
+        "offset": offset,
+        "lines": len(lines),
+        "next_offset": None if eof else offset + len(lines),
+        "total_lines": line_no if eof else None,
+        "size": st.st_size,
+    }
+
+
+def read_text_file(path: str, offset: int | None = None, limit: int | None = None) -> dict:
+    """
+    Payload for the editor endpoints: small text files whole, binaries
+    flagged without content, and large text files as a window of lines.
+    `encoding` is what the text was decoded from; saves write it back the same way.
+    """
+    st = os.stat(path)
+    encoding = text_encoding(path)
+    if encoding is None:
+        return {
+            "content": "", "binary": True, "truncated": False,
+            "size": st.st_size, "version": file_version(st),
+        }
+
+    if offset is None and limit is None and st.st_size <= FULL_READ_LIMIT:
+        with open(path, "rb") as f:
+            data = f.read()
+        # the whole file is at hand: let all of it pick the encoding
+        encoding = detect_encoding(path, data)
+        content = data.decode(encoding, errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+        return {
+            "content": content, "binary": False, "truncated": False, "encoding": encoding,
+            "size": st.st_size, "version": file_version(st),
+        }
+
+    window = read_line_window(path, offset or 0, limit or DEFAULT_LINE_WINDOW, encoding)
+    window["binary"] = False
+    window["encoding"] = encoding
+    window["version"] = file_version(st)
+    window["truncated"] = window["offset"] > 0 or window["next_offset"] is not None
+    return window
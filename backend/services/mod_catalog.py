@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+from backend.services.dir_index import dir_index
+from backend.services.steam_libraries import map_per_device
+
+logger = logging.getLogger("uvicorn.error")
+
+CATALOG_DB = os.path.expanduser("~/.modix/mod_catalog.db")
+MOD_INFO_FILES = ("mod.info", "mod.info.json")
+
+# keep IN (...) lists well below SQLite's bound-variable limit; past this many
+# changed items a full pass is simpler anyway
+MAX_IN_LIST = 500
+
+
+# ---------------- MOD.INFO ----------------
+def parse_mod_info(file_path: str) -> dict:
+    """
+    Parse mod.info file (text-based) and return a dictionary of key-value pairs.
+    mod.info.json files are loaded as JSON.
+    """
+    info = {}
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            if file_path.endswith(".json"):
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+            for line in f:
+                line = line.strip()
+                if "=" in line:
+                    key, value = line.split("=", 1)
+                    info[key.strip()] = value.strip().strip('"')
+    except Exception:
+        pass
+    return info
+
+
+def parse_requires(info: dict) -> list[str]:
+    """Mod ids from `require=` (B41 "A,B", B42 "\\A;\\B") or a JSON dependencies list."""
+    value = info.get("require", info.get("dependencies", ""))
+    if isinstance(value, str):
+        value = value.replace(";", ",").split(",")
+    ids = []
+    for item in value or []:
+        mod_id = str(item).strip().lstrip("\\").strip()
+        if mod_id and mod_id not in ids:
+            ids.append(mod_id)
+    return ids
+
+
+def locate_mod_infos(item_path: str, dirs: dict) -> list[tuple[str, str]]:
+    """
+    Every mod.info of a workshop item, found in the directory index without
+    touching disk. PZ keeps one at the item root and/or one per mod under
+    mods/<ModName>/; the first is treated as the item's own.
+    Returns [(path, signature that changes whenever the file does)].
+    """
+    found = []
+    entries = dirs.get(item_path, {})
+    for name in MOD_INFO_FILES:
+        if name in entries:
+            _is_dir, size, mtime = entries[name]
+            path = os.path.join(item_path, name)
+            found.append((path, f"{path}:{size}:{mtime}"))
+
+    mods_dir = os.path.join(item_path, "mods")
+    for sub, (is_dir, _size, _mtime) in sorted(dirs.get(mods_dir, {}).items()):
+        if not is_dir:
+            continue
+        entry = dirs.get(os.path.join(mods_dir, sub), {}).get("mod.info")
+        if entry:
+            path = os.path.join(mods_dir, sub, "mod.info")
+            found.append((path, f"{path}:{entry[1]}:{entry[2]}"))
+    return found
+
+
+# ---------------- CATALOG ----------------
+class ModCatalog:
+    """
+    SQLite catalog of installed workshop items, one row per item folder.
+
+    The directory index supplies folder mtimes and change events; the catalog
+    re-reads a mod.info only when its size or mtime differs from the stored
+    row, so parsed metadata also survives restarts. Reads are plain indexed
+    queries once a root has been reconciled.
+    """
+
+    def __init__(self, db_path: str = CATALOG_DB):
+        self.db_path = db_path
+        self.lock = threading.Lock()         # one writer at a time
+        self.dirty_lock = threading.Lock()
+        self.roots = set()                   # roots whose change events are collected
+        self.ready = set()                   # roots reconciled at least once since start
+        self.dirty = {}                      # root -> set of item names, or None for all
+        self._local = threading.local()
+        dir_index.subscribe(self._on_change)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS mods ("
+                "path TEXT PRIMARY KEY, root TEXT NOT NULL, workshop_id TEXT NOT NULL, "
+                "mod_id TEXT, name TEXT, version TEXT, info_path TEXT, info_sig TEXT, "
+                "info TEXT, mtime REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS mods_root ON mods (root, workshop_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS mods_mtime ON mods (root, mtime)")
+            conn.execute("CREATE INDEX IF NOT EXISTS mods_mod_id ON mods (mod_id)")
+            # every mod.info of every item (an item can ship several mods)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS mod_infos ("
+                "info_path TEXT PRIMARY KEY, item_path TEXT NOT NULL, root TEXT NOT NULL, "
+                "workshop_id TEXT NOT NULL, mod_id TEXT, name TEXT, require TEXT, info_sig TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS mod_infos_item ON mod_infos (item_path)")
+            conn.execute("CREATE INDEX IF NOT EXISTS mod_infos_root ON mod_infos (root, mod_id)")
+            if conn.execute("SELECT 1 FROM mod_infos LIMIT 1").fetchone() is None:
+                # catalogs from before mod_infos existed: re-read every item once
+                conn.execute("UPDATE mods SET info_sig = NULL")
+                conn.commit()
+            # Steam Workshop metadata, keyed by workshop id so it outlives reinstalls
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS workshop_details ("
+                "workshop_id TEXT PRIMARY KEY, result INTEGER, title TEXT, "
+                "time_updated INTEGER, file_size INTEGER, checked REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    # ---------- public ----------
+    def mods(self, roots, since: float | None = None) -> list[dict]:
+        """
+        Items under one or more workshop content folders, as
+        {id, path, root, mtime, mod_id, name, version, info, remote}.
+        `remote` holds the last synced Steam details, or None.
+        `since` keeps only items modified at or after that timestamp.
+        """
+        if isinstance(roots, str):
+            roots = [roots]
+        roots = [os.path.abspath(r) for r in roots]
+        # libraries on different disks are synced concurrently
+        synced = map_per_device(self.sync, roots)
+        roots = [r for r, ok in zip(roots, synced) if ok is True]
+        if not roots:
+            return []
+
+        marks = ",".join("?" * len(roots))
+        sql = (
+            "SELECT m.workshop_id, m.path, m.root, m.mtime, m.mod_id, m.name, m.version, m.info, "
+            "d.result, d.title, d.time_updated, d.file_size, d.checked "
+            "FROM mods m LEFT JOIN workshop_details d ON d.workshop_id = m.workshop_id "
+            f"WHERE m.root IN ({marks})"
+        )
+        args = list(roots)
+        if since is not None:
+            sql += " AND m.mtime >= ?"
+            args.append(since)
+        sql += " ORDER BY m.root, m.workshop_id"
+
+        return [
+            {
+                "id": workshop_id,
+                "path": path,
+                "root": root,
+                "mtime": mtime,
+                "mod_id": mod_id,
+                "name": name,
+                "version": version,
+                "info": json.loads(info) if info else {},
+                "remote": {
+                    "result": result,
+                    "title": title,
+                    "time_updated": time_updated,
+                    "file_size": file_size,
+                    "checked": checked,
+                } if checked is not None else None,
+            }
+            for (workshop_id, path, root, mtime, mod_id, name, version, info,
+                 result, title, time_updated, file_size, checked)
+            in self._conn().execute(sql, args)
+        ]
+
+    def mod_infos(self, roots) -> list[dict]:
+        """
+        One record per mod.info (not per workshop item) under the given roots:
+        {info_path, path, workshop_id, mod_id, name, require, sig}.
+        """
+        if isinstance(roots, str):
+            roots = [roots]
+        roots = [os.path.abspath(r) for r in roots]
+        synced = map_per_device(self.sync, roots)
+        roots = [r for r, ok in zip(roots, synced) if ok is True]
+        if not roots:
+            return []
+
+        marks = ",".join("?" * len(roots))
+        return [
+            {
+                "info_path": info_path,
+                "path": os.path.dirname(info_path),
+                "workshop_id": workshop_id,
+                "mod_id": mod_id,
+                "name": name,
+                "require": json.loads(require) if require else [],
+                "sig": sig,
+            }
+            for info_path, workshop_id, mod_id, name, require, sig in self._conn().execute(
+                "SELECT info_path, workshop_id, mod_id, name, require, info_sig "
+                f"FROM mod_infos WHERE root IN ({marks}) ORDER BY root, workshop_id, info_path",
+                roots,
+            )
+        ]
+
+    def stale_details(self, workshop_ids: list[str], max_age: float) -> list[str]:
+        """Ids whose Steam details are missing or older than `max_age` seconds."""
+        cutoff = time.time() - max_age
+        fresh = set()
+        conn = self._conn()
+        for i in range(0, len(workshop_ids), MAX_IN_LIST):
+            chunk = workshop_ids[i:i + MAX_IN_LIST]
+            marks = ",".join("?" * len(chunk))
+            fresh.update(
+                wid for (wid,) in conn.execute(
+                    f"SELECT workshop_id FROM workshop_details WHERE checked >= ? AND workshop_id IN ({marks})",
+                    (cutoff, *chunk),
+                )
+            )
+        return [wid for wid in workshop_ids if wid not in fresh]
+
+    def store_details(self, details: list[dict], checked: float):
+        """Save GetPublishedFileDetails entries."""
+        with self.lock:
+            conn = self._conn()
+            conn.executemany(
+                "INSERT OR REPLACE INTO workshop_details "
+                "(workshop_id, result, title, time_updated, file_size, checked) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        str(d["publishedfileid"]), d.get("result"), d.get("title"),
+                        d.get("time_updated"), int(d.get("file_size") or 0), checked,
+                    )
+                    for d in details
+                ],
+            )
+            conn.commit()
+
+    def touch_details(self, workshop_ids: list[str], checked: float):
+        """Mark details as re-validated without changes (HTTP 304)."""
+        with self.lock:
+            conn = self._conn()
+            conn.executemany(
+                "UPDATE workshop_details SET checked = ? WHERE workshop_id = ?",
+                [(checked, wid) for wid in workshop_ids],
+            )
+            conn.commit()
+
+    def sync(self, root: str) -> bool:
+        """Bring the rows for `root` up to date. False when it does not exist."""
+        root = os.path.abspath(root)
+        if not dir_index.watch(root):
+            with self.dirty_lock:
+                self.roots.discard(root)
+                self.ready.discard(root)
+            with self.lock:
+                conn = self._conn()
+                conn.execute("DELETE FROM mods WHERE root = ?", (root,))
+                conn.execute("DELETE FROM mod_infos WHERE root = ?", (root,))
+                conn.commit()
+            return False
+
+        with self.dirty_lock:
+            # start collecting events before the first pass so none are missed
+            self.roots.add(root)
+            names = self.dirty.pop(root, set())
+            if names is not None:
+                if root not in self.ready or len(names) > MAX_IN_LIST:
+                    names = None
+                elif not names:
+                    return True
+
+        with self.lock:
+            self._reconcile(root, names)
+        with self.dirty_lock:
+            self.ready.add(root)
+        return True
+
+    # ---------- internals ----------
+    def _on_change(self, changed: set):
+        # watcher thread, index lock held: only note which items to revisit.
+        # A change to the root itself (or an index rebuild) revisits everything.
+        with self.dirty_lock:
+            for path in changed:
+                for root in self.roots:
+                    if path == root:
+                        self.dirty[root] = None
+                    elif path.startswith(root + os.sep):
+                        item = os.path.relpath(path, root).split(os.sep, 1)[0]
+                        names = self.dirty.setdefault(root, set())
+                        if names is not None:
+                            names.add(item)
+
+    def _reconcile(self, root: str, names: set | None):
+        """Re-read changed mod.info files under `root` (only `names` if given)."""
+        with dir_index.lock:
+            dirs = dir_index.dirs
+            folders = {
+                name: mtime for name, (is_dir, _size, mtime) in dirs.get(root, {}).items()
+                if is_dir and (names is None or name in names)
+            }
+            located = {
+                name: locate_mod_infos(os.path.join(root, name), dirs) for name in folders
+            }
+
+        conn = self._conn()
+        if names is None:
+            rows = conn.execute(
+                "SELECT workshop_id, info_sig, mtime FROM mods WHERE root = ?", (root,)
+            ).fetchall()
+        else:
+            marks = ",".join("?" * len(names))
+            rows = conn.execute(
+                f"SELECT workshop_id, info_sig, mtime FROM mods WHERE root = ? AND workshop_id IN ({marks})",
+                (root, *names),
+            ).fetchall()
+        known = {workshop_id: (sig, mtime) for workshop_id, sig, mtime in rows}
+
+        gone = [(os.path.join(root, name),) for name in known if name not in folders]
+        conn.executemany("DELETE FROM mods WHERE path = ?", gone)
+        conn.executemany("DELETE FROM mod_infos WHERE item_path = ?", gone)
+
+        parsed = 0
+        for name, mtime in folders.items():
+            infos = located[name]
+            sig = "|".join(s for _p, s in infos)
+            row = known.get(name)
+            path = os.path.join(root, name)
+            if row and row[0] == sig:
+                if row[1] != mtime:
+                    conn.execute("UPDATE mods SET mtime = ? WHERE path = ?", (mtime, path))
+                continue
+
+            parsed_infos = [(info_path, parse_mod_info(info_path)) for info_path, _s in infos]
+            parsed += len(parsed_infos)
+            info_path, info = parsed_infos[0] if parsed_infos else (None, {})
+            conn.execute(
+                "INSERT OR REPLACE INTO mods "
+                "(path, root, workshop_id, mod_id, name, version, info_path, info_sig, info, mtime) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path, root, name, info.get("id"), info.get("name"), info.get("version"),
+                    info_path, sig, json.dumps(info), mtime,
+                ),
+            )
+            conn.execute("DELETE FROM mod_infos WHERE item_path = ?", (path,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO mod_infos "
+                "(info_path, item_path, root, workshop_id, mod_id, name, require, info_sig) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        p, path, root, name, i.get("id"), i.get("name"),
+                        json.dumps(parse_requires(i)), info_sig,
+                    )
+                    for (p, i), (_p, info_sig) in zip(parsed_infos, infos)
+                ],
+            )
+        conn.commit()
+        if parsed or gone:
+            logger.info(f"[ModCatalog] {root}: {parsed} parsed, {len(gone)} removed")
+
+
+# shared instance used by every mod listing endpoint
+mod_catalog = ModCatalog()
@@ -0,0 +1,177 @@
+import os
+import threading
+
+from backend.services.dir_index import dir_index
+from backend.services.mod_catalog import mod_catalog
+from backend.services.content_hash import content_hasher
+
+# B42 mods keep files under common/ or a version folder (42, 42.0, ...)
+# next to mod.info; those prefixes are dropped so paths line up across mods
+OVERRIDE_ROOT = "media"
+
+def game_path(rel: str) -> str | None:
+    """Path a mod file overrides in the game, or None if it is not loaded from media/."""
+    parts = rel.split("/")
+    if len(parts) > 1 and (parts[0] == "common" or parts[0].replace(".", "").isdigit()):
+        parts = parts[1:]
+    if len(parts) < 2 or parts[0] != OVERRIDE_ROOT:
+        return None
+    return "/".join(parts)
+
+
+class ConflictIndex:
+    """
+    Which mods ship the same game file (media/...). A later-loaded mod wins,
+    so these are silent overrides.
+
+    `providers` maps game path -> set of mod ids, `overlaps` holds the paths
+    with more than one provider. Mods are indexed from the directory index
+    (no disk access); change events mark a mod dirty and only its entries
+    are rebuilt. Content hashes come from the shared content hasher (cached
+    by inode, size and mtime) and are only computed for overlapping files.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mods = {}         # mod_id -> {"path", "files": {game path: abs path}}
+        self.by_dir = {}       # mod dir -> mod_id
+        self.providers = {}    # game path -> set(mod_id)
+        self.overlaps = set()  # game paths with 2+ providers
+        self.dirty = set()     # mod ids whose files changed
+        dir_index.subscribe(self._on_change)
+
+    # ---------- building ----------
+    def refresh(self, roots):
+        records = mod_catalog.mod_infos(roots)
+        wanted = {}
+        for rec in records:
+            if rec["mod_id"] and rec["mod_id"] not in wanted:
+                wanted[rec["mod_id"]] = rec
+
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            gone = [m for m in self.mods if m not in wanted]
+            todo = {
+                mod_id: rec["path"] for mod_id, rec in wanted.items()
+                if mod_id not in self.mods or self.mods[mod_id]["path"] != rec["path"] or mod_id in dirty
+            }
+
+        # walking takes the index lock, whose callbacks take ours: never nest them
+        scanned = {mod_id: self._scan(mod_dir) for mod_id, mod_dir in todo.items()}
+
+        with self.lock:
+            for mod_id in gone:
+                if mod_id in self.mods:
+                    self._remove(mod_id)
+            for mod_id, files in scanned.items():
+                if mod_id in self.mods:
+                    self._remove(mod_id)
+                self._add(mod_id, todo[mod_id], files)
+
+    def _scan(self, mod_dir: str) -> dict:
+        files = {}
+        for folder, entries in dir_index.walk(mod_dir):
+            rel_dir = os.path.relpath(folder, mod_dir).replace(os.sep, "/")
+            for name, (is_dir, _size, _mtime) in entries.items():
+                if is_dir:
+                    continue
+                rel = name if rel_dir == "." else f"{rel_dir}/{name}"
+                target = game_path(rel)
+                if target:
+                    files[target] = os.path.join(folder, name)
+        return files
+
+    def _add(self, mod_id: str, mod_dir: str, files: dict):
+        self.mods[mod_id] = {"path": mod_dir, "files": files}
+        self.by_dir[mod_dir] = mod_id
+        for target in files:
+            owners = self.providers.setdefault(target, set())
+            owners.add(mod_id)
+            if len(owners) > 1:
+                self.overlaps.add(target)
+
+    def _remove(self, mod_id: str):
+        mod = self.mods.pop(mod_id)
+        self.by_dir.pop(mod["path"], None)
+        for target in mod["files"]:
+            owners = self.providers.get(target)
+            if not owners:
+                continue
+            owners.discard(mod_id)
+            if len(owners) < 2:
+                self.overlaps.discard(target)
+            if not owners:
+                del self.providers[target]
+
+    def _on_change(self, changed: set):
+        # watcher thread: map each changed folder to the mod that contains it
+        with self.lock:
+            for path in changed:
+                probe = path
+                while probe not in self.by_dir:
+                    parent = os.path.dirname(probe)
+                    if parent == probe:
+                        break
+                    probe = parent
+                mod_id = self.by_dir.get(probe)
+                if mod_id:
+                    self.dirty.add(mod_id)
+
+    # ---------- queries ----------
+    def conflicts(self, mod_ids: list[str] | None = None, mod: str | None = None,
+                  path: str | None = None, with_hashes: bool = True) -> list[dict]:
+        """
+        Overlapping game paths, optionally limited to a mod selection (given in
+        load order, so the last provider is the one that wins), one mod, or
+        one path. With hashes, `identical` tells copies from real overrides.
+        """
+        selected = set(mod_ids) if mod_ids else None
+        rank = {m: i for i, m in enumerate(mod_ids or [])}
+
+        with self.lock:
+            if path is not None:
+                candidates = [path] if path in self.overlaps else []
+            elif mod is not None:
+                files = self.mods.get(mod, {}).get("files", {})
+                candidates = [t for t in files if t in self.overlaps]
+            else:
+                candidates = list(self.overlaps)
+
+            found = []
+            for target in sorted(candidates):
+                owners = self.providers[target]
+                if selected is not None:
+                    owners = owners & selected
+                if len(owners) < 2:
+                    continue
+                ordered = sorted(owners, key=lambda m: (rank.get(m, len(rank)), m))
+                found.append({
+                    "path": target,
+                    "mods": [{"id": m, "file": self.mods[m]["files"][target]} for m in ordered],
+                    "winner": ordered[-1] if mod_ids else None,
+                })
+
+        if with_hashes and found:
+            digests = content_hasher.hash_files({p["file"] for c in found for p in c["mods"]})
+            for conflict in found:
+                for provider in conflict["mods"]:
+                    provider["hash"] = digests.get(provider["file"])
+                hashes = {p["hash"] for p in conflict["mods"]}
+                conflict["identical"] = len(hashes) == 1 and None not in hashes
+        return found
+
+    def providers_of(self, path: str) -> list[str]:
+        with self.lock:
+            return sorted(self.providers.get(path, ()))
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "mods": len(self.mods),
+                "files": len(self.providers),
+                "overlapping": len(self.overlaps),
+            }
+
+
+# shared instance
+mod_conflicts = ConflictIndex()
@@ -0,0 +1,170 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+
+from backend.services.dir_index import dir_index
+from backend.services.mod_catalog import mod_catalog
+
+logger = logging.getLogger("mod_events")
+
+# a burst of changes (SteamCMD unpacking a batch) is reported once it has been
+# quiet for DEBOUNCE seconds, and at least every MAX_DELAY while it goes on
+DEBOUNCE = 2.0
+MAX_DELAY = 30.0
+QUEUE_SIZE = 1000
+
+
+class ModEvents:
+    """
+    mod_added / mod_updated / mod_removed events for workshop content folders.
+
+    Change events from the directory index mark workshop items dirty; after a
+    quiet period the catalog is re-read for those items only and the diff
+    against the last known state goes to every subscriber queue. Nothing is
+    tracked while nobody is subscribed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.roots = set()
+        self.known = {}        # root -> {workshop id: catalog record}
+        self.dirty = {}        # root -> set of item names, or None for all
+        self.queues = set()    # one asyncio.Queue per subscriber
+        self.loop = None
+        self._wake = None
+        self._task = None
+        dir_index.subscribe(self._on_change)
+
+    # ---------- subscribers ----------
+    async def subscribe(self, roots: list[str]) -> asyncio.Queue:
+        """Queue of {"event", "mod"} dicts for changes under `roots`."""
+        roots = [os.path.abspath(r) for r in roots]
+        new = [r for r in roots if r not in self.known]
+        # baseline first, so the items already installed are not reported as added
+        baselines = await asyncio.to_thread(lambda: {r: self._snapshot(r) for r in new})
+
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self.lock:
+            for root, records in baselines.items():
+                if root not in self.known:
+                    self.known[root] = records
+                    self.roots.add(root)
+            self.queues.add(queue)
+            if self._task is None or self._task.done():
+                self.loop = asyncio.get_running_loop()
+                self._wake = asyncio.Event()
+                self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self.lock:
+            self.queues.discard(queue)
+            if not self.queues:
+                # idle: stop tracking, the next subscriber takes a fresh baseline
+                self.roots.clear()
+                self.known.clear()
+                self.dirty.clear()
+                if self._wake is not None:
+                    self.loop.call_soon_threadsafe(self._wake.set)
+
+    # ---------- change tracking ----------
+    def _on_change(self, changed: set):
+        # watcher thread, index lock held: note the items and wake the debouncer
+        with self.lock:
+            if not self.queues:
+                return
+            hit = False
+            for path in changed:
+                for root in self.roots:
+                    if path == root:
+                        self.dirty[root] = None
+                    elif path.startswith(root + os.sep):
+                        item = os.path.relpath(path, root).split(os.sep, 1)[0]
+                        names = self.dirty.setdefault(root, set())
+                        if names is not None:
+                            names.add(item)
+                    else:
+                        continue
+                    hit = True
+            if hit:
+                self.loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            with self.lock:
+                if not self.queues:
+                    return
+
+            started = time.monotonic()
+            while time.monotonic() - started < MAX_DELAY:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), DEBOUNCE)
+                except asyncio.TimeoutError:
+                    break
+                self._wake.clear()
+
+            with self.lock:
+                dirty, self.dirty = self.dirty, {}
+            if not dirty:
+                continue
+            try:
+                events = await asyncio.to_thread(self._diff, dirty)
+            except Exception as e:
+                logger.warning(f"[ModEvents] diff failed: {e}")
+                continue
+
+            with self.lock:
+                queues = list(self.queues)
+            for event in events:
+                for queue in queues:
+                    try:
+                        queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        _resync(queue)
+
+    def _snapshot(self, root: str) -> dict:
+        return {mod["id"]: mod for mod in mod_catalog.mods(root)}
+
+    def _diff(self, dirty: dict) -> list[dict]:
+        events = []
+        for root, names in dirty.items():
+            with self.lock:
+                before = self.known.get(root)
+            if before is None:
+                continue
+            after = self._snapshot(root)
+            candidates = set(before) | set(after) if names is None else names
+
+            for workshop_id in sorted(candidates):
+                old, new = before.get(workshop_id), after.get(workshop_id)
+                if old is None and new is not None:
+                    events.append({"event": "mod_added", "mod": new})
+                elif old is not None and new is None:
+                    events.append({"event": "mod_removed", "mod": old})
+                elif old is not None and (names is not None or _changed(old, new)):
+                    events.append({"event": "mod_updated", "mod": new})
+
+            with self.lock:
+                if root in self.known:
+                    self.known[root] = after
+        return events
+
+
+def _resync(queue: asyncio.Queue):
+    """A subscriber fell QUEUE_SIZE events behind: drop its backlog and tell it to reload."""
+    while not queue.empty():
+        queue.get_nowait()
+    queue.put_nowait({"event": "resync", "mod": None})
+
+
+def _changed(old: dict, new: dict) -> bool:
+    keys = ("mtime", "mod_id", "name", "version", "info")
+    return any(old[k] != new[k] for k in keys)
+
+
+# shared instance
+mod_events = ModEvents()
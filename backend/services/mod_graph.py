@@ -0,0 +1,276 @@
+import heapq
+import threading
+
+from backend.services.mod_catalog import mod_catalog
+
+
+class ModGraph:
+    """
+    Dependency graph of installed mods, built from `require=` in mod.info.
+
+    Nodes are mod ids. refresh() pulls the catalog and only touches mods whose
+    mod.info signature changed; derived data (reverse edges, cycles) is
+    recomputed lazily and only after something changed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.nodes = {}        # mod_id -> {"requires", "workshop_id", "name", "path", "sig"}
+        self.duplicates = {}   # mod_id -> other folders shipping the same id
+        self.version = 0
+        self._derived = None   # (version, dependents, cycles)
+
+    # ---------- building ----------
+    def refresh(self, roots) -> int:
+        """Sync with the catalog for `roots`; returns the graph version."""
+        records = mod_catalog.mod_infos(roots)
+        with self.lock:
+            seen = {}
+            duplicates = {}
+            changed = False
+            for rec in records:
+                mod_id = rec["mod_id"]
+                if not mod_id:
+                    continue
+                if mod_id in seen:
+                    duplicates.setdefault(mod_id, []).append(rec["path"])
+                    continue
+                seen[mod_id] = rec
+                node = self.nodes.get(mod_id)
+                if node is None or node["sig"] != rec["sig"] or node["path"] != rec["path"]:
+                    self.nodes[mod_id] = {
+                        "requires": [r for r in rec["require"] if r != mod_id],
+                        "workshop_id": rec["workshop_id"],
+                        "name": rec["name"],
+                        "path": rec["path"],
+                        "sig": rec["sig"],
+                    }
+                    changed = True
+
+            for mod_id in [m for m in self.nodes if m not in seen]:
+                del self.nodes[mod_id]
+                changed = True
+
+            self.duplicates = duplicates
+            if changed:
+                self.version += 1
+            return self.version
+
+    def _derive(self):
+        """Reverse edges and cycles, cached per graph version (lock held)."""
+        if self._derived and self._derived[0] == self.version:
+            return self._derived[1], self._derived[2]
+        dependents = {mod_id: [] for mod_id in self.nodes}
+        for mod_id, node in self.nodes.items():
+            for dep in node["requires"]:
+                if dep in dependents:
+                    dependents[dep].append(mod_id)
+        cycles = find_cycles({m: n["requires"] for m, n in self.nodes.items()})
+        self._derived = (self.version, dependents, cycles)
+        return dependents, cycles
+
+    # ---------- queries ----------
+    def closure(self, mod_ids: list[str]) -> tuple[list[str], dict]:
+        """
+        The chosen mods plus everything they need, transitively.
+        Returns (mods in discovery order, {mod: [missing dependencies]}).
+        """
+        with self.lock:
+            result = []
+            seen = set()
+            missing = {}
+            stack = list(reversed(mod_ids))
+            while stack:
+                mod_id = stack.pop()
+                if mod_id in seen:
+                    continue
+                seen.add(mod_id)
+                node = self.nodes.get(mod_id)
+                if node is None:
+                    continue
+                result.append(mod_id)
+                for dep in reversed(node["requires"]):
+                    if dep not in self.nodes:
+                        missing.setdefault(mod_id, []).append(dep)
+                    elif dep not in seen:
+                        stack.append(dep)
+            not_installed = [m for m in mod_ids if m not in self.nodes]
+            if not_installed:
+                missing[""] = not_installed
+            return result, missing
+
+    def load_order(self, mod_ids: list[str]) -> dict:
+        """
+        Topological order for `mod_ids` (dependencies first). Ties keep the
+        order the mods were given in. A cycle cannot be ordered: it is
+        reported and placed as one block, once every mod it needs from
+        outside the cycle is placed, so nothing lands before its dependencies
+        except inside the cycle itself.
+        """
+        with self.lock:
+            chosen = [m for m in dict.fromkeys(mod_ids) if m in self.nodes]
+            rank = {m: i for i, m in enumerate(chosen)}
+            edges = {m: [d for d in self.nodes[m]["requires"] if d in rank] for m in chosen}
+            cycles = find_cycles(edges)
+
+            # condense each cycle into its earliest-given member
+            component = {m: m for m in chosen}
+            for cycle in cycles:
+                head = min(cycle, key=rank.get)
+                for m in cycle:
+                    component[m] = head
+            members = {}
+            for m in chosen:
+                members.setdefault(component[m], []).append(m)
+
+            pending = {c: 0 for c in members}
+            users = {c: set() for c in members}
+            for m in chosen:
+                for dep in edges[m]:
+                    user, needed = component[m], component[dep]
+                    if user != needed and user not in users[needed]:
+                        users[needed].add(user)
+                        pending[user] += 1
+
+            ready = [(rank[c], c) for c in members if pending[c] == 0]
+            heapq.heapify(ready)
+            order = []
+            while ready:
+                _, head = heapq.heappop(ready)
+                order.extend(_order_cycle(members[head], edges, rank))
+                for user in users[head]:
+                    pending[user] -= 1
+                    if pending[user] == 0:
+                        heapq.heappush(ready, (rank[user], user))
+
+            return {"order": order, "cycles": cycles}
+
+    def resolve(self, mod_ids: list[str]) -> dict:
+        """Closure plus load order for a mod selection (e.g. a server's Mods= list)."""
+        mods, missing = self.closure(mod_ids)
+        ordered = self.load_order(mods)
+        given = set(mod_ids)
+        return {
+            "order": ordered["order"],
+            "added": [m for m in mods if m not in given],
+            "missing": missing,
+            "cycles": ordered["cycles"],
+        }
+
+    def summary(self) -> dict:
+        """Every mod with its edges, plus graph-wide problems."""
+        with self.lock:
+            dependents, cycles = self._derive()
+            mods = []
+            missing = {}
+            for mod_id, node in sorted(self.nodes.items()):
+                absent = [d for d in node["requires"] if d not in self.nodes]
+                if absent:
+                    missing[mod_id] = absent
+                mods.append({
+                    "id": mod_id,
+                    "name": node["name"],
+                    "workshopId": node["workshop_id"],
+                    "requires": node["requires"],
+                    "requiredBy": sorted(dependents[mod_id]),
+                    "missing": absent,
+                })
+            return {
+                "version": self.version,
+                "mods": mods,
+                "missing": missing,
+                "cycles": cycles,
+                "duplicates": self.duplicates,
+            }
+
+
+def find_cycles(edges: dict) -> list[list[str]]:
+    """Strongly connected components with more than one mod (Tarjan, iterative)."""
+    index = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    cycles = []
+    counter = 0
+
+    for start in edges:
+        if start in index:
+            continue
+        work = [(start, iter(edges.get(start, ())))]
+        index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            node, deps = work[-1]
+            advanced = False
+            for dep in deps:
+                if dep not in edges:
+                    continue
+                if dep not in index:
+                    index[dep] = low[dep] = counter
+                    counter += 1
+                    stack.append(dep)
+                    on_stack.add(dep)
+                    work.append((dep, iter(edges.get(dep, ()))))
+                    advanced = True
+                    break
+                if dep in on_stack:
+                    low[node] = min(low[node], index[dep])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1:
+                    cycles.append(sorted(component))
+    return cycles
+
+
+def _order_cycle(group: list[str], edges: dict, rank: dict) -> list[str]:
+    """
+    Best order inside one cycle: dependencies first where possible, and when
+    every remaining member waits on another, the earliest-given one goes next.
+    """
+    if len(group) == 1:
+        return group
+    inside = set(group)
+    pending = {m: 0 for m in group}
+    users = {m: [] for m in group}
+    for m in group:
+        for dep in edges[m]:
+            if dep in inside:
+                pending[m] += 1
+                users[dep].append(m)
+
+    ready = []
+    order = []
+    placed = set()
+    while len(order) < len(group):
+        if not ready:
+            stuck = next(m for m in group if m not in placed)
+            heapq.heappush(ready, (rank[stuck], stuck))
+        _, mod_id = heapq.heappop(ready)
+        if mod_id in placed:
+            continue
+        order.append(mod_id)
+        placed.add(mod_id)
+        for user in users[mod_id]:
+            pending[user] -= 1
+            if pending[user] == 0:
+                heapq.heappush(ready, (rank[user], user))
+    return order
+
+
+# shared instance
+mod_graph = ModGraph()
+
@@ -0,0 +1,140 @@
+import os
+import re
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# concurrent walks allowed on one physical disk: seeks make parallel reads on
+# a spinning disk slower than serial ones, flash handles a few at once
+ROTATIONAL_WORKERS = 1
+SOLID_STATE_WORKERS = 4
+MAX_WORKERS = 16
+
+# libraryfolders.vdf: new format has "path" "X", the old one "1" "X". The new
+# format's "apps" blocks also pair numbers ("appid" "size"), so only an
+# absolute path (/..., or C:\\... with vdf's escaped backslash) counts.
+LIBRARY_PATH = re.compile(r'"(?:path|\d+)"\s+"((?:/|[A-Za-z]:(?:\\\\|/))[^"]*)"')
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="steam-libs")
+_lock = threading.Lock()
+_vdf_cache = {}       # vdf path -> (mtime_ns, [library roots])
+_device_slots = {}    # physical device -> Semaphore
+
+
+# ---------------- RESOLVER ----------------
+def steam_roots() -> list[str]:
+    if platform.system() == "Windows":
+        return [
+            os.path.expandvars(r"%ProgramFiles(x86)%\Steam"),
+            os.path.expandvars(r"%ProgramFiles%\Steam"),
+            os.path.expanduser(r"~\Steam"),
+        ]
+    return [
+        os.path.expanduser("~/Steam"),
+        os.path.expanduser("~/.steam/steam"),
+        os.path.expanduser("~/.local/share/Steam"),
+    ]
+
+
+def _libraries_from_vdf(vdf_path: str) -> list[str]:
+    """Library roots listed in a libraryfolders.vdf, re-read only when it changes."""
+    try:
+        mtime = os.stat(vdf_path).st_mtime_ns
+    except OSError:
+        return []
+    with _lock:
+        cached = _vdf_cache.get(vdf_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(vdf_path, "r", encoding="utf-8", errors="ignore") as f:
+            # vdf escapes backslashes in Windows paths
+            found = [m.replace("\\\\", "\\") for m in LIBRARY_PATH.findall(f.read())]
+    except OSError:
+        found = []
+    with _lock:
+        _vdf_cache[vdf_path] = (mtime, found)
+    return found
+
+
+def library_roots() -> list[str]:
+    """Every Steam library folder: the install roots plus libraryfolders.vdf entries."""
+    libraries = []
+    seen = set()
+    for root in steam_roots():
+        steamapps = os.path.join(root, "steamapps")
+        if not os.path.isdir(steamapps):
+            continue
+        for library in [root] + _libraries_from_vdf(os.path.join(steamapps, "libraryfolders.vdf")):
+            key = os.path.realpath(library)
+            if key not in seen and os.path.isdir(os.path.join(library, "steamapps")):
+                seen.add(key)
+                libraries.append(library)
+    return libraries
+
+
+def steamapps_dirs() -> list[str]:
+    return [os.path.join(lib, "steamapps") for lib in library_roots()]
+
+
+def workshop_content_dirs() -> list[str]:
+    return [os.path.join(lib, "steamapps", "workshop", "content") for lib in library_roots()]
+
+
+def workshop_paths(appid: str = "108600") -> list[str]:
+    """Existing workshop/content/<appid> folders across all libraries."""
+    paths = [os.path.join(content, appid) for content in workshop_content_dirs()]
+    return [p for p in paths if os.path.isdir(p)]
+
+
+# ---------------- PER-DEVICE SCANNING ----------------
+def physical_device(path: str):
+    """
+    Disk holding `path` (e.g. "sda", "nvme0n1") and whether it is rotational.
+    Partitions of one disk share an entry. Falls back to st_dev elsewhere.
+    """
+    st_dev = os.stat(path).st_dev
+    sys_path = f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}"
+    try:
+        real = os.path.realpath(sys_path)
+        if os.path.exists(os.path.join(real, "partition")):
+            real = os.path.dirname(real)
+        with open(os.path.join(real, "queue", "rotational"), "r") as f:
+            return os.path.basename(real), f.read().strip() == "1"
+    except OSError:
+        return st_dev, False
+
+
+def _slots_for(path: str) -> threading.Semaphore:
+    try:
+        device, rotational = physical_device(path)
+    except OSError:
+        device, rotational = path, False
+    with _lock:
+        if device not in _device_slots:
+            workers = ROTATIONAL_WORKERS if rotational else SOLID_STATE_WORKERS
+            _device_slots[device] = threading.Semaphore(workers)
+        return _device_slots[device]
+
+
+def map_per_device(fn, paths: list[str]) -> list:
+    """
+    fn(path) for every path, each on its own worker, with at most a few
+    running against the same physical disk. Results keep the input order;
+    an exception from fn is returned in place of its result.
+    """
+    if len(paths) <= 1:
+        return [fn(p) for p in paths]
+
+    def run(path):
+        with _slots_for(path):
+            return fn(path)
+
+    futures = [_pool.submit(run, p) for p in paths]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
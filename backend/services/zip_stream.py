@@ -0,0 +1,242 @@
+import os
+import stat
+import time
+import zlib
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1024 * 1024
+COMPRESS_LEVEL = 6
+
+# small files are compressed ahead on worker threads (zlib releases the GIL);
+# bigger ones are deflated inline while streaming
+PARALLEL_MAX_SIZE = 4 * 1024 * 1024
+PARALLEL_WINDOW = 4
+PARALLEL_WORKERS = 4
+
+# already-compressed formats gain nothing from deflate
+STORED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".dds", ".ogg", ".mp3", ".wav",
+    ".bank", ".zip", ".7z", ".rar", ".gz", ".xz", ".bz2", ".pack", ".bin",
+}
+
+ZIP64_LIMIT = 0xFFFFFFFF
+FLAG_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+STORED = 0
+DEFLATED = 8
+
+_pool = ThreadPoolExecutor(max_workers=PARALLEL_WORKERS, thread_name_prefix="zip-deflate")
+
+
+# ---------------- HELPERS ----------------
+def _dos_datetime(mtime: float):
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def _deflate_file(path: str):
+    """Compress a whole (small) file; returns (data, crc, size)."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    comp = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    return comp.compress(raw) + comp.flush(), zlib.crc32(raw), len(raw)
+
+
+def _walk(top: str):
+    """Depth-first (abs path, archive name, is_dir, stat) as the tree is read."""
+    base = os.path.dirname(top.rstrip("/\\")) or top
+    stack = [top]
+    while stack:
+        folder = stack.pop()
+        rel = os.path.relpath(folder, base).replace("\\", "/")
+        try:
+            st = os.stat(folder)
+            entries = sorted(os.scandir(folder), key=lambda e: e.name)
+        except OSError:
+            continue
+        yield folder, rel + "/", True, st
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, f"{rel}/{entry.name}", False, entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+        stack.extend(reversed(subdirs))
+
+
+# ---------------- WRITER ----------------
+class ZipStream:
+    """
+    Writes a ZIP archive as a byte generator without seeking, so it can be
+    sent to the client while the tree is still being read. Entries switch to
+    ZIP64 records when sizes or offsets pass 4 GiB.
+    """
+
+    def __init__(self, mode: str = "auto"):
+        self.mode = mode
+        self.offset = 0
+        self.central = []
+
+    def _method_for(self, name: str) -> int:
+        if self.mode == "store":
+            return STORED
+        if self.mode == "deflate":
+            return DEFLATED
+        return STORED if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS else DEFLATED
+
+    def _emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    def _local_header(self, name: bytes, method: int, flags: int, dos, crc, csize, usize, zip64: bool):
+        extra = b""
+        if zip64:
+            extra = struct.pack("<HHQQ", 1, 16, usize, csize)
+            csize = usize = ZIP64_LIMIT
+        return struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 45 if zip64 else 20, flags, method,
+            dos[0], dos[1], crc, csize, usize, len(name), len(extra),
+        ) + name + extra
+
+    def _add_central(self, name, method, flags, dos, crc, csize, usize, header_offset, mode):
+        self.central.append((name, method, flags, dos, crc, csize, usize, header_offset, mode))
+
+    def directory(self, arcname: str, st: os.stat_result):
+        name = arcname.encode("utf-8")
+        dos = _dos_datetime(st.st_mtime)
+        header_offset = self.offset
+        yield self._emit(self._local_header(name, STORED, FLAG_UTF8, dos, 0, 0, 0, False))
+        self._add_central(name, STORED, FLAG_UTF8, dos, 0, 0, 0, header_offset, st.st_mode | stat.S_IFDIR)
+
+    def precompressed(self, arcname: str, st: os.stat_result, data: bytes, crc: int, usize: int):
+        name = arcname.encode("utf-8")
+        dos = _dos_datetime(st.st_mtime)
+        header_offset = self.offset
+        yield self._emit(self._local_header(name, DEFLATED, FLAG_UTF8, dos, crc, len(data), usize, False))
+        yield self._emit(data)
+        self._add_central(name, DEFLATED, FLAG_UTF8, dos, crc, len(data), usize, header_offset, st.st_mode)
+
+    def streamed(self, path: str, arcname: str, st: os.stat_result):
+        """Sizes and CRC follow the data in a descriptor, so memory stays flat."""
+        name = arcname.encode("utf-8")
+        method = self._method_for(arcname)
+        dos = _dos_datetime(st.st_mtime)
+        flags = FLAG_UTF8 | FLAG_DESCRIPTOR
+        zip64 = st.st_size >= ZIP64_LIMIT
+        header_offset = self.offset
+
+        # open before emitting the header so an unreadable file is just skipped
+        f = open(path, "rb")
+        with f:
+            yield self._emit(self._local_header(name, method, flags, dos, 0, 0, 0, zip64))
+
+            crc = 0
+            usize = 0
+            csize = 0
+            comp = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15) if method == DEFLATED else None
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                crc = zlib.crc32(chunk, crc)
+                usize += len(chunk)
+                out = comp.compress(chunk) if comp else chunk
+                if out:
+                    csize += len(out)
+                    yield self._emit(out)
+        if comp:
+            out = comp.flush()
+            csize += len(out)
+            yield self._emit(out)
+
+        if zip64 or usize >= ZIP64_LIMIT or csize >= ZIP64_LIMIT:
+            yield self._emit(struct.pack("<IIQQ", 0x08074B50, crc, csize, usize))
+        else:
+            yield self._emit(struct.pack("<IIII", 0x08074B50, crc, csize, usize))
+        self._add_central(name, method, flags, dos, crc, csize, usize, header_offset, st.st_mode)
+
+    def finish(self):
+        cd_offset = self.offset
+        for name, method, flags, dos, crc, csize, usize, header_offset, mode in self.central:
+            values = []
+            if usize >= ZIP64_LIMIT:
+                values.append(usize)
+                usize = ZIP64_LIMIT
+            if csize >= ZIP64_LIMIT:
+                values.append(csize)
+                csize = ZIP64_LIMIT
+            if header_offset >= ZIP64_LIMIT:
+                values.append(header_offset)
+                header_offset = ZIP64_LIMIT
+            extra = struct.pack(f"<HH{len(values)}Q", 1, 8 * len(values), *values) if values else b""
+            version = 45 if values else 20
+            yield self._emit(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | version, version, flags, method,
+                dos[0], dos[1], crc, csize, usize, len(name), len(extra), 0, 0, 0,
+                (mode & 0xFFFF) << 16, header_offset,
+            ) + name + extra)
+        cd_size = self.offset - cd_offset
+        count = len(self.central)
+
+        if count >= 0xFFFF or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+            zip64_eocd = self.offset
+            yield self._emit(struct.pack(
+                "<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset,
+            ))
+            yield self._emit(struct.pack("<IIQI", 0x07064B50, 0, zip64_eocd, 1))
+            count = min(count, 0xFFFF)
+            cd_size = min(cd_size, ZIP64_LIMIT)
+            cd_offset = min(cd_offset, ZIP64_LIMIT)
+
+        yield self._emit(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0))
+
+
+def stream_zip(top: str, mode: str = "auto"):
+    """
+    Generator of ZIP bytes for the folder `top`. Small compressible files are
+    deflated ahead on a thread pool (a few at a time, in order); everything
+    else is stored or deflated inline in fixed-size chunks. A file that
+    cannot be opened is left out; a read error halfway through one raises.
+    """
+    writer = ZipStream(mode)
+    pending = deque()  # (kind, args..., future|None) kept in walk order
+
+    def drain(limit: int):
+        while len(pending) > limit:
+            item = pending.popleft()
+            if item[0] == "dir":
+                yield from writer.directory(item[1], item[2])
+            elif item[0] == "deflated":
+                try:
+                    data, crc, usize = item[3].result()
+                except OSError:
+                    continue
+                yield from writer.precompressed(item[1], item[2], data, crc, usize)
+            else:
+                start = writer.offset
+                try:
+                    yield from writer.streamed(item[1], item[2], item[3])
+                except OSError:
+                    if writer.offset != start:
+                        # its header and part of its data are already sent:
+                        # cut the download short rather than finish a corrupt archive
+                        raise
+                    continue
+
+    for path, arcname, is_dir, st in _walk(top):
+        if is_dir:
+            pending.append(("dir", arcname, st))
+        elif writer._method_for(arcname) == DEFLATED and st.st_size <= PARALLEL_MAX_SIZE:
+            pending.append(("deflated", arcname, st, _pool.submit(_deflate_file, path)))
+        else:
+            pending.append(("stream", path, arcname, st))
+        yield from drain(PARALLEL_WINDOW)
+
+    yield from drain(0)
+    yield from writer.finish()
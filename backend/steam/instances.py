@@ -0,0 +1,345 @@
+"""
+Server instances built from a shared base install.
+
+SteamCMD installs each app/branch once (the base). An instance is a folder
+tree whose files are reflinks of the base where the filesystem supports
+them (btrfs, XFS: real copy-on-write) and hardlinks otherwise, so a new
+instance costs seconds and almost no disk. Small config-like files are
+always copied, since servers and admins edit those in place.
+
+A hardlink is the same file as the base, so it must never be written in
+place. Every panel editor that can open arbitrary files (file manager,
+FTP browser, MyMods) saves through file_patch.atomic_write (temp file +
+rename), which replaces the link and gives the instance its own copy; the
+settings pages only rewrite config files, which are private copies anyway.
+Symlinks in the base are recreated as symlinks.
+
+Each instance keeps a manifest of everything it got from the base, copies
+included; refresh() brings the entries the instance never changed up to
+date with the base (relinking, recopying or removing them), and leaves the
+ones it did change alone.
+"""
+import os
+import re
+import json
+import stat
+import time
+import errno
+import fcntl
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+BASE_INSTALL_DIR = "/home/game_servers"
+INSTANCES_DIR = os.path.join(BASE_INSTALL_DIR, "instances")
+MANIFEST = ".modix-instance.json"
+
+# always copied: edited in place by servers and admins
+PRIVATE_SUFFIXES = (".ini", ".json", ".cfg", ".properties", ".sh", ".bat", ".txt", ".xml")
+PRIVATE_MAX_SIZE = 1024 * 1024
+
+FICLONE = 0x40049409  # ioctl: share extents, copy-on-write (btrfs, XFS, bcachefs)
+
+BRANCH_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+_reflink_ok = {}  # st_dev -> bool, learned on first attempt
+
+# a base is either being installed (one SteamCMD run) or read by instance
+# copies (any number), never both: a copy taken mid-update mixes versions
+_base_lock = threading.Lock()
+_base_users = {}  # base path -> "install" or count of instance operations
+
+
+class InstanceError(Exception):
+    pass
+
+
+def base_path(appid: str, branch: str = "public") -> str:
+    """Where SteamCMD installs an app branch; the public branch keeps the old location."""
+    if not appid or not appid.isascii() or not appid.isdigit():
+        raise InstanceError("appId must be a Steam app id")
+    if not BRANCH_NAME.fullmatch(branch or ""):
+        raise InstanceError(f"Invalid branch: {branch!r}")
+    path = os.path.join(BASE_INSTALL_DIR, appid if branch == "public" else f"{appid}-{branch}")
+    # a symlinked base must still resolve to a direct child of the install dir
+    real = os.path.realpath(path)
+    if (os.path.dirname(real) != os.path.realpath(BASE_INSTALL_DIR)
+            or real == os.path.realpath(INSTANCES_DIR)):
+        raise InstanceError(f"Base install {path} resolves outside {BASE_INSTALL_DIR}")
+    return path
+
+
+def claim_base(base: str) -> bool:
+    """Take `base` for an install; False while an install or instance copy uses it."""
+    with _base_lock:
+        if base in _base_users:
+            return False
+        _base_users[base] = "install"
+        return True
+
+
+def release_base(base: str):
+    with _base_lock:
+        if _base_users.get(base) == "install":
+            del _base_users[base]
+
+
+@contextmanager
+def _reading_base(base: str):
+    with _base_lock:
+        users = _base_users.get(base, 0)
+        if users == "install":
+            raise InstanceError(f"Base install {base} is being updated, try again when the install finishes")
+        _base_users[base] = users + 1
+    try:
+        yield
+    finally:
+        with _base_lock:
+            _base_users[base] -= 1
+            if not _base_users[base]:
+                del _base_users[base]
+
+
+def instance_path(name: str) -> str:
+    if not name or name.startswith(".") or os.sep in name or (os.altsep and os.altsep in name):
+        raise InstanceError(f"Invalid instance name: {name!r}")
+    return os.path.join(INSTANCES_DIR, name)
+
+
+def _private(rel: str, size: int) -> bool:
+    return rel.lower().endswith(PRIVATE_SUFFIXES) and size <= PRIVATE_MAX_SIZE
+
+
+def _sig(st: os.stat_result) -> list:
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+# ---------------- FILE SHARING ----------------
+def _reflink(src: str, dst: str) -> bool:
+    dev = os.stat(os.path.dirname(dst)).st_dev
+    if _reflink_ok.get(dev) is False:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    except OSError as e:
+        if os.path.exists(dst):
+            os.remove(dst)
+        if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+            _reflink_ok[dev] = False
+            return False
+        raise
+    _reflink_ok[dev] = True
+    shutil.copystat(src, dst)
+    return True
+
+
+def share_file(src: str, dst: str, private: bool = False) -> str:
+    """Materialise `src` at `dst`; returns "reflink", "hardlink" or "copy"."""
+    if _reflink(src, dst):
+        return "reflink"
+    if not private:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def _materialise(src: str, st: os.stat_result, dst: str, rel: str) -> dict:
+    """Create `dst` from base entry `src`; returns its manifest entry."""
+    if stat.S_ISLNK(st.st_mode):
+        link = os.readlink(src)
+        os.symlink(link, dst)
+        return {"how": "symlink", "link": link}
+    how = share_file(src, dst, _private(rel, st.st_size))
+    return {"how": how, "base": _sig(st)}
+
+
+def _untouched(entry: dict, dst: str, local: os.stat_result) -> bool:
+    """The instance still has exactly what the manifest says it got from the base."""
+    if entry["how"] == "symlink":
+        return stat.S_ISLNK(local.st_mode) and os.readlink(dst) == entry["link"]
+    if not stat.S_ISREG(local.st_mode):
+        return False
+    if entry["how"] == "hardlink":
+        return local.st_ino == entry["base"][0]
+    # reflinks and copies keep the base's size and mtime until written to
+    return [local.st_size, local.st_mtime_ns] == entry["base"][1:]
+
+
+def _current(entry: dict, src: str, st: os.stat_result) -> bool:
+    """The base entry has not changed since the instance got it."""
+    if entry["how"] == "symlink":
+        return stat.S_ISLNK(st.st_mode) and os.readlink(src) == entry["link"]
+    if not stat.S_ISREG(st.st_mode):
+        return False
+    if entry["how"] == "hardlink":
+        return st.st_ino == entry["base"][0]     # updated in place: the link sees it
+    return _sig(st) == entry["base"]
+
+
+def _walk_files(top: str):
+    """(relative path, abs path, lstat) for every regular file and symlink below `top`."""
+    for folder, dirs, files in os.walk(top):
+        dirs[:] = [d for d in dirs if not d.startswith(".modix")]
+        # os.walk lists symlinks to folders with the folders but does not follow them
+        links = [d for d in dirs if os.path.islink(os.path.join(folder, d))]
+        for name in files + links:
+            if name == MANIFEST:
+                continue
+            path = os.path.join(folder, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode) or stat.S_ISLNK(st.st_mode):
+                yield os.path.relpath(path, top), path, st
+
+
+# ---------------- INSTANCES ----------------
+def _read_manifest(target: str) -> dict:
+    try:
+        with open(os.path.join(target, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise InstanceError(f"Not an instance: {os.path.basename(target)}")
+
+
+def _write_manifest(target: str, manifest: dict):
+    fd, tmp = tempfile.mkstemp(prefix=".modix-", suffix=".tmp", dir=target)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(target, MANIFEST))
+
+
+def create_instance(name: str, appid: str, branch: str = "public") -> dict:
+    base = base_path(appid, branch)
+    if not os.path.isdir(base):
+        raise InstanceError(f"App {appid} ({branch}) is not installed")
+    target = instance_path(name)
+    if os.path.exists(target):
+        raise InstanceError(f"Instance {name} already exists")
+
+    started = time.monotonic()
+    os.makedirs(INSTANCES_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{name}-", dir=INSTANCES_DIR)
+
+    counts = {"reflink": 0, "hardlink": 0, "copy": 0, "symlink": 0}
+    files = {}
+    try:
+        with _reading_base(base):
+            for folder, _dirs, _files in os.walk(base):
+                rel_dir = os.path.relpath(folder, base)
+                os.makedirs(os.path.join(staging, rel_dir), exist_ok=True)
+            for rel, src, st in _walk_files(base):
+                files[rel] = _materialise(src, st, os.path.join(staging, rel), rel)
+                counts[files[rel]["how"]] += 1
+        _write_manifest(staging, {
+            "name": name, "appid": appid, "branch": branch, "base": base,
+            "created": time.time(), "files": files,
+        })
+        # only a complete tree ever appears under the instance name
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    return {
+        "name": name,
+        "path": target,
+        "base": base,
+        **counts,
+        "elapsedMs": int((time.monotonic() - started) * 1000),
+    }
+
+
+def refresh_instance(name: str) -> dict:
+    """
+    Pick up a base update. Entries the instance never changed follow the
+    current base: relinked or recopied when the base changed them, removed
+    when the base dropped them. Files the instance changed or added are kept.
+    """
+    target = instance_path(name)
+    manifest = _read_manifest(target)
+    base = manifest["base"]
+    if not os.path.isdir(base):
+        raise InstanceError(f"Base install {base} is missing")
+
+    started = time.monotonic()
+    with _reading_base(base):
+        files = manifest["files"]
+        stats = {"relinked": 0, "added": 0, "removed": 0, "kept": 0, "unchanged": 0}
+        seen = set()
+        for rel, src, st in _walk_files(base):
+            seen.add(rel)
+            dst = os.path.join(target, rel)
+            entry = files.get(rel)
+            try:
+                local = os.lstat(dst)
+            except FileNotFoundError:
+                local = None
+
+            if local is None:
+                if entry is not None:
+                    stats["kept"] += 1          # deleted by the instance on purpose
+                    continue
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                files[rel] = _materialise(src, st, dst, rel)
+                stats["added"] += 1
+                continue
+            if entry is None or not _untouched(entry, dst, local):
+                stats["kept"] += 1              # the instance's own file, or changed by it
+                continue
+            if _current(entry, src, st):
+                stats["unchanged"] += 1
+                continue
+
+            tmp = os.path.join(os.path.dirname(dst), f".modix-{os.path.basename(dst)}.tmp")
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+            files[rel] = _materialise(src, st, tmp, rel)
+            os.replace(tmp, dst)
+            stats["relinked"] += 1
+
+        for rel in [rel for rel in files if rel not in seen]:
+            dst = os.path.join(target, rel)
+            try:
+                local = os.lstat(dst)
+            except FileNotFoundError:
+                local = None
+            entry = files.pop(rel)
+            if local is not None and _untouched(entry, dst, local):
+                os.remove(dst)
+                stats["removed"] += 1
+            # a changed file stays, and from now on belongs to the instance
+
+    _write_manifest(target, manifest)
+    return {"name": name, **stats, "elapsedMs": int((time.monotonic() - started) * 1000)}
+
+
+def list_instances() -> list[dict]:
+    if not os.path.isdir(INSTANCES_DIR):
+        return []
+    found = []
+    for name in sorted(os.listdir(INSTANCES_DIR)):
+        target = os.path.join(INSTANCES_DIR, name)
+        if name.startswith(".") or not os.path.isdir(target):
+            continue
+        try:
+            manifest = _read_manifest(target)
+        except InstanceError:
+            continue
+        found.append({
+            "name": name,
+            "path": target,
+            "appid": manifest["appid"],
+            "branch": manifest["branch"],
+            "created": manifest["created"],
+            "sharedFiles": len(manifest["files"]),
+        })
+    return found
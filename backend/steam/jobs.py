@@ -0,0 +1,456 @@
+"""
+Install jobs shared by the SteamCMD installers: status, a bounded log tail
+and the WebSocket clients following the job. SteamCMD runs through
+asyncio subprocesses, so a long install never blocks the event loop.
+
+Job state is persisted in SQLite and each job's full log is appended to a
+gzip file, so history survives restarts while memory only holds the tail.
+Both are written by one store thread, in batches, never on the event loop.
+"""
+import os
+import gzip
+import json
+import time
+import uuid
+import signal
+import asyncio
+import sqlite3
+import logging
+import threading
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.steam.progress import InstallProgress
+
+logger = logging.getLogger("uvicorn.error")
+
+JOBS_DB = os.path.expanduser("~/.modix/install_jobs.db")
+LOG_DIR = os.path.expanduser("~/.modix/install_logs")
+LOG_TAIL = 1000            # lines kept per job; clients attaching late get these first
+LINE_LIMIT = 1024 * 1024   # SteamCMD can print very long lines on errors
+FLUSH_INTERVAL = 1.0       # seconds a log line may wait before it is written out
+STATS_INTERVAL = 5.0       # seconds between progress pushes while SteamCMD is silent
+KEEP_FINISHED = 20         # finished jobs kept in memory; older ones are read from the store
+RETENTION_DAYS = 30
+SHUTDOWN_GRACE = 10.0      # seconds SteamCMD gets to exit on shutdown before it is killed
+
+COLUMNS = ("id", "kind", "game", "appid", "status", "priority", "progress", "items",
+           "returncode", "created", "finished", "lines")
+
+jobs = {}  # job_id -> InstallJob (running and recently finished)
+_finished = deque()
+_processes = set()  # every SteamCMD process started by spawn()
+
+
+class InstallJob:
+    def __init__(self, kind: str, game: str | None = None, appid: str | None = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.game = game
+        self.appid = appid
+        self.status = "starting"
+        self.priority = "normal"
+        self.progress = 0
+        self.items = None          # workshop jobs: workshop_id -> item state
+        self.returncode = None
+        self.created = time.time()
+        self.finished = None
+        self.logs = deque(maxlen=LOG_TAIL)
+        self.lines = 0             # lines logged so far, including those dropped from the tail
+        self.clients = {}          # websocket -> "json" | "text"
+        self.tracker = InstallProgress()
+        self.process = None        # running SteamCMD, for the scheduler's throttling
+        self._pending = []         # log lines not yet handed to the store
+        self._flush_timer = None
+
+    def to_dict(self) -> dict:
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "game": self.game,
+            "appid": self.appid,
+            "status": self.status,
+            "priority": self.priority,
+            "progress": self.progress,
+            "returncode": self.returncode,
+            "created": self.created,
+            "finished": self.finished,
+            "lines": self.lines,
+            "logs": list(self.logs),
+        }
+        if self.items is not None:
+            data["items"] = self.items
+        if self.tracker.stages:
+            data["stats"] = self.tracker.snapshot()
+        return data
+
+    # ---------- clients ----------
+    async def attach(self, websocket, mode: str = "json"):
+        """Replay the log tail to `websocket`, then keep it updated."""
+        sent = self.lines - len(self.logs)
+        # lines logged while a replay is being sent are replayed in the next pass;
+        # the client is registered once a pass finds nothing new (no await in between)
+        while self.lines > sent:
+            backlog = list(self.logs)[-(self.lines - sent):]
+            sent = self.lines
+            for text in backlog:
+                if mode == "text":
+                    await websocket.send_text(text)
+                else:
+                    await websocket.send_json({"job": self.id, "log": text, "progress": self.progress})
+        self.clients[websocket] = mode
+        if self.finished is not None and mode == "json":
+            await websocket.send_json({"job": self.id, "status": self.status, "progress": self.progress})
+
+    def detach(self, websocket):
+        self.clients.pop(websocket, None)
+
+    async def broadcast(self, message: dict):
+        dead = []
+        for ws, mode in list(self.clients.items()):
+            try:
+                if mode == "json":
+                    await ws.send_json(message)
+                elif "log" in message:
+                    await ws.send_text(message["log"])
+            except Exception:
+                dead.append(ws)
+
+        for d in dead:
+            self.clients.pop(d, None)
+
+    @classmethod
+    def from_row(cls, row: dict) -> "InstallJob":
+        job = cls(row["kind"], game=row["game"], appid=row["appid"])
+        job.id = row["id"]
+        for key in COLUMNS[4:]:
+            setattr(job, key, row[key])
+        return job
+
+    # ---------- updates ----------
+    async def log(self, text: str, **extra):
+        self.logs.append(text)
+        self.lines += 1
+        self._pending.append(text)
+        if self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(FLUSH_INTERVAL, self._flush)
+        await self.broadcast({"job": self.id, "log": text, "progress": self.progress, **extra})
+
+    def set_status(self, status: str):
+        self.status = status
+        job_store.save(self)
+
+    async def finish(self, status: str):
+        self.status = status
+        self.finished = time.time()
+        self.tracker.finish(self.finished)
+        if status == "done":
+            self.progress = 100
+        self._flush(close=True)
+        _retire(self)
+        await self.broadcast({"job": self.id, "status": status, "progress": self.progress})
+
+    def _flush(self, close: bool = False):
+        """Hand pending log lines to the store, with the row (and its line count)."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        lines, self._pending = self._pending, []
+        job_store.append(self, lines, close)
+
+
+class JobStore:
+    """
+    SQLite table of install jobs plus one gzip log per job. Logs are
+    appended while a job runs and read back a page at a time.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB, log_dir: str = LOG_DIR):
+        self.db_path = db_path
+        self.log_dir = log_dir
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._logs = {}     # job_id -> open gzip log (store thread only)
+        # one thread does every write, so they land in the order they were made
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT, game TEXT, appid TEXT, status TEXT, "
+                "priority TEXT, progress INTEGER, items TEXT, returncode INTEGER, "
+                "created REAL, finished REAL, lines INTEGER)"
+            )
+            columns = {name for _cid, name, *_rest in conn.execute("PRAGMA table_info(jobs)")}
+            if "priority" not in columns:
+                # stores from before install priorities: older jobs ran as "normal"
+                conn.execute("ALTER TABLE jobs ADD COLUMN priority TEXT NOT NULL DEFAULT 'normal'")
+                conn.commit()
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created)")
+            self._local.conn = conn
+        return conn
+
+    def log_path(self, job_id: str) -> str:
+        return os.path.join(self.log_dir, f"{job_id}.log.gz")
+
+    def save(self, job: InstallJob):
+        """Queue a write of the job's row, as it is now."""
+        self._submit(self._write_row, self._values(job))
+
+    def append(self, job: InstallJob, lines: list[str], close: bool = False):
+        """Queue log lines for the job's gzip file plus its row, which carries the line count."""
+        self._submit(self._write_batch, job.id, lines, close, self._values(job))
+
+    def _submit(self, fn, *args):
+        future = self._writer.submit(fn, *args)
+        future.add_done_callback(_report_failure)
+
+    def _values(self, job: InstallJob) -> tuple:
+        return (
+            job.id, job.kind, job.game, job.appid, job.status, job.priority, job.progress,
+            json.dumps(job.items) if job.items is not None else None,
+            job.returncode, job.created, job.finished, job.lines,
+        )
+
+    def _write_row(self, values: tuple):
+        with self.lock:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                values,
+            )
+            conn.commit()
+
+    def _write_batch(self, job_id: str, lines: list[str], close: bool, values: tuple):
+        log = self._logs.get(job_id)
+        if lines and log is None:
+            log = self._logs[job_id] = self.open_log(job_id)
+        if lines:
+            log.write("".join(text + "\n" for text in lines))
+            # a sync flush makes everything so far readable by read_log
+            log.flush()
+        if close and log is not None:
+            log.close()
+            del self._logs[job_id]
+        self._write_row(values)
+
+    def load(self, job_id: str) -> dict | None:
+        row = self._conn().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        return self._row(row) if row else None
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        return [
+            self._row(row) for row in self._conn().execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs ORDER BY created DESC LIMIT ?",
+                (limit,),
+            )
+        ]
+
+    def _row(self, row) -> dict:
+        data = dict(zip(COLUMNS, row))
+        data["items"] = json.loads(data["items"]) if data["items"] else None
+        return data
+
+    def open_log(self, job_id: str):
+        os.makedirs(self.log_dir, exist_ok=True)
+        # append mode adds a gzip member, which readers handle transparently
+        return gzip.open(self.log_path(job_id), "at", encoding="utf-8")
+
+    def read_log(self, job_id: str, offset: int = 0, limit: int = 500) -> list[str]:
+        """Lines offset..offset+limit of a job's full log (negative offset counts from the end)."""
+        lines = self._iter_log(self.log_path(job_id))
+        if offset < 0:
+            return list(deque(lines, maxlen=-offset))[:limit]
+        return list(islice(lines, offset, offset + limit))
+
+    def _iter_log(self, path: str):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    yield line.rstrip("\n")
+        except (OSError, EOFError):
+            # missing log, or one cut short by a crash: keep what was read
+            return
+
+    def recover(self):
+        """Jobs left running by a previous process can never finish: mark them."""
+        with self.lock:
+            conn = self._conn()
+            conn.execute(
+                "UPDATE jobs SET status = 'interrupted', finished = ? "
+                "WHERE status IN ('starting', 'queued', 'running')",
+                (time.time(),),
+            )
+            conn.commit()
+
+    def prune(self, max_age_days: int = RETENTION_DAYS):
+        cutoff = time.time() - max_age_days * 86400
+        with self.lock:
+            conn = self._conn()
+            old = [job_id for (job_id,) in conn.execute(
+                "SELECT id FROM jobs WHERE created < ? AND finished IS NOT NULL", (cutoff,)
+            )]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(j,) for j in old])
+            conn.commit()
+        for job_id in old:
+            try:
+                os.remove(self.log_path(job_id))
+            except OSError:
+                pass
+
+
+def _report_failure(future):
+    if future.exception() is not None:
+        logger.warning(f"[Jobs] Failed to persist install job: {future.exception()}")
+
+
+def create_job(kind: str, **fields) -> InstallJob:
+    job = InstallJob(kind, **fields)
+    jobs[job.id] = job
+    job_store.save(job)
+    return job
+
+
+def get_job(job_id: str, with_log: bool = True) -> InstallJob | None:
+    """A live job, or a past one rebuilt from the store (with its log tail unless `with_log` is off)."""
+    job = jobs.get(job_id)
+    if job is not None:
+        return job
+    row = job_store.load(job_id)
+    if row is None:
+        return None
+    job = InstallJob.from_row(row)
+    if with_log:
+        job.logs.extend(job_store.read_log(job_id, -LOG_TAIL, LOG_TAIL))
+    return job
+
+
+async def find_job(job_id: str, with_log: bool = True) -> InstallJob | None:
+    """get_job from the event loop: only a stored job costs a trip to a worker thread."""
+    job = jobs.get(job_id)
+    if job is not None:
+        return job
+    return await asyncio.to_thread(get_job, job_id, with_log)
+
+
+def _retire(job: InstallJob):
+    _finished.append(job.id)
+    while len(_finished) > KEEP_FINISHED:
+        old = jobs.get(_finished[0])
+        if old is not None and old.clients:
+            break
+        jobs.pop(_finished.popleft(), None)
+
+
+async def spawn(cmd: list[str]) -> asyncio.subprocess.Process:
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        limit=LINE_LIMIT,
+        # own process group, so the wrapper script and SteamCMD pause together
+        start_new_session=True,
+    )
+    _processes.difference_update([p for p in _processes if p.returncode is not None])
+    _processes.add(process)
+    return process
+
+
+async def kill(process: asyncio.subprocess.Process):
+    """Kill SteamCMD and its wrapper script (one process group) and reap them."""
+    if process.returncode is None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+async def terminate_all(grace: float = SHUTDOWN_GRACE):
+    """
+    Stop every SteamCMD still running (on shutdown): resume paused groups,
+    ask them to exit, and kill whatever is left after `grace` seconds.
+    """
+    running = [p for p in _processes if p.returncode is None]
+    for process in running:
+        for sig in (signal.SIGCONT, signal.SIGTERM):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                break
+    if running:
+        await asyncio.wait([asyncio.create_task(p.wait()) for p in running], timeout=grace)
+        for process in running:
+            if process.returncode is None:
+                await kill(process)
+    _processes.clear()
+
+
+async def read_lines(process: asyncio.subprocess.Process):
+    """Decoded output lines of `process`, without trailing whitespace."""
+    while True:
+        line = await process.stdout.readline()
+        if not line:
+            break
+        yield line.decode(errors="ignore").rstrip()
+
+
+async def run_logged(job: InstallJob, cmd: list[str]):
+    """
+    Run `cmd` for `job`, logging every line and finishing the job by exit
+    code. Progress lines update the job's tracker; its stats ride along with
+    the line that changed them, and are pushed every STATS_INTERVAL seconds
+    while SteamCMD prints nothing (so clients can see a stall).
+    """
+    try:
+        process = await spawn(cmd)
+    except OSError as e:
+        await job.log(f"Failed to start SteamCMD: {e}")
+        await job.finish("failed")
+        return
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            if job.tracker.stages:
+                await job.broadcast({"job": job.id, "progress": job.progress, "stats": job.tracker.snapshot()})
+
+    job.process = process
+    ticker = asyncio.create_task(heartbeat())
+    status = "failed"
+    try:
+        job.set_status("running")
+        async for text in read_lines(process):
+            if job.tracker.feed(text):
+                job.progress = int(job.tracker.percent)
+                await job.log(text, stats=job.tracker.snapshot())
+            else:
+                await job.log(text)
+        job.returncode = await process.wait()
+        status = "done" if job.returncode == 0 else "failed"
+    except Exception as e:
+        # e.g. readline's ValueError for a line over LINE_LIMIT: the job
+        # still has to end, and SteamCMD must not be left running unread
+        await kill(process)
+        job.returncode = process.returncode
+        await job.log(f"Install aborted: {e}")
+    finally:
+        ticker.cancel()
+        job.process = None
+    await job.finish(status)
+
+
+# shared store; jobs a previous process left running are closed out on import
+job_store = JobStore()
+job_store.recover()
+job_store.prune()
@@ -0,0 +1,135 @@
+"""
+Progress model for SteamCMD output.
+
+app_update prints lines such as
+
+    Update state (0x61) downloading, progress: 45.23 (1234567890 / 2729664000)
+    Update state (0x81) verifying update, progress: 3.24 (88309760 / 2729664000)
+    Update state (0x101) committing, progress: 99.00 (2702367360 / 2729664000)
+
+InstallProgress turns them into a stage timeline, a smoothed byte rate and
+an ETA, and tells a stalled download (no bytes for STALL_AFTER seconds)
+from a merely slow one.
+"""
+import re
+import math
+import time
+
+UPDATE_STATE = re.compile(
+    r"Update state \(0x([0-9a-fA-F]+)\) ([A-Za-z ]+?), progress: ([\d.]+) \((\d+) / (\d+)\)"
+)
+STEP_COUNT = re.compile(r"\((\d+)\s*of\s*(\d+)\)")
+
+RATE_TIME_CONSTANT = 10.0   # seconds; older samples fade by 1/e per constant
+STALL_AFTER = 60.0
+
+# SteamCMD's wording -> stage reported to clients
+STAGES = {
+    "downloading": "downloading",
+    "preallocating": "preallocating",
+    "verifying": "verifying",
+    "validating": "verifying",
+    "committing": "committing",
+    "staging": "committing",
+}
+
+
+class InstallProgress:
+    def __init__(self):
+        self.stage = None
+        self.stages = []             # [{"stage", "started", "ended"}]
+        self.percent = 0.0
+        self.done_bytes = 0
+        self.total_bytes = 0
+        self.rate = None             # bytes/s, exponentially weighted
+        self._sample = None          # (time, bytes) of the last counter seen
+        self._advanced = None        # when the counter last moved
+
+    # ---------- input ----------
+    def feed(self, line: str, now: float | None = None) -> bool:
+        """Update from one output line; True when anything changed."""
+        now = time.time() if now is None else now
+
+        match = UPDATE_STATE.search(line)
+        if match:
+            word = match.group(2).split()[0].lower()
+            self._enter(STAGES.get(word, word), now)
+            self.percent = float(match.group(3))
+            self._count(int(match.group(4)), int(match.group(5)), now)
+            return True
+
+        if "fully installed" in line or line.startswith("Success"):
+            self._enter("done", now)
+            self.percent = 100.0
+            return True
+
+        match = STEP_COUNT.search(line)
+        if match and int(match.group(2)):
+            self.percent = int(match.group(1)) / int(match.group(2)) * 100
+            return True
+        return False
+
+    def finish(self, now: float | None = None):
+        now = time.time() if now is None else now
+        if self.stages and self.stages[-1]["ended"] is None:
+            self.stages[-1]["ended"] = now
+
+    def _enter(self, stage: str, now: float):
+        if stage == self.stage:
+            return
+        self.finish(now)
+        self.stage = stage
+        self.stages.append({"stage": stage, "started": now, "ended": None})
+        # each stage moves at its own speed (network vs disk): start the rate over
+        self.rate = None
+        self._sample = None
+        self._advanced = now
+
+    def _count(self, done: int, total: int, now: float):
+        self.done_bytes, self.total_bytes = done, total
+        if self._sample is None:
+            self._sample = (now, done)
+            return
+        last_time, last_done = self._sample
+        dt = now - last_time
+        if done == last_done or dt <= 0:
+            return
+        instant = max(done - last_done, 0) / dt
+        if self.rate is None:
+            self.rate = instant
+        else:
+            # time-aware EWMA: irregular output spacing weighs samples correctly
+            alpha = 1 - math.exp(-dt / RATE_TIME_CONSTANT)
+            self.rate += alpha * (instant - self.rate)
+        self._sample = (now, done)
+        self._advanced = now
+
+    # ---------- output ----------
+    def eta(self) -> float | None:
+        if not self.rate or not self.total_bytes:
+            return None
+        return max(self.total_bytes - self.done_bytes, 0) / self.rate
+
+    def snapshot(self, now: float | None = None) -> dict:
+        now = time.time() if now is None else now
+        idle = now - self._advanced if self._advanced is not None else 0.0
+        active = self.stage not in (None, "done")
+        eta = self.eta()
+        return {
+            "stage": self.stage,
+            "percent": round(self.percent, 2),
+            "bytesDone": self.done_bytes,
+            "bytesTotal": self.total_bytes,
+            "rate": round(self.rate) if self.rate is not None else None,
+            "eta": round(eta) if eta is not None else None,
+            "idle": round(idle, 1),
+            "stalled": active and idle >= STALL_AFTER,
+            "stages": [
+                {
+                    "stage": s["stage"],
+                    "elapsed": round((s["ended"] or now) - s["started"], 1),
+                    "active": s["ended"] is None,
+                }
+                for s in self.stages
+            ],
+        }
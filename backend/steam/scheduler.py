@@ -0,0 +1,214 @@
+"""
+Install scheduler shared by every SteamCMD job.
+
+At most `concurrency` SteamCMD processes run at once; waiting work starts
+by priority (urgent hotfixes before bulk updates), then in arrival order.
+
+An optional bandwidth budget (bytes/s) is shared by all running downloads.
+SteamCMD has no rate limit of its own, so the budget is enforced by duty
+cycling: each period a process over its share runs for part of the period
+and is paused (SIGSTOP on its process group) for the rest. Shares are
+handed out in priority order, so an urgent install keeps its full speed
+while bulk updates absorb the cut.
+"""
+import os
+import heapq
+import signal
+import asyncio
+import itertools
+
+from backend.steam.jobs import terminate_all
+
+PRIORITIES = {"urgent": 0, "high": 1, "normal": 2, "bulk": 3}
+MAX_CONCURRENT = 2
+THROTTLE_PERIOD = 1.0   # seconds; short, so paused downloads do not time out
+MIN_DUTY = 0.2
+RAW_SMOOTHING = 0.5     # weight of the newest period in the unthrottled rate estimate
+
+
+class Slot:
+    def __init__(self, label: str, start, priority: str, seq: int, job=None):
+        self.label = label
+        self.start = start          # async callable doing the work
+        self.priority = priority
+        self.seq = seq
+        self.job = job              # InstallJob for app installs (throttled), else None
+        self.duty = 1.0
+        self.paused = False
+        self.raw = None             # bytes/s while running, from bytes moved per active second
+        self.counted = None         # byte counter when it last moved
+        self.active = 0.0           # unpaused seconds since then
+
+    def __lt__(self, other):
+        return (PRIORITIES[self.priority], self.seq) < (PRIORITIES[other.priority], other.seq)
+
+    def to_dict(self) -> dict:
+        return {
+            "label": self.label,
+            "job": self.job.id if self.job else None,
+            "priority": self.priority,
+            "duty": round(self.duty, 2),
+        }
+
+
+class InstallScheduler:
+    def __init__(self, concurrency: int = MAX_CONCURRENT):
+        self.concurrency = concurrency
+        self.bandwidth = None       # bytes/s shared by all downloads, None = unlimited
+        self.queue = []             # heap of waiting Slots
+        self.running = []
+        self._seq = itertools.count()
+        self._throttler = None
+        self.closed = False
+
+    # ---------- queueing ----------
+    def submit(self, label: str, start, priority: str = "normal", job=None) -> int:
+        """Queue `start()`; returns the position in the queue (0 = started)."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        slot = Slot(label, start, priority, next(self._seq), job)
+        if job is not None:
+            job.set_status("queued")
+        heapq.heappush(self.queue, slot)
+        self._pump()
+        return self.position(slot)
+
+    def position(self, slot: Slot) -> int:
+        if slot not in self.queue:
+            return 0
+        return sorted(self.queue).index(slot) + 1
+
+    def reprioritize(self, job_id: str, priority: str) -> bool:
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        for slot in self.queue + self.running:
+            if slot.job is not None and slot.job.id == job_id:
+                slot.priority = priority
+                heapq.heapify(self.queue)
+                return True
+        return False
+
+    def configure(self, concurrency: int | None = None, bandwidth: int | None = None):
+        if concurrency is not None:
+            self.concurrency = max(1, concurrency)
+        self.bandwidth = bandwidth or None
+        self._pump()
+
+    def _pump(self):
+        while not self.closed and self.queue and len(self.running) < self.concurrency:
+            slot = heapq.heappop(self.queue)
+            self.running.append(slot)
+            asyncio.create_task(self._run(slot))
+        if self.bandwidth and self.running and (self._throttler is None or self._throttler.done()):
+            self._throttler = asyncio.create_task(self._throttle())
+
+    async def _run(self, slot: Slot):
+        try:
+            await slot.start()
+        finally:
+            self.running.remove(slot)
+            self._pump()
+
+    # ---------- bandwidth ----------
+    def _downloading(self, slot: Slot):
+        tracker = slot.job.tracker if slot.job else None
+        return tracker if tracker and tracker.stage == "downloading" else None
+
+    def _plan(self):
+        """Give each measurable download a duty cycle, highest priority first."""
+        remaining = self.bandwidth
+        for slot in sorted(self.running):
+            tracker = self._downloading(slot)
+            raw = slot.raw or (tracker.rate if tracker else None)
+            if not raw:
+                slot.duty = 1.0
+                continue
+            allowed = max(min(raw, remaining), 0)
+            slot.duty = min(1.0, max(MIN_DUTY, allowed / raw))
+            remaining -= raw * slot.duty
+
+    def _measure(self):
+        """
+        Unthrottled speed of each download: bytes moved per second it was
+        allowed to run. SteamCMD reports progress every few seconds, not every
+        period, so the bytes of one report are spread over all the active time
+        since the counter last moved.
+        """
+        for slot in self.running:
+            tracker = self._downloading(slot)
+            if tracker is None:
+                slot.raw = slot.counted = None
+                slot.active = 0.0
+                continue
+            slot.active += slot.duty * THROTTLE_PERIOD
+            if slot.counted is None or tracker.done_bytes < slot.counted:
+                slot.counted = tracker.done_bytes
+                slot.active = 0.0
+            elif tracker.done_bytes > slot.counted:
+                sample = (tracker.done_bytes - slot.counted) / slot.active
+                slot.raw = sample if slot.raw is None else slot.raw + RAW_SMOOTHING * (sample - slot.raw)
+                slot.counted = tracker.done_bytes
+                slot.active = 0.0
+
+    async def _throttle(self):
+        try:
+            while self.bandwidth and self.running:
+                self._plan()
+                elapsed = 0.0
+                for slot in sorted(self.running, key=lambda s: s.duty):
+                    if slot.duty >= 1.0:
+                        break
+                    await asyncio.sleep(slot.duty * THROTTLE_PERIOD - elapsed)
+                    elapsed = slot.duty * THROTTLE_PERIOD
+                    _signal(slot, signal.SIGSTOP)
+                await asyncio.sleep(THROTTLE_PERIOD - elapsed)
+                self._measure()
+                for slot in list(self.running):
+                    _signal(slot, signal.SIGCONT)
+        finally:
+            for slot in list(self.running):
+                slot.duty = 1.0
+                _signal(slot, signal.SIGCONT)
+
+    async def shutdown(self):
+        """
+        Start nothing new and stop what runs: paused process groups are
+        resumed first, or SIGTERM would wait behind SIGSTOP forever. Queued
+        jobs stay queued and are marked interrupted on the next start.
+        """
+        self.closed = True
+        if self._throttler is not None and not self._throttler.done():
+            self._throttler.cancel()
+            try:
+                await self._throttler
+            except asyncio.CancelledError:
+                pass
+        await terminate_all()
+
+    # ---------- status ----------
+    def status(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "bandwidth": self.bandwidth,
+            "running": [s.to_dict() for s in self.running],
+            "queued": [s.to_dict() for s in sorted(self.queue)],
+        }
+
+
+def _signal(slot: Slot, sig: int):
+    process = getattr(slot.job, "process", None) if slot.job else None
+    if process is None or process.returncode is not None:
+        return
+    paused = sig == signal.SIGSTOP
+    if slot.paused == paused:
+        return
+    try:
+        # steamcmd.sh is a wrapper: the whole group has to stop
+        os.killpg(process.pid, sig)
+        slot.paused = paused
+    except ProcessLookupError:
+        pass
+
+
+# shared instance
+install_scheduler = InstallScheduler()
@@ -0,0 +1,99 @@
+"""
+Local stand-in for the parts of the Steam Web API the panel uses, for
+development and testing without network access or an API key.
+
+    python -m backend.steam.steam_api_stub --port 8765 [--fixture items.json]
+    MODIX_STEAM_API_BASE=http://127.0.0.1:8765 uvicorn backend.api_main:app
+
+Details come from the fixture ({"<id>": {"title": ..., "time_updated": ...}})
+or are generated from the id. Responses carry an ETag and honour
+If-None-Match, and batches above the real per-call limit are rejected.
+"""
+import json
+import zlib
+import hashlib
+import argparse
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DETAILS_PATH = "/ISteamRemoteStorage/GetPublishedFileDetails/v1/"
+MAX_ITEMS = 100
+
+
+def fake_details(workshop_id: str, fixture: dict) -> dict:
+    if workshop_id in fixture:
+        item = fixture[workshop_id]
+        if item is None:
+            return {"publishedfileid": workshop_id, "result": 9}
+        return {"publishedfileid": workshop_id, "result": 1, "consumer_app_id": 108600, **item}
+    seed = zlib.crc32(workshop_id.encode())
+    return {
+        "publishedfileid": workshop_id,
+        "result": 1,
+        "consumer_app_id": 108600,
+        "title": f"Stub Mod {workshop_id}",
+        "file_size": 100_000 + seed % 50_000_000,
+        "time_created": 1_600_000_000 + seed % 10_000_000,
+        "time_updated": 1_700_000_000 + seed % 20_000_000,
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    fixture = {}
+    calls = 0
+
+    def do_POST(self):
+        if self.path.split("?")[0] != DETAILS_PATH:
+            return self._send(404, {"error": "not found"})
+        StubHandler.calls += 1
+
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode())
+        count = int(form.get("itemcount", ["0"])[0])
+        if count < 1 or count > MAX_ITEMS:
+            return self._send(400, {"error": f"itemcount must be 1-{MAX_ITEMS}"})
+
+        ids = [form.get(f"publishedfileids[{n}]", [""])[0] for n in range(count)]
+        details = [fake_details(wid, self.fixture) for wid in ids]
+        body = {"response": {"result": 1, "resultcount": len(details), "publishedfiledetails": details}}
+
+        etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, None, etag)
+        self._send(200, body, etag)
+
+    def _send(self, status: int, body, etag: str | None = None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        print(f"[SteamStub] {self.address_string()} {fmt % args}")
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, fixture: dict | None = None) -> ThreadingHTTPServer:
+    """Create the server (call serve_forever on it, or run it in a thread)."""
+    StubHandler.fixture = {str(k): v for k, v in (fixture or {}).items()}
+    return ThreadingHTTPServer((host, port), StubHandler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Steam Web API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixture", help="JSON file of workshop id -> details")
+    args = parser.parse_args()
+
+    data = {}
+    if args.fixture:
+        with open(args.fixture, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    server = serve(args.host, args.port, data)
+    print(f"[SteamStub] Listening on http://{args.host}:{args.port}")
+    server.serve_forever()
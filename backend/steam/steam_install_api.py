@@ -1,8 +1,9 @@
-import os
-import uuid
+import re
 import asyncio
-import subprocess
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+
+from backend.steam.jobs import InstallJob, create_job, find_job, jobs, job_store, spawn, kill, read_lines, run_logged
+from backend.steam.scheduler import install_scheduler, PRIORITIES
 
 router = APIRouter()
 
@@ -16,110 +17,259 @@ GAMES = {
     "spaceengineers": "244850",
 }
 
-jobs = {}  # job_id -> {"progress": int, "logs": [], "status": str}
-clients = {}  # job_id -> set(websockets)
-
-
-# ---------------- UTIL ----------------
-def create_job(game):
-    job_id = str(uuid.uuid4())
-    jobs[job_id] = {
-        "progress": 0,
-        "logs": [],
-        "status": "starting",
-        "game": game,
-    }
-    clients[job_id] = set()
-    return job_id
-
-
-def parse_progress(line: str):
-    """
-    SteamCMD outputs lines like:
-    Downloading update (12 of 100) ...
-    """
-    import re
-
-    match = re.search(r"\((\d+)\s*of\s*(\d+)\)", line)
-    if match:
-        current = int(match.group(1))
-        total = int(match.group(2))
-        return int((current / total) * 100)
+# workshop downloads: items from all jobs share one queue, drained in
+# batches (one SteamCMD login per batch) by at most MAX_SESSIONS processes
+WORKSHOP_BATCH = 20
+MAX_SESSIONS = 2
+MAX_ATTEMPTS = 3
 
-    if "success" in line.lower():
-        return 100
+ITEM_SUCCESS = re.compile(r"Success\. Downloaded item (\d+)")
+ITEM_FAILURE = re.compile(r"ERROR! Download item (\d+) failed \(([^)]*)\)")
 
-    return None
+workshop_queue = []  # [(job, workshop_id)] waiting for a SteamCMD session
+sessions = {"running": 0}
 
 
-async def run_steamcmd(job_id: str, appid: str):
+async def run_steamcmd(job: InstallJob):
     cmd = [
         STEAMCMD_PATH,
         "+login", "anonymous",
         "+force_install_dir", STEAM_DIR,
-        "+app_update", appid,
+        "+app_update", job.appid,
         "validate",
         "+quit",
     ]
+    await run_logged(job, cmd)
 
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.STDOUT,
-    )
 
-    jobs[job_id]["status"] = "running"
-
-    while True:
-        line = await process.stdout.readline()
-        if not line:
-            break
+# ---------------- INSTALL ----------------
+@router.post("/install/{game}")
+async def install_game(game: str, priority: str = Query("normal")):
+    if game not in GAMES:
+        return {"error": "unknown game"}
+    if priority not in PRIORITIES:
+        return {"error": f"priority must be one of {', '.join(PRIORITIES)}"}
+
+    job = create_job("app", game=game, appid=GAMES[game])
+    job.priority = priority
+    position = install_scheduler.submit(f"app {job.appid}", lambda: run_steamcmd(job), priority, job)
+
+    return {"job_id": job.id, "appid": job.appid, "queued": position}
+
+
+# ---------------- WORKSHOP QUEUE ----------------
+def schedule_workshop():
+    """Start SteamCMD sessions while there is queued work and a free slot."""
+    while workshop_queue and sessions["running"] < MAX_SESSIONS:
+        # one session serves one app; take the oldest app's items first
+        appid = workshop_queue[0][0].appid
+        batch = [entry for entry in workshop_queue if entry[0].appid == appid][:WORKSHOP_BATCH]
+        for entry in batch:
+            workshop_queue.remove(entry)
+        sessions["running"] += 1
+        # the batch waits for a slot like any install, at its most urgent job's priority
+        priority = min((job.priority for job, _ in batch), key=PRIORITIES.get)
+        install_scheduler.submit(
+            f"workshop {appid} x{len(batch)}",
+            lambda batch=batch, appid=appid: run_workshop_batch(appid, batch),
+            priority,
+        )
+
+
+async def set_item(job: InstallJob, workshop_id: str, status: str, log: str, error: str | None = None):
+    item = job.items[workshop_id]
+    item["status"] = status
+    item["error"] = error
+    finished = sum(1 for i in job.items.values() if i["status"] in ("done", "failed"))
+    job.progress = int(finished / len(job.items) * 100)
+    await job.log(log, item={"id": workshop_id, **item})
+    if finished == len(job.items):
+        failed = any(i["status"] == "failed" for i in job.items.values())
+        await job.finish("failed" if failed else "done")
+    else:
+        job.set_status("running")
+
+
+async def run_workshop_batch(appid: str, batch: list):
+    """
+    Download a batch of workshop items in one SteamCMD session. Items the
+    session did not report as downloaded go back on the queue until they
+    run out of attempts.
+    """
+    owners = {}
+    for job, workshop_id in batch:
+        owners.setdefault(workshop_id, []).append(job)
+        job.items[workshop_id]["attempts"] += 1
+    batch_jobs = list({job.id: job for job, _ in batch}.values())
+
+    # no +force_install_dir: items land in SteamCMD's own library, which
+    # steam_libraries already scans for workshop content
+    cmd = [STEAMCMD_PATH, "+login", "anonymous"]
+    for workshop_id in owners:
+        cmd += ["+workshop_download_item", appid, workshop_id]
+    cmd.append("+quit")
+
+    outcome = {}  # workshop_id -> error (None when downloaded)
+    process = None
+    try:
+        for workshop_id, item_jobs in owners.items():
+            for job in item_jobs:
+                await set_item(job, workshop_id, "downloading", f"Downloading item {workshop_id}")
+
+        process = await spawn(cmd)
+        async for text in read_lines(process):
+            matched = ITEM_SUCCESS.search(text) or ITEM_FAILURE.search(text)
+            if not matched or matched.group(1) not in owners:
+                for job in batch_jobs:
+                    await job.log(text)
+                continue
+
+            workshop_id = matched.group(1)
+            error = matched.group(2) if matched.re is ITEM_FAILURE else None
+            outcome[workshop_id] = error
+            for job in owners[workshop_id]:
+                if error is None:
+                    await set_item(job, workshop_id, "done", text)
+                elif job.items[workshop_id]["attempts"] >= MAX_ATTEMPTS:
+                    await set_item(job, workshop_id, "failed", text, error)
+                else:
+                    await job.log(f"{text} (will retry)")
+
+        await process.wait()
+    except Exception as e:
+        # failed to start, or output that could not be read (a line over LINE_LIMIT)
+        if process is not None:
+            await kill(process)
+        error = str(e)
+        outcome.update({workshop_id: error for workshop_id in owners if workshop_id not in outcome})
 
-        text = line.decode(errors="ignore").strip()
+    try:
+        for job, workshop_id in batch:
+            error = outcome.get(workshop_id, "no result from SteamCMD")
+            if workshop_id in outcome and error is None:
+                continue
+            item = job.items[workshop_id]
+            if item["attempts"] < MAX_ATTEMPTS:
+                item["status"] = "queued"
+                workshop_queue.append((job, workshop_id))
+            elif item["status"] != "failed":
+                await set_item(job, workshop_id, "failed", f"Item {workshop_id} failed: {error}", error)
+    finally:
+        sessions["running"] -= 1
+        schedule_workshop()
+
+
+@router.post("/workshop/{game}")
+async def download_workshop_items(game: str, payload: dict):
+    """
+    Queue workshop items for download, e.g. {"items": ["2169435993", ...]}.
+    Progress is pushed per item over /ws/{job_id}.
+    """
+    if game not in GAMES:
+        return {"error": "unknown game"}
 
-        jobs[job_id]["logs"].append(text)
+    items = [str(i).strip() for i in payload.get("items", [])]
+    items = list(dict.fromkeys(i for i in items if i))
+    if not items or not all(i.isdigit() for i in items):
+        return {"error": "items must be a non-empty list of workshop ids"}
 
-        progress = parse_progress(text)
-        if progress is not None:
-            jobs[job_id]["progress"] = progress
+    priority = payload.get("priority") or "normal"
+    if priority not in PRIORITIES:
+        return {"error": f"priority must be one of {', '.join(PRIORITIES)}"}
 
-        # push to websocket clients
-        dead = set()
-        for ws in clients[job_id]:
-            try:
-                await ws.send_json({
-                    "job": job_id,
-                    "log": text,
-                    "progress": jobs[job_id]["progress"],
-                })
-            except:
-                dead.add(ws)
+    job = create_job("workshop", game=game, appid=GAMES[game])
+    job.priority = priority
+    job.items = {i: {"status": "queued", "attempts": 0, "error": None} for i in items}
+    job.set_status("queued")
+    workshop_queue.extend((job, i) for i in items)
+    schedule_workshop()
 
-        for d in dead:
-            clients[job_id].discard(d)
+    return {"job_id": job.id, "appid": job.appid, "items": len(items)}
 
-    jobs[job_id]["progress"] = 100
-    jobs[job_id]["status"] = "done"
 
+@router.get("/workshop/queue")
+async def workshop_queue_status():
+    return {
+        "running": sessions["running"],
+        "maxSessions": MAX_SESSIONS,
+        "queued": len(workshop_queue),
+        "batchSize": WORKSHOP_BATCH,
+    }
 
-# ---------------- INSTALL ----------------
-@router.post("/install/{game}")
-async def install_game(game: str):
-    if game not in GAMES:
-        return {"error": "unknown game"}
 
-    job_id = create_job(game)
-    appid = GAMES[game]
+# ---------------- SCHEDULER ----------------
+@router.get("/scheduler")
+async def scheduler_status():
+    return install_scheduler.status()
 
-    asyncio.create_task(run_steamcmd(job_id, appid))
 
-    return {"job_id": job_id, "appid": appid}
+@router.post("/scheduler")
+async def configure_scheduler(payload: dict):
+    """
+    {"concurrency": 2, "bandwidth": 20000000} - bandwidth is a byte/s budget
+    shared by all SteamCMD downloads; null or 0 removes it.
+    """
+    concurrency = payload.get("concurrency")
+    bandwidth = payload.get("bandwidth")
+    if concurrency is not None and (not isinstance(concurrency, int) or concurrency < 1):
+        return {"error": "concurrency must be a positive integer"}
+    if bandwidth is not None and (not isinstance(bandwidth, int) or bandwidth < 0):
+        return {"error": "bandwidth must be bytes per second"}
+    install_scheduler.configure(concurrency, bandwidth)
+    return install_scheduler.status()
+
+
+@router.post("/scheduler/{job_id}/priority")
+async def set_job_priority(job_id: str, payload: dict):
+    priority = payload.get("priority")
+    if priority not in PRIORITIES:
+        return {"error": f"priority must be one of {', '.join(PRIORITIES)}"}
+    job = await find_job(job_id, with_log=False)
+    if not job or job.finished is not None:
+        return {"error": "not found"}
+    # workshop items pick the new priority up when they are next batched
+    install_scheduler.reprioritize(job_id, priority)
+    job.priority = priority
+    return install_scheduler.status()
 
 
 # ---------------- STATUS ----------------
 @router.get("/status/{job_id}")
 async def status(job_id: str):
-    return jobs.get(job_id, {"error": "not found"})
+    job = await find_job(job_id)
+    return job.to_dict() if job else {"error": "not found"}
+
+
+@router.get("/progress")
+async def active_progress():
+    """Live stats (stage, rate, ETA, stall) of every install still running."""
+    return {
+        "jobs": [
+            {"id": job.id, "appid": job.appid, "status": job.status,
+             "progress": job.progress, "stats": job.tracker.snapshot()}
+            for job in jobs.values() if job.finished is None
+        ]
+    }
+
+
+@router.get("/jobs")
+async def list_jobs(limit: int = Query(50, ge=1, le=500)):
+    """Most recent install jobs, including those from before a restart."""
+    return {"jobs": job_store.recent(limit)}
+
+
+@router.get("/logs/{job_id}")
+async def job_logs(
+    job_id: str,
+    offset: int = Query(0, description="First line; negative counts from the end"),
+    limit: int = Query(500, ge=1, le=5000),
+):
+    """A page of a job's full log, read from its compressed log file."""
+    job = await find_job(job_id, with_log=False)
+    if not job:
+        return {"error": "not found"}
+    lines = await asyncio.to_thread(job_store.read_log, job_id, offset, limit)
+    return {"job": job_id, "offset": offset, "lines": lines, "total": job.lines}
 
 
 # ---------------- WEBSOCKET ----------------
@@ -127,13 +277,16 @@ async def status(job_id: str):
 async def ws_logs(websocket: WebSocket, job_id: str):
     await websocket.accept()
 
-    if job_id not in clients:
-        clients[job_id] = set()
+    job = await find_job(job_id)
+    if not job:
+        await websocket.send_json({"job": job_id, "error": "not found"})
+        await websocket.close()
+        return
 
-    clients[job_id].add(websocket)
+    await job.attach(websocket)
 
     try:
         while True:
-            await asyncio.sleep(30)
+            await websocket.receive_text()
     except WebSocketDisconnect:
-        clients[job_id].discard(websocket)
\ No newline at end of file
+        job.detach(websocket)
@@ -0,0 +1,96 @@
+import os
+import time
+import asyncio
+import logging
+import httpx
+
+from backend.services.mod_catalog import mod_catalog
+
+logger = logging.getLogger("uvicorn.error")
+
+# point this at backend/steam/steam_api_stub.py to work without Steam
+STEAM_API_BASE = os.getenv("MODIX_STEAM_API_BASE", "https://api.steampowered.com").rstrip("/")
+DETAILS_PATH = "/ISteamRemoteStorage/GetPublishedFileDetails/v1/"
+
+BATCH_SIZE = 100          # ids per GetPublishedFileDetails call
+DETAILS_TTL = 15 * 60     # seconds before an item is asked about again
+MAX_CONNECTIONS = 4
+REQUEST_TIMEOUT = 20.0
+
+_client = None
+_etags = {}               # "id,id,..." -> ETag of the last response for that batch
+_sync_lock = asyncio.Lock()
+
+
+def get_client() -> httpx.AsyncClient:
+    """One pooled client for all Steam Web API calls (keep-alive, capped sockets)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=STEAM_API_BASE,
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_details(workshop_ids: list[str]) -> list[dict] | None:
+    """
+    One GetPublishedFileDetails call for up to BATCH_SIZE ids.
+    Returns None when the server answered 304 for the same batch.
+    """
+    key = ",".join(workshop_ids)
+    form = {"itemcount": str(len(workshop_ids))}
+    for n, wid in enumerate(workshop_ids):
+        form[f"publishedfileids[{n}]"] = wid
+    headers = {"If-None-Match": _etags[key]} if key in _etags else {}
+
+    r = await get_client().post(DETAILS_PATH, data=form, headers=headers)
+    if r.status_code == 304:
+        return None
+    r.raise_for_status()
+    if r.headers.get("ETag"):
+        _etags[key] = r.headers["ETag"]
+    return r.json().get("response", {}).get("publishedfiledetails", [])
+
+
+async def sync_details(workshop_ids: list[str], force: bool = False) -> dict:
+    """
+    Refresh Steam details for the given items in batches, skipping ones
+    checked within DETAILS_TTL unless `force`. Results go to the mod catalog.
+    """
+    async with _sync_lock:
+        ids = sorted(set(workshop_ids))
+        stale = ids if force else await asyncio.to_thread(mod_catalog.stale_details, ids, DETAILS_TTL)
+        batches = [stale[i:i + BATCH_SIZE] for i in range(0, len(stale), BATCH_SIZE)]
+        results = await asyncio.gather(*(fetch_details(b) for b in batches), return_exceptions=True)
+
+        updated = unchanged = 0
+        errors = []
+        checked = time.time()
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                errors.append(str(result))
+                logger.warning(f"[Workshop] Details request failed: {result}")
+            elif result is None:
+                await asyncio.to_thread(mod_catalog.touch_details, batch, checked)
+                unchanged += len(batch)
+            else:
+                await asyncio.to_thread(mod_catalog.store_details, result, checked)
+                updated += len(result)
+
+        return {
+            "items": len(ids),
+            "requested": len(stale),
+            "requests": len(batches),
+            "updated": updated,
+            "unchanged": unchanged,
+            "errors": errors,
+        }
@@ -1,69 +1,93 @@
-import subprocess
 import asyncio
-import uuid
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
-router = APIRouter()
+from backend.steam.jobs import InstallJob, create_job, find_job, run_logged
+from backend.steam import instances
+from backend.steam.instances import InstanceError
+from backend.steam.scheduler import install_scheduler, PRIORITIES
 
-# active installs
-INSTALLS = {}
+router = APIRouter()
 
 STEAMCMD_PATH = "/home/steamcmd/steamcmd.sh"
-BASE_INSTALL_DIR = "/home/game_servers"
-
-
-class InstallSession:
-    def __init__(self, app_id: str):
-        self.id = str(uuid.uuid4())
-        self.app_id = app_id
-        self.proc = None
-        self.clients = set()
+BASE_WAIT_INTERVAL = 1.0
 
 
-async def run_steamcmd(session: InstallSession):
+async def run_steamcmd(job: InstallJob, branch: str = "public"):
+    # one shared base per app and branch; server instances link to it
+    base = instances.base_path(job.appid, branch)
     cmd = [
         STEAMCMD_PATH,
         "+login", "anonymous",
-        "+force_install_dir", f"{BASE_INSTALL_DIR}/{session.app_id}",
-        "+app_update", session.app_id,
-        "validate",
-        "+quit"
+        "+force_install_dir", base,
+        "+app_update", job.appid,
     ]
+    if branch != "public":
+        cmd += ["-beta", branch]
+    cmd += ["validate", "+quit"]
+
+    # instances being created from or refreshed against the base finish first
+    if not instances.claim_base(base):
+        await job.log(f"Waiting for {base} to be free (instance copy or another install in progress)")
+        while not instances.claim_base(base):
+            await asyncio.sleep(BASE_WAIT_INTERVAL)
+    try:
+        await run_logged(job, cmd)
+    finally:
+        instances.release_base(base)
 
-    session.proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1
-    )
-
-    for line in iter(session.proc.stdout.readline, ""):
-        dead = []
 
-        for ws in list(session.clients):
-            try:
-                await ws.send_text(line.strip())
-            except:
-                dead.append(ws)
+# ---------------- START INSTALL ----------------
+@router.post("/install")
+async def install_game(payload: dict):
+    app_id = str(payload.get("appId") or "")
+    branch = str(payload.get("branch") or "public")
+    try:
+        instances.base_path(app_id, branch)
+    except InstanceError as e:
+        return {"error": str(e)}
 
-        for d in dead:
-            session.clients.discard(d)
+    priority = payload.get("priority") or "normal"
+    if priority not in PRIORITIES:
+        return {"error": f"priority must be one of {', '.join(PRIORITIES)}"}
 
-    session.proc.wait()
+    job = create_job("app", appid=app_id)
+    job.priority = priority
+    position = install_scheduler.submit(f"app {app_id}", lambda: run_steamcmd(job, branch), priority, job)
 
+    return {"installId": job.id, "queued": position}
 
-# ---------------- START INSTALL ----------------
-@router.post("/install")
-async def install_game(payload: dict):
-    app_id = payload.get("appId")
 
-    session = InstallSession(app_id)
-    INSTALLS[session.id] = session
+# ---------------- SERVER INSTANCES ----------------
+@router.get("/instances")
+async def list_instances():
+    return {"instances": await asyncio.to_thread(instances.list_instances)}
 
-    asyncio.create_task(run_steamcmd(session))
 
-    return {"installId": session.id}
+@router.post("/instances")
+async def create_instance(payload: dict):
+    """
+    New server instance from an installed base, e.g.
+    {"name": "pz-2", "appId": "380870", "branch": "public"}.
+    Files are reflinked or hardlinked, so no download and almost no disk.
+    """
+    try:
+        return await asyncio.to_thread(
+            instances.create_instance,
+            str(payload.get("name") or ""),
+            str(payload.get("appId") or ""),
+            str(payload.get("branch") or "public"),
+        )
+    except InstanceError as e:
+        return {"error": str(e)}
+
+
+@router.post("/instances/{name}/refresh")
+async def refresh_instance(name: str):
+    """Relink an instance to its base after the base was updated."""
+    try:
+        return await asyncio.to_thread(instances.refresh_instance, name)
+    except InstanceError as e:
+        return {"error": str(e)}
 
 
 # ---------------- WEBSOCKET LOG STREAM ----------------
@@ -71,16 +95,17 @@ async def install_game(payload: dict):
 async def install_ws(websocket: WebSocket, install_id: str):
     await websocket.accept()
 
-    session = INSTALLS.get(install_id)
-    if not session:
+    job = await find_job(install_id)
+    if not job:
         await websocket.send_text("Invalid install ID")
         await websocket.close()
         return
 
-    session.clients.add(websocket)
+    # plain log lines, replaying what was logged before the client attached
+    await job.attach(websocket, mode="text")
 
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        session.clients.discard(websocket)
\ No newline at end of file
+        job.detach(websocket)
@@ -0,0 +1,149 @@
+"""
+sync_details against the local Steam Web API stand-in (steam_api_stub):
+batching, the details cache and ETag revalidation, and `outdated` flags.
+
+    python -m pytest backend/tests
+"""
+import os
+import time
+import asyncio
+import threading
+
+import pytest
+
+from backend.steam import steam_api_stub, workshop_details
+from backend.steam.steam_api_stub import StubHandler
+from backend.services.mod_catalog import ModCatalog
+from backend.modupdates_api import mod_update_record
+
+FUTURE = int(time.time()) + 10 * 86400
+
+
+@pytest.fixture
+def stub():
+    """The stub on a free port; tests set StubHandler.fixture for specific items."""
+    server = steam_api_stub.serve("127.0.0.1", 0)
+    StubHandler.calls = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def catalog(tmp_path, stub, monkeypatch):
+    """A throwaway catalog, with sync_details pointed at the stub."""
+    host, port = stub.server_address[:2]
+    monkeypatch.setattr(workshop_details, "STEAM_API_BASE", f"http://{host}:{port}")
+    monkeypatch.setattr(workshop_details, "_etags", {})
+    cat = ModCatalog(str(tmp_path / "catalog.db"))
+    monkeypatch.setattr(workshop_details, "mod_catalog", cat)
+    return cat
+
+
+def sync(ids, force=False) -> dict:
+    async def run():
+        try:
+            return await workshop_details.sync_details(ids, force=force)
+        finally:
+            # the pooled client belongs to this event loop
+            await workshop_details.close_client()
+    return asyncio.run(run())
+
+
+def ids(count: int, start: int = 1000) -> list[str]:
+    return [str(n) for n in range(start, start + count)]
+
+
+# ---------------- BATCHING ----------------
+def test_batches_at_most_batch_size_ids(catalog):
+    # the stub rejects calls above 100 ids, like Steam
+    result = sync(ids(250))
+    assert result["requested"] == 250
+    assert result["requests"] == 3
+    assert result["updated"] == 250
+    assert result["errors"] == []
+    assert StubHandler.calls == 3
+
+
+def test_duplicate_ids_are_requested_once(catalog):
+    result = sync(ids(5) + ids(5))
+    assert result["items"] == 5
+    assert result["requests"] == 1
+
+
+# ---------------- CACHE / ETAG ----------------
+def test_fresh_details_are_not_requested_again(catalog):
+    sync(ids(150))
+    result = sync(ids(150))
+    assert result["requested"] == 0
+    assert result["requests"] == 0
+    assert StubHandler.calls == 2
+
+
+def test_forced_sync_revalidates_with_etag(catalog):
+    sync(ids(150))
+    result = sync(ids(150), force=True)
+    # same batches, same bodies: every call answered 304
+    assert result["requests"] == 2
+    assert result["unchanged"] == 150
+    assert result["updated"] == 0
+    assert len(catalog.stale_details(ids(150), 60)) == 0
+
+
+def test_expired_details_are_revalidated(catalog, monkeypatch):
+    sync(ids(10))
+    monkeypatch.setattr(workshop_details, "DETAILS_TTL", 0)
+    result = sync(ids(10))
+    assert result["requested"] == 10
+    assert result["unchanged"] == 10
+
+
+def test_changed_details_replace_the_cached_ones(catalog):
+    StubHandler.fixture = {"1000": {"title": "Old", "time_updated": 1}}
+    sync(["1000"])
+    StubHandler.fixture = {"1000": {"title": "New", "time_updated": 2}}
+    result = sync(["1000"], force=True)
+    assert result["updated"] == 1
+    assert result["unchanged"] == 0
+
+
+def test_failed_batch_is_reported(catalog, monkeypatch):
+    monkeypatch.setattr(workshop_details, "BATCH_SIZE", 150)
+    result = sync(ids(150))
+    assert result["updated"] == 0
+    assert len(result["errors"]) == 1
+    assert catalog.stale_details(ids(150), 60) == ids(150)
+
+
+# ---------------- OUTDATED ----------------
+def make_item(root: str, workshop_id: str, mtime: float):
+    folder = os.path.join(root, workshop_id)
+    os.makedirs(os.path.join(folder, "mods", f"Mod{workshop_id}"))
+    with open(os.path.join(folder, "mods", f"Mod{workshop_id}", "mod.info"), "w") as f:
+        f.write(f"name=Mod {workshop_id}\nid=Mod{workshop_id}\n")
+    os.utime(folder, (mtime, mtime))
+
+
+def test_outdated_compares_steam_update_with_local_copy(catalog, tmp_path):
+    root = str(tmp_path / "content" / "108600")
+    now = time.time()
+    make_item(root, "2001", now)      # Steam has a newer upload
+    make_item(root, "2002", now)      # local copy is newer
+    make_item(root, "2003", now)      # removed from the Workshop
+    make_item(root, "2004", now)      # never synced
+    StubHandler.fixture = {
+        "2001": {"title": "New upload", "time_updated": FUTURE},
+        "2002": {"title": "Old upload", "time_updated": 1},
+        "2003": None,
+    }
+
+    sync(["2001", "2002", "2003"])
+    records = {m["id"]: mod_update_record(m) for m in catalog.mods(root)}
+
+    assert records["2001"]["outdated"] is True
+    assert records["2001"]["remoteTitle"] == "New upload"
+    assert records["2002"]["outdated"] is False
+    assert records["2003"]["outdated"] is None
+    assert records["2004"]["outdated"] is None
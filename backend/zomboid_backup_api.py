@@ -1,10 +1,16 @@
 import os
+import re
 import json
+import errno
 import shutil
+import threading
 from datetime import datetime
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 
+from backend.services.file_streaming import ranged_file_response
+
 router = APIRouter()
 
 BASE_DIR = os.path.expanduser("~")
@@ -14,15 +20,65 @@ ZOMBOID_PATH = os.getenv(
     os.path.join(BASE_DIR, "Zomboid")
 )
 
+# servers started with -cachedir=<ZOMBOID_INSTANCES_DIR>/<name> keep their
+# saves there; "default" is the plain ~/Zomboid folder
+ZOMBOID_INSTANCES_DIR = os.getenv(
+    "ZOMBOID_INSTANCES_DIR",
+    os.path.join(BASE_DIR, "Zomboid_instances")
+)
+
 BACKUP_DIR = os.getenv(
     "ZOMBOID_BACKUP_DIR",
     os.path.join(BASE_DIR, "zomboid_backups")
 )
 
 META_FILE = os.path.join(BACKUP_DIR, "backups.json")
+RETENTION_FILE = os.path.join(BACKUP_DIR, "retention.json")
+
+DATE_FORMAT = "%Y-%m-%d_%H-%M-%S"
+DEFAULT_INSTANCE = "default"
+INSTANCE_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+DEFAULT_RETENTION = {
+    "keep_last": 5,
+    "hourly": 24,
+    "daily": 7,
+    "weekly": 4,
+}
 
 os.makedirs(BACKUP_DIR, exist_ok=True)
 
+# serialises read-modify-write of backups.json between requests and the pruner
+meta_lock = threading.Lock()
+# backup id -> downloads / restores reading its archive (guarded by meta_lock)
+pins = {}
+
+
+def instance_path(instance: str) -> str:
+    if instance == DEFAULT_INSTANCE:
+        return ZOMBOID_PATH
+    if not INSTANCE_NAME.fullmatch(instance):
+        raise HTTPException(400, f"Invalid instance name: {instance}")
+    return os.path.join(ZOMBOID_INSTANCES_DIR, instance)
+
+
+def pin(backup_id: str) -> dict:
+    """Keep a backup's archive from being pruned or deleted while it is read."""
+    with meta_lock:
+        data = load_meta().get(backup_id)
+        if data is None:
+            raise HTTPException(404, "Backup not found")
+        pins[backup_id] = pins.get(backup_id, 0) + 1
+        return data
+
+
+def unpin(backup_id: str):
+    with meta_lock:
+        if pins.get(backup_id, 0) <= 1:
+            pins.pop(backup_id, None)
+        else:
+            pins[backup_id] -= 1
+
 
 # -----------------------------
 # LOAD / SAVE METADATA
@@ -39,49 +95,260 @@ def save_meta(data):
         json.dump(data, f, indent=2)
 
 
+# -----------------------------
+# RETENTION POLICY
+# -----------------------------
+def load_retention():
+    """
+    Retention is opt-in: nothing is pruned until a policy has been saved.
+    `since` is when that first happened; older backups are never pruned.
+    """
+    config = {
+        "enabled": False,
+        "since": None,
+        "default": dict(DEFAULT_RETENTION),
+        "instances": {},
+        "max_total_mb": None,
+    }
+    if os.path.exists(RETENTION_FILE):
+        with open(RETENTION_FILE, "r") as f:
+            stored = json.load(f)
+        config["enabled"] = True
+        config["since"] = stored.get("since")
+        config["default"].update(stored.get("default", {}))
+        config["instances"] = stored.get("instances", {})
+        config["max_total_mb"] = stored.get("max_total_mb")
+    return config
+
+
+def save_retention(config):
+    with open(RETENTION_FILE, "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def policy_for(config, instance):
+    policy = dict(config["default"])
+    policy.update(config["instances"].get(instance, {}))
+    return policy
+
+
+def backup_size(data):
+    if "size" in data:
+        return data["size"]
+    try:
+        return os.path.getsize(data["file"])
+    except OSError:
+        return 0
+
+
+def plan_retention(meta, config):
+    """
+    Decide which backups to keep in a single newest-first pass.
+
+    Each instance keeps its newest `keep_last` backups plus the newest backup
+    of each of its most recent `hourly`, `daily` and `weekly` periods
+    (grandfather-father-son). Afterwards the oldest survivors are dropped
+    until the catalog fits under `max_total_mb`, but the newest backup of
+    each instance is never pruned for space.
+
+    Backups given a name, and backups taken before the policy was first
+    saved (`since`), are kept outside the policy and use none of its slots.
+    """
+    ordered = sorted(meta.items(), key=lambda item: item[1]["date"], reverse=True)
+
+    state = {}
+    keep = []
+    prune = []
+
+    for backup_id, data in ordered:
+        instance = data.get("instance", DEFAULT_INSTANCE)
+        if instance not in state:
+            state[instance] = {
+                "policy": policy_for(config, instance),
+                "count": 0,
+                "hourly": set(),
+                "daily": set(),
+                "weekly": set(),
+            }
+        st = state[instance]
+        policy = st["policy"]
+
+        since = config.get("since")
+        if data.get("named") or not since or data.get("date", "") < since:
+            keep.append({
+                "id": backup_id,
+                "instance": instance,
+                "date": data.get("date"),
+                "size": backup_size(data),
+                "reasons": ["named" if data.get("named") else "before_policy"],
+                "newest": False,
+                "protected": True,
+            })
+            continue
+
+        try:
+            taken = datetime.strptime(data["date"], DATE_FORMAT)
+        except (KeyError, ValueError):
+            taken = None
+
+        reasons = []
+        if st["count"] < (policy.get("keep_last") or 0):
+            reasons.append("last")
+
+        if taken is not None:
+            iso = taken.isocalendar()
+            buckets = {
+                "hourly": taken.strftime("%Y-%m-%d %H"),
+                "daily": taken.strftime("%Y-%m-%d"),
+                "weekly": f"{iso[0]}-W{iso[1]:02d}",
+            }
+            for bucket, key in buckets.items():
+                seen = st[bucket]
+                if key in seen:
+                    continue
+                if len(seen) < (policy.get(bucket) or 0):
+                    seen.add(key)
+                    reasons.append(bucket)
+
+        st["count"] += 1
+
+        entry = {
+            "id": backup_id,
+            "instance": instance,
+            "date": data["date"],
+            "size": backup_size(data),
+            "reasons": reasons,
+            "newest": st["count"] == 1,
+        }
+        if reasons:
+            keep.append(entry)
+        else:
+            prune.append(entry)
+
+    ceiling = config.get("max_total_mb")
+    if ceiling:
+        limit = ceiling * 1024 * 1024
+        total = sum(e["size"] for e in keep)
+        for entry in reversed(list(keep)):
+            if total <= limit:
+                break
+            if entry["newest"] or entry.get("protected"):
+                continue
+            keep.remove(entry)
+            entry["reasons"] = ["max_total_mb"]
+            prune.append(entry)
+            total -= entry["size"]
+
+    return {"keep": keep, "prune": prune}
+
+
+def remove_backup_files(data):
+    file_path = data.get("file")
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def apply_retention():
+    with meta_lock:
+        config = load_retention()
+        if not config["enabled"]:
+            return {"keep": [], "prune": []}
+        meta = load_meta()
+        plan = plan_retention(meta, config)
+
+        # archives being downloaded or restored wait for the next run
+        plan["prune"] = [e for e in plan["prune"] if e["id"] not in pins]
+        for entry in plan["prune"]:
+            data = meta.pop(entry["id"], None)
+            if data:
+                try:
+                    remove_backup_files(data)
+                except OSError as e:
+                    print(f"[Backup] Failed to prune {entry['id']}: {e}")
+
+        if plan["prune"]:
+            save_meta(meta)
+
+    return plan
+
+
 # -----------------------------
 class BackupRequest(BaseModel):
     name: str | None = None
+    instance: str = DEFAULT_INSTANCE
 
 
 class RenameRequest(BaseModel):
     label: str
 
 
+class RetentionPolicy(BaseModel):
+    keep_last: int | None = None
+    hourly: int | None = None
+    daily: int | None = None
+    weekly: int | None = None
+
+
+class RetentionConfig(BaseModel):
+    default: RetentionPolicy = RetentionPolicy()
+    instances: dict[str, RetentionPolicy] = {}
+    max_total_mb: float | None = None
+
+
 # -----------------------------
 # CREATE BACKUP
 # -----------------------------
 @router.post("/create")
-def create_backup(req: BackupRequest):
-    if not os.path.exists(ZOMBOID_PATH):
-        raise HTTPException(404, "Zomboid folder not found")
+def create_backup(req: BackupRequest, background_tasks: BackgroundTasks):
+    source = instance_path(req.instance)
+    if not os.path.exists(source):
+        raise HTTPException(404, f"Zomboid folder not found: {source}")
 
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    timestamp = datetime.now().strftime(DATE_FORMAT)
     backup_id = req.name or f"backup_{timestamp}"
 
     output_path = os.path.join(BACKUP_DIR, backup_id)
 
-    archive_file = shutil.make_archive(
-        output_path,
-        "zip",
-        ZOMBOID_PATH
-    )
-
-    meta = load_meta()
-
-    meta[backup_id] = {
-        "label": backup_id,
-        "date": timestamp,
-        "file": archive_file
-    }
-
-    save_meta(meta)
+    try:
+        archive_file = shutil.make_archive(
+            output_path,
+            "zip",
+            source
+        )
+    except OSError as e:
+        partial = output_path + ".zip"
+        if os.path.exists(partial):
+            os.remove(partial)
+        if e.errno == errno.ENOSPC:
+            # free space for the next attempt instead of failing again
+            background_tasks.add_task(apply_retention)
+            raise HTTPException(507, "Backup disk is full")
+        raise HTTPException(500, f"Backup failed: {e}")
+
+    size = os.path.getsize(archive_file)
+
+    with meta_lock:
+        meta = load_meta()
+
+        meta[backup_id] = {
+            "label": backup_id,
+            "date": timestamp,
+            "file": archive_file,
+            "instance": req.instance,
+            "named": bool(req.name),
+            "size": size
+        }
+
+        save_meta(meta)
+
+    background_tasks.add_task(apply_retention)
 
     return {
         "id": backup_id,
         "label": backup_id,
         "date": timestamp,
-        "size_mb": round(os.path.getsize(archive_file) / (1024 * 1024), 2)
+        "instance": req.instance,
+        "size_mb": round(size / (1024 * 1024), 2)
     }
 
 
@@ -100,6 +367,7 @@ def list_backups():
                 "id": backup_id,
                 "name": data.get("label", backup_id),
                 "date": data["date"],
+                "instance": data.get("instance", DEFAULT_INSTANCE),
                 "size": f"{round(os.path.getsize(data['file']) / (1024 * 1024), 2)} MB"
             })
 
@@ -111,14 +379,17 @@ def list_backups():
 # -----------------------------
 @router.put("/rename/{backup_id}")
 def rename_backup(backup_id: str, req: RenameRequest):
-    meta = load_meta()
+    with meta_lock:
+        meta = load_meta()
 
-    if backup_id not in meta:
-        raise HTTPException(404, "Backup not found")
+        if backup_id not in meta:
+            raise HTTPException(404, "Backup not found")
 
-    meta[backup_id]["label"] = req.label
+        meta[backup_id]["label"] = req.label
+        # a backup someone bothered to name is kept out of retention
+        meta[backup_id]["named"] = True
 
-    save_meta(meta)
+        save_meta(meta)
 
     return {"success": True}
 
@@ -128,35 +399,100 @@ def rename_backup(backup_id: str, req: RenameRequest):
 # -----------------------------
 @router.delete("/delete/{backup_id}")
 def delete_backup(backup_id: str):
-    meta = load_meta()
+    with meta_lock:
+        meta = load_meta()
 
-    if backup_id not in meta:
-        raise HTTPException(404, "Backup not found")
+        if backup_id not in meta:
+            raise HTTPException(404, "Backup not found")
+        if backup_id in pins:
+            raise HTTPException(409, "Backup is being downloaded or restored")
 
-    file_path = meta[backup_id]["file"]
+        remove_backup_files(meta[backup_id])
 
-    if os.path.exists(file_path):
-        os.remove(file_path)
-
-    del meta[backup_id]
-    save_meta(meta)
+        del meta[backup_id]
+        save_meta(meta)
 
     return {"success": True}
 
 
+# -----------------------------
+# DOWNLOAD
+# -----------------------------
+@router.get("/download/{backup_id}")
+def download_backup(backup_id: str, request: Request):
+    # pinned until the response has been sent, so retention cannot remove
+    # the archive halfway through the stream
+    file_path = pin(backup_id)["file"]
+    try:
+        if not os.path.isfile(file_path):
+            raise HTTPException(404, "Backup archive missing")
+
+        response = ranged_file_response(
+            request,
+            file_path,
+            media_type="application/zip",
+            filename=os.path.basename(file_path)
+        )
+    except BaseException:
+        unpin(backup_id)
+        raise
+    response.background = BackgroundTask(unpin, backup_id)
+    return response
+
+
 # -----------------------------
 # RESTORE
 # -----------------------------
 @router.post("/restore/{backup_id}")
 def restore_backup(backup_id: str):
-    meta = load_meta()
+    data = pin(backup_id)
+    try:
+        file_path = data["file"]
+        if not os.path.isfile(file_path):
+            raise HTTPException(404, "Backup archive missing")
+
+        target = instance_path(data.get("instance", DEFAULT_INSTANCE))
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.unpack_archive(file_path, target)
+    finally:
+        unpin(backup_id)
+
+    return {"success": True}
+
+
+# -----------------------------
+# RETENTION
+# -----------------------------
+@router.get("/retention")
+def get_retention():
+    return load_retention()
+
+
+@router.put("/retention")
+def update_retention(req: RetentionConfig, background_tasks: BackgroundTasks):
+    config = {
+        "since": load_retention()["since"] or datetime.now().strftime(DATE_FORMAT),
+        "default": {**DEFAULT_RETENTION, **req.default.model_dump(exclude_none=True)},
+        "instances": {
+            name: policy.model_dump(exclude_none=True)
+            for name, policy in req.instances.items()
+        },
+        "max_total_mb": req.max_total_mb,
+    }
+    with meta_lock:
+        save_retention(config)
+
+    background_tasks.add_task(apply_retention)
+
+    return {"enabled": True, **config}
 
-    if backup_id not in meta:
-        raise HTTPException(404, "Backup not found")
 
-    file_path = meta[backup_id]["file"]
+@router.get("/retention/preview")
+def preview_retention():
+    return plan_retention(load_meta(), load_retention())
 
-    shutil.rmtree(ZOMBOID_PATH, ignore_errors=True)
-    shutil.unpack_archive(file_path, ZOMBOID_PATH)
 
-    return {"success": True}
\ No newline at end of file
+@router.post("/retention/apply")
+def run_retention(background_tasks: BackgroundTasks):
+    background_tasks.add_task(apply_retention)
+    return {"success": True, "scheduled": True}
@@ -1,10 +1,20 @@
 # module_system/Core/FileBrowser/backend/ftp_api.py
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from urllib.parse import quote
 from pydantic import BaseModel
 import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
 import logging
 from backend.API.Core.auth import require_permission
+from backend.services.zip_stream import stream_zip
+from backend.services.file_streaming import ranged_file_response, listing_json_response
+from backend.services.file_patch import write_text
+from backend.services.dir_sizes import dir_sizes
 
 router = APIRouter(tags=["FTP/FileManager"])
 logger = logging.getLogger("uvicorn.error")
@@ -13,9 +23,22 @@ logger.info("Local FileBrowser API ready.")
 # Allowed roots for browsing (adjust as needed)
 ALLOWED_ROOTS = [os.path.expanduser("~"), "/data"]
 
+# Upload sessions: metadata lives here, data is staged next to the target
+UPLOAD_DIR = os.path.expanduser("~/.modix_uploads")
+UPLOAD_HASH_BLOCK = 1024 * 1024
+UPLOAD_TTL = 24 * 3600  # sessions idle this long are dropped with their .part file
+
+upload_locks = {}  # upload_id -> asyncio.Lock, one writer per session
+completing = set()  # upload_ids being verified and moved into place
+
 class FileWriteRequest(BaseModel):
     content: str
 
+class UploadStartRequest(BaseModel):
+    size: int | None = None
+    sha256: str | None = None
+    overwrite: bool = False
+
 def safe_join(base_or_bases, *paths: str) -> str:
     """Prevent path traversal outside allowed roots."""
     if isinstance(base_or_bases, str):
@@ -28,6 +51,277 @@ def safe_join(base_or_bases, *paths: str) -> str:
             return final_path
     raise HTTPException(status_code=403, detail="Path traversal detected")
 
+def resolve_root(root_name: str) -> str:
+    root_paths = {os.path.basename(r.rstrip("/")): r for r in ALLOWED_ROOTS}
+    if root_name not in root_paths:
+        raise HTTPException(status_code=404, detail=f"Root '{root_name}' not found.")
+    return root_paths[root_name]
+
+# ---------------- CHUNKED UPLOADS ----------------
+def upload_meta_path(upload_id: str) -> str:
+    try:
+        uuid.UUID(upload_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.json")
+
+def load_upload(upload_id: str) -> dict:
+    meta_path = upload_meta_path(upload_id)
+    if not os.path.isfile(meta_path):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    with open(meta_path, "r") as f:
+        session = json.load(f)
+    # the staged file is the source of truth for how much has arrived
+    session["offset"] = os.path.getsize(session["part"]) if os.path.exists(session["part"]) else 0
+    return session
+
+def save_upload(session: dict):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    with open(upload_meta_path(session["id"]), "w") as f:
+        json.dump(session, f)
+
+def drop_upload(session: dict):
+    for path in (session["part"], upload_meta_path(session["id"])):
+        if os.path.exists(path):
+            os.remove(path)
+    upload_locks.pop(session["id"], None)
+
+def prune_uploads(max_idle: float = UPLOAD_TTL) -> int:
+    """Drop sessions (and their staged data) nobody has written to for `max_idle` seconds."""
+    if not os.path.isdir(UPLOAD_DIR):
+        return 0
+    cutoff = time.time() - max_idle
+    dropped = 0
+    for name in os.listdir(UPLOAD_DIR):
+        upload_id, ext = os.path.splitext(name)
+        lock = upload_locks.get(upload_id)
+        if ext != ".json" or (lock is not None and lock.locked()):
+            continue
+        try:
+            session = load_upload(upload_id)
+            touched = max(
+                os.path.getmtime(p) for p in (session["part"], upload_meta_path(upload_id))
+                if os.path.exists(p)
+            )
+            if touched < cutoff:
+                drop_upload(session)
+                dropped += 1
+        except (HTTPException, OSError, ValueError, KeyError) as e:
+            logger.warning(f"[UPLOAD] Could not check session {name}: {e}")
+    if dropped:
+        logger.info(f"[UPLOAD] Dropped {dropped} stale upload session(s)")
+    return dropped
+
+def upload_status(session: dict) -> dict:
+    return {
+        "upload_id": session["id"],
+        "target": session["target"],
+        "offset": session["offset"],
+        "size": session["size"],
+    }
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+@router.post("/uploads/{root_name}/{path:path}")
+async def start_upload(
+    root_name: str,
+    path: str,
+    req: UploadStartRequest,
+    current_user=Depends(require_permission("container_file_write"))
+):
+    """Open a resumable upload session for a file under an allowed root."""
+    await asyncio.to_thread(prune_uploads)
+    abs_path = safe_join(resolve_root(root_name), path)
+    if os.path.isdir(abs_path):
+        raise HTTPException(status_code=400, detail="Target is a directory")
+    if os.path.exists(abs_path) and not req.overwrite:
+        raise HTTPException(status_code=409, detail="File already exists")
+
+    upload_id = str(uuid.uuid4())
+    session = {
+        "id": upload_id,
+        "target": abs_path,
+        "part": os.path.join(os.path.dirname(abs_path), f".{os.path.basename(abs_path)}.{upload_id}.part"),
+        "size": req.size,
+        "sha256": req.sha256.lower() if req.sha256 else None,
+        "overwrite": req.overwrite,
+        "created": time.time(),
+    }
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    open(session["part"], "wb").close()
+    save_upload(session)
+    session["offset"] = 0
+    logger.info(f"[UPLOAD] Started {upload_id} -> {abs_path}")
+    return upload_status(session)
+
+@router.get("/uploads/{upload_id}")
+def get_upload(
+    upload_id: str,
+    current_user=Depends(require_permission("container_file_write"))
+):
+    """Current offset, so an interrupted client knows where to resume."""
+    return upload_status(load_upload(upload_id))
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int,
+    current_user=Depends(require_permission("container_file_write"))
+):
+    """
+    Append the request body at `offset`. The body is streamed straight to
+    disk; an optional X-Chunk-SHA256 header is verified and a bad chunk is
+    truncated away so the client can simply resend it.
+    """
+    # only existing sessions get a lock; drop_upload removes it again
+    load_upload(upload_id)
+    if upload_id in completing:
+        raise HTTPException(status_code=409, detail="Upload is being completed")
+    async with upload_locks.setdefault(upload_id, asyncio.Lock()):
+        session = load_upload(upload_id)
+        if offset != session["offset"]:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "Offset mismatch", "offset": session["offset"]}
+            )
+
+        expected = request.headers.get("x-chunk-sha256")
+        digest = hashlib.sha256()
+        written = 0
+        limit = session["size"]
+
+        # open, write, truncate and close all touch the disk: keep them off the loop
+        f = await asyncio.to_thread(open, session["part"], "r+b")
+        try:
+            f.seek(offset)
+            async for data in request.stream():
+                if not data:
+                    continue
+                if limit is not None and offset + written + len(data) > limit:
+                    raise HTTPException(status_code=413, detail="Chunk exceeds declared size")
+                digest.update(data)
+                await asyncio.to_thread(f.write, data)
+                written += len(data)
+            if expected and digest.hexdigest() != expected.lower():
+                raise HTTPException(status_code=422, detail="Chunk checksum mismatch")
+        except BaseException as e:
+            # without a checksum, bytes that arrived before a disconnect are kept
+            keep = 0 if expected or isinstance(e, HTTPException) else written
+            await asyncio.to_thread(f.truncate, offset + keep)
+            raise
+        finally:
+            await asyncio.to_thread(f.close)
+
+        session["offset"] = offset + written
+        return upload_status(session)
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    current_user=Depends(require_permission("container_file_write"))
+):
+    """
+    Verify size and checksum, then move the staged file into place. Holds
+    the session's lock so no chunk lands while the file is hashed or moved;
+    chunks sent meanwhile are refused.
+    """
+    load_upload(upload_id)
+    if upload_id in completing:
+        raise HTTPException(status_code=409, detail="Upload is being completed")
+    completing.add(upload_id)
+    try:
+        async with upload_locks.setdefault(upload_id, asyncio.Lock()):
+            session = load_upload(upload_id)
+            if session["size"] is not None and session["offset"] != session["size"]:
+                raise HTTPException(
+                    status_code=409,
+                    detail={"message": "Upload incomplete", "offset": session["offset"]}
+                )
+            if session["sha256"]:
+                actual = await asyncio.to_thread(file_sha256, session["part"])
+                if actual != session["sha256"]:
+                    drop_upload(session)
+                    raise HTTPException(status_code=422, detail="File checksum mismatch, upload discarded")
+            if os.path.exists(session["target"]) and not session["overwrite"]:
+                raise HTTPException(status_code=409, detail="File already exists")
+
+            os.replace(session["part"], session["target"])
+            os.remove(upload_meta_path(upload_id))
+            upload_locks.pop(upload_id, None)
+    finally:
+        completing.discard(upload_id)
+    logger.info(f"[UPLOAD] Completed {upload_id} -> {session['target']}")
+    return {"status": "success", "path": session["target"], "size": session["offset"]}
+
+@router.delete("/uploads/{upload_id}")
+def abort_upload(
+    upload_id: str,
+    current_user=Depends(require_permission("container_file_write"))
+):
+    session = load_upload(upload_id)
+    if upload_id in completing:
+        raise HTTPException(status_code=409, detail="Upload is being completed")
+    drop_upload(session)
+    return {"status": "aborted"}
+
+# ---------------- ZIP DOWNLOAD ----------------
+@router.get("/zip/{root_name}/{path:path}")
+def download_zip(
+    root_name: str,
+    path: str = "",
+    mode: str = "auto",
+    current_user=Depends(require_permission("container_file_read"))
+):
+    """
+    Stream a folder as a ZIP while it is being walked (no temp file).
+    mode: auto (store media, deflate text), store, or deflate.
+    """
+    if mode not in ("auto", "store", "deflate"):
+        raise HTTPException(status_code=400, detail="mode must be auto, store or deflate")
+    abs_path = safe_join(resolve_root(root_name), path)
+    if not os.path.isdir(abs_path):
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    name = os.path.basename(abs_path.rstrip("/")) or root_name
+    logger.info(f"[ZIP] Streaming {abs_path}")
+    return StreamingResponse(
+        stream_zip(abs_path, mode),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(name)}.zip"},
+    )
+
+# ---------------- FOLDER SIZES ----------------
+@router.get("/sizes/{root_name}/{path:path}")
+def folder_sizes(
+    root_name: str,
+    path: str = "",
+    current_user=Depends(require_permission("container_filemanager_access"))
+):
+    """
+    Recursive size of a folder and of each direct child, biggest first.
+    The first request for a tree starts a background scan and returns 202;
+    after that sizes are kept current from file change events. Trees too
+    big to watch (e.g. a whole home folder) are sized once ("live": false)
+    and rescanned on a later request.
+    """
+    abs_path = safe_join(resolve_root(root_name), path)
+    if not os.path.isdir(abs_path):
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    usage = dir_sizes.usage(abs_path)
+    if usage is not None:
+        return {"status": "ready", **usage}
+    status = dir_sizes.track(abs_path)
+    if status == "missing":
+        raise HTTPException(status_code=404, detail="Folder not found")
+    return JSONResponse({"status": status, "path": abs_path}, status_code=202)
+
 @router.api_route(
     "/{root_name}/{path:path}",
     methods=["GET", "POST", "DELETE"]
@@ -41,27 +335,26 @@ async def ftp_catch_all(
     method = request.method if request else "GET"
 
     # Resolve root
-    root_paths = {os.path.basename(r.rstrip("/")): r for r in ALLOWED_ROOTS}
-    if root_name not in root_paths:
-        raise HTTPException(status_code=404, detail=f"Root '{root_name}' not found.")
-    root_path = root_paths[root_name]
+    root_path = resolve_root(root_name)
 
     # Compute absolute path safely
     abs_path = safe_join(root_path, path)
 
     if method == "GET":
         if os.path.isdir(abs_path):
-            files = []
-            for entry in os.scandir(abs_path):
-                files.append({
-                    "name": entry.name,
-                    "is_dir": entry.is_dir(),
-                    "size": entry.stat().st_size,
-                })
-            return {"files": files}
+            def build():
+                files = []
+                for entry in os.scandir(abs_path):
+                    files.append({
+                        "name": entry.name,
+                        "is_dir": entry.is_dir(),
+                        "size": entry.stat().st_size,
+                    })
+                return {"files": files}
+            return listing_json_response(request, abs_path, build)
         elif os.path.isfile(abs_path):
             require_permission("container_file_read")(current_user)
-            return FileResponse(abs_path)
+            return ranged_file_response(request, abs_path)
         else:
             raise HTTPException(status_code=404, detail="Path not found")
 
@@ -75,8 +368,8 @@ async def ftp_catch_all(
         if not content:
             raise HTTPException(status_code=400, detail="No content provided")
         os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-        with open(abs_path, "w") as f:
-            f.write(content)
+        # temp file + rename: never writes through a hardlink shared with a base install
+        await asyncio.to_thread(write_text, abs_path, content)
         logger.info(f"[POST] Wrote file {abs_path}")
         return {"status": "success"}
 
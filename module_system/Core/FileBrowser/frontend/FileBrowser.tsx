@@ -25,6 +25,9 @@ interface Tab {
   content: string;
   unsaved: boolean;
   language: string;
+  version?: string;
+  // why the tab cannot be saved (binary, or only part of a large file loaded)
+  readOnly?: string;
 }
 
 const FILE_API = "http://localhost:2010/api/filemanager";
@@ -119,7 +122,13 @@ export default function FileBrowser() {
         params: { path },
       });
 
-      const content = res.data?.content ?? "// file not found";
+      const data = res.data || {};
+      const content = data.content ?? "// file not found";
+      const readOnly = data.binary
+        ? "Binary file: open it with a dedicated tool"
+        : data.truncated
+        ? `Large file: showing the first ${data.lines} lines, saving is disabled`
+        : undefined;
       const ext = path.split(".").pop();
 
       const language =
@@ -135,7 +144,14 @@ export default function FileBrowser() {
 
       setTabs((prev) => [
         ...prev,
-        { filePath: path, content, unsaved: false, language },
+        {
+          filePath: path,
+          content,
+          unsaved: false,
+          language,
+          version: data.version,
+          readOnly,
+        },
       ]);
 
       setActive(path);
@@ -147,6 +163,7 @@ export default function FileBrowser() {
           content: "// failed to load file",
           unsaved: false,
           language: "plaintext",
+          readOnly: "File could not be loaded",
         },
       ]);
       setActive(path);
@@ -158,16 +175,31 @@ export default function FileBrowser() {
     if (!active) return;
 
     const tab = tabs.find((t) => t.filePath === active);
-    if (!tab) return;
+    if (!tab || tab.readOnly) return;
 
-    await axios.post(`${FILE_API}/file/save`, {
-      path: tab.filePath,
-      content: tab.content,
-    });
+    try {
+      const res = await axios.post(`${FILE_API}/file/save`, {
+        path: tab.filePath,
+        content: tab.content,
+        version: tab.version,
+      });
 
-    setTabs((prev) =>
-      prev.map((t) => (t.filePath === active ? { ...t, unsaved: false } : t))
-    );
+      setTabs((prev) =>
+        prev.map((t) =>
+          t.filePath === active
+            ? { ...t, unsaved: false, version: res.data?.version }
+            : t
+        )
+      );
+      setError("");
+    } catch (e: any) {
+      const detail = e?.response?.data?.detail;
+      if (e?.response?.status === 409) {
+        setError(detail?.message || "File changed on disk since it was opened");
+      } else {
+        setError(typeof detail === "string" ? detail : "Failed to save file");
+      }
+    }
   };
 
   // ---------------- EDIT ----------------
@@ -278,13 +310,21 @@ export default function FileBrowser() {
         </div>
 
         <div className="fb-topbar">
-          <button className="fb-btn" onClick={save}>
+          <button
+            className="fb-btn"
+            onClick={save}
+            disabled={!current || !!current.readOnly}
+          >
             save
           </button>
 
           <div className="fb-path">
             {activeGame ? `Active Game: ${activeGame}` : "No active game"}
           </div>
+
+          {current?.readOnly && (
+            <div className="fb-error">{current.readOnly}</div>
+          )}
         </div>
 
         <div className="fb-editor">
@@ -300,6 +340,7 @@ export default function FileBrowser() {
                 minimap: { enabled: false },
                 smoothScrolling: true,
                 cursorBlinking: "smooth",
+                readOnly: !!current.readOnly,
               }}
             />
           ) : (
@@ -6,6 +6,9 @@ from datetime import datetime, timedelta
 from typing import List
 import os
 
+from backend.services.mod_catalog import mod_catalog
+from backend.services.content_hash import content_hasher
+
 router = APIRouter()
 router = APIRouter(tags=["ModUpdater"], prefix="/modupdater")
 logger = logging.getLogger("terminal_api")
@@ -14,43 +17,26 @@ STEAM_WORKSHOP_PATH = Path("/home/steam/Steam/steamapps/workshop/content/108600"
 MOD_UPDATE_CUTOFF_DAYS = 7
 
 
-def extract_mod_name(mod_folder: Path) -> str:
-    """Try to extract the mod name from mod.info."""
-    mod_info_path = mod_folder / "mod.info"
-    if mod_info_path.exists():
-        try:
-            with mod_info_path.open("r", encoding="utf-8", errors="ignore") as f:
-                for line in f:
-                    line = line.strip()
-                    if line.lower().startswith("name="):
-                        return line.split("=", 1)[1].strip()
-        except Exception as e:
-            print(f"Failed to read mod.info for {mod_folder.name}: {e}")
-    return f"Mod {mod_folder.name}"
-
-
 @router.get("/mods/updated")
 def get_recently_updated_mods() -> List[dict]:
     updated_mods = []
     now = datetime.now()
     cutoff = now - timedelta(days=MOD_UPDATE_CUTOFF_DAYS)
 
-    if not STEAM_WORKSHOP_PATH.exists():
-        return []
-
-    for mod_folder in STEAM_WORKSHOP_PATH.iterdir():
-        if mod_folder.is_dir():
-            mod_id = mod_folder.name
-            mod_path = str(mod_folder.resolve())
-            last_modified = datetime.fromtimestamp(mod_folder.stat().st_mtime)
-
-            if last_modified >= cutoff:
-                mod_name = extract_mod_name(mod_folder)
-                updated_mods.append({
-                    "id": mod_id,
-                    "name": mod_name,
-                    "lastUpdated": last_modified.strftime("%B %d, %Y %H:%M"),
-                    "path": mod_path
-                })
+    # folder mtime only shortlists; the content hash decides whether anything changed
+    for mod in mod_catalog.mods(str(STEAM_WORKSHOP_PATH), since=cutoff.timestamp()):
+        content = content_hasher.version(mod["path"])
+        if content["changedAt"] < cutoff.timestamp():
+            continue
+        last_modified = datetime.fromtimestamp(content["changedAt"])
+        updated_mods.append({
+            "id": mod["id"],
+            "name": mod["name"] or f"Mod {mod['id']}",
+            "lastUpdated": last_modified.strftime("%B %d, %Y %H:%M"),
+            "path": os.path.realpath(mod["path"]),
+            "contentVersion": content["version"],
+            "previousVersion": content["previous"],
+            "changes": content["changes"],
+        })
 
     return updated_mods
@@ -18,8 +18,23 @@ interface ModInfo {
   path: string;
   localVersion: string;
   lastModified: number; // timestamp for live detection
+  updated?: boolean;
 }
 
+// shape a backend mod record; `updated` flags a change since `prev` was seen
+const toModInfo = (mod: any, prev?: ModInfo): ModInfo => {
+  const lastModified = new Date(mod.localVersion).getTime(); // or mod.lastModified from backend
+  return {
+    id: mod.id,
+    name: mod.name,
+    description: mod.description,
+    path: mod.folder,
+    localVersion: mod.localVersion,
+    lastModified,
+    updated: prev ? prev.lastModified !== lastModified : false,
+  };
+};
+
 type ErrorCode =
   | "NO_MODS_FOUND"
   | "WORKSHOP_PATH_MISSING"
@@ -49,22 +64,9 @@ export default function ModUpdates() {
         };
       }
 
-      setMods((prev) => {
-        return data.map((mod: any) => {
-          const prevMod = prev.find((m) => m.id === mod.id);
-          return {
-            id: mod.id,
-            name: mod.name,
-            description: mod.description,
-            path: mod.folder,
-            localVersion: mod.localVersion,
-            lastModified: new Date(mod.localVersion).getTime(), // or mod.lastModified from backend
-            updated: prevMod
-              ? prevMod.lastModified !== new Date(mod.localVersion).getTime()
-              : false,
-          };
-        });
-      });
+      setMods((prev) =>
+        data.map((mod: any) => toModInfo(mod, prev.find((m) => m.id === mod.id)))
+      );
 
       setError(null);
     } catch (err: any) {
@@ -104,9 +106,39 @@ export default function ModUpdates() {
   useEffect(() => {
     fetchMods();
 
-    // Poll every 15 seconds
-    const interval = setInterval(fetchMods, 15000);
-    return () => clearInterval(interval);
+    // Backend pushes mod_added / mod_updated / mod_removed; poll only if the socket is down
+    let interval: ReturnType<typeof setInterval> | null = null;
+    const ws = new WebSocket(`${BACKEND_URL.replace(/^http/, "ws")}/api/mods/mods/events`);
+    ws.onmessage = (msg) => {
+      const event = JSON.parse(msg.data);
+      // the server dropped events we missed: only a full reload is accurate
+      if (event.type === "resync") {
+        fetchMods();
+        return;
+      }
+      if (!event.mod) return;
+
+      if (event.type === "mod_removed") {
+        setMods((prev) => prev.filter((m) => m.id !== event.mod.id));
+      } else if (event.type === "mod_added" || event.type === "mod_updated") {
+        setMods((prev) => {
+          const old = prev.find((m) => m.id === event.mod.id);
+          const next = toModInfo(event.mod, old);
+          return old
+            ? prev.map((m) => (m.id === next.id ? next : m))
+            : [...prev, next];
+        });
+      }
+    };
+    ws.onclose = () => {
+      if (!interval) interval = setInterval(fetchMods, 15000);
+    };
+
+    return () => {
+      ws.onclose = null;
+      ws.close();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
   const retryLoad = () => window.location.reload();